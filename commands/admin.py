@@ -0,0 +1,181 @@
+"""
+Admin commands module.
+
+"""
+from evennia.utils import evtable
+from commands.command import MuxCommand
+from world import loadgen, metrics, profiling, stats
+
+
+class CmdCmdStats(MuxCommand):
+    """
+    show what commands cost
+
+    Usage:
+      cmdstats
+      cmdstats <command>
+      cmdstats/reset
+
+    Lists the number of runs, wall time, database queries,
+    Attribute cache misses and bytes sent of each command,
+    the most expensive in total first. Given a command, shows
+    its histograms of time and queries per run. The reset
+    switch forgets all recorded runs.
+    """
+    key = "cmdstats"
+    switch_options = ("reset",)
+    locks = "cmd:perm(Developer)"
+    help_category = "System"
+
+    def func(self):
+        """show the profiles"""
+        caller = self.caller
+        if "reset" in self.switches:
+            profiling.reset()
+            caller.msg("Command profiles reset.")
+            return
+        if not profiling.ENABLED:
+            caller.msg("Command profiling is disabled (COMMAND_PROFILING).")
+            return
+
+        if self.args:
+            profile = profiling.get_profile(self.args.strip())
+            if not profile:
+                caller.msg(f"No runs of '{self.args.strip()}' recorded.")
+                return
+            string = (f"|w{profile.key}|n: {profile.calls} runs, "
+                      f"{profile.time / profile.calls:.1f} ms average, {profile.max_time:.1f} ms max.")
+            for header, buckets, hist in (("ms", profiling.TIME_BUCKETS, profile.time_hist),
+                                          ("queries", profiling.QUERY_BUCKETS, profile.query_hist)):
+                table = evtable.EvTable(f"|w{header}|n", "|wruns|n", border="header")
+                for bound, runs in zip(buckets, hist):
+                    table.add_row(f"<= {bound}", runs)
+                table.add_row(f"> {buckets[-1]}", hist[-1])
+                string += f"\n{table}"
+            caller.msg(string)
+            return
+
+        profiles = profiling.get_profiles()
+        if not profiles:
+            caller.msg("No command runs recorded yet.")
+            return
+        table = evtable.EvTable("|wcommand|n", "|wruns|n", "|wtotal ms|n", "|wavg ms|n", "|wmax ms|n",
+                                "|wqueries|n", "|wattr misses|n", "|wbytes|n", border="header")
+        for profile in profiles:
+            table.add_row(profile.key, profile.calls, f"{profile.time:.0f}",
+                          f"{profile.time / profile.calls:.1f}", f"{profile.max_time:.1f}",
+                          f"{profile.queries / profile.calls:.1f}",
+                          f"{profile.attr_misses / profile.calls:.1f}",
+                          profile.bytes // profile.calls)
+        caller.msg(f"|wCommand profiles|n (queries, Attribute misses and bytes are per run):\n{table}")
+
+
+class CmdLoadGen(MuxCommand):
+    """
+    measure the game under a simulated load
+
+    Usage:
+      loadgen [<characters> [<rounds>]]
+      loadgen/save [<characters> [<rounds>]]
+      loadgen/cleanup
+
+    Fills a sandbox room with simulated characters running a
+    seeded mix of look, inv, get, drop, give, chop and stop,
+    then shows the throughput, latency and queries of each
+    command next to the stored baseline. The save switch also
+    stores the results as the new baseline. The server is
+    blocked while this runs, use it on a development server;
+    the same load runs on a test database with the game's
+    test suite. The cleanup switch removes anything a failed
+    run left.
+    """
+    key = "loadgen"
+    switch_options = ("save", "cleanup")
+    locks = "cmd:perm(Developer)"
+    help_category = "System"
+
+    def func(self):
+        """run the load"""
+        caller = self.caller
+        if "cleanup" in self.switches:
+            loadgen.cleanup()
+            caller.msg("Load generation objects removed.")
+            return
+        try:
+            numbers = [int(arg) for arg in self.args.split()][:2]
+        except ValueError:
+            caller.msg("Usage: loadgen [<characters> [<rounds>]]")
+            return
+        characters, rounds = (numbers + [10, 20][len(numbers):])[:2]
+
+        baseline = loadgen.load_baseline()
+        results = loadgen.run(characters, rounds)
+        caller.msg(loadgen.report(results, baseline))
+        if "save" in self.switches:
+            loadgen.save_baseline(results)
+            caller.msg("Results stored as the new baseline.")
+
+
+class CmdProfile(MuxCommand):
+    """
+    profile the whole server for a while
+
+    Usage:
+      profile [<seconds>]
+
+    Runs the Python profiler over everything the server does
+    for some seconds (10 by default, at most 300), then shows
+    the most expensive calls and where the full stats were
+    saved. Use it while the game is lagging. Profiling slows
+    the server down while it runs.
+    """
+    key = "profile"
+    locks = "cmd:perm(Developer)"
+    help_category = "System"
+
+    def func(self):
+        """start the capture"""
+        caller = self.caller
+        try:
+            seconds = min(max(float(self.args.strip() or 10), 1), 300)
+        except ValueError:
+            caller.msg("Usage: profile [<seconds>]")
+            return
+
+        def report(summary, path):
+            where = f"Stats saved to {path}." if path else "The stats could not be saved."
+            caller.msg(f"|wProfile of {seconds:g} seconds|n. {where}\n{summary}", options={"raw": True})
+
+        if metrics.capture(seconds, report):
+            caller.msg(f"Profiling the server for {seconds:g} seconds.")
+        else:
+            caller.msg("A profile is already being captured.")
+
+
+class CmdStats(MuxCommand):
+    """
+    show the size of the game world
+
+    Usage:
+      stats
+      stats/reconcile
+
+    Lists the rooms, exits, characters and other objects in
+    the game and the database size, as reported to MSSP
+    crawlers. These are counted in memory as objects come
+    and go. The reconcile switch recounts them from the
+    database right away.
+    """
+    key = "stats"
+    switch_options = ("reconcile",)
+    locks = "cmd:perm(Admin)"
+    help_category = "System"
+
+    def func(self):
+        """show the statistics"""
+        if "reconcile" in self.switches:
+            stats.reconcile()
+        table = evtable.EvTable("|wstatistic|n", "|wcount|n", border="header")
+        for field, count in stats.get().items():
+            table.add_row(field.capitalize(), count)
+        self.caller.msg(f"|wGame statistics|n:\n{table}")
@@ -0,0 +1,103 @@
+"""
+Command set base
+
+Evennia merges the cmdsets of a character, its account and its session
+anew whenever they change, and every character holds its own copies of
+the same cmdsets. The game's `CmdSet` can share the merges instead:
+merging two cmdsets that set `cacheable = True` is cached process-wide,
+keyed by the class, key, priority, mergetype, key_mergetypes, duplicates,
+no_exits, no_objs and no_channels of every set that went into the merge,
+so all characters with the same cmdset stack get the very same merged
+cmdset back. Merges with other cmdsets, such as those of exits, are done
+as usual.
+
+Caching is opt-in, as a shared merge belongs to whoever merged it first:
+its `cmdsetobj` and `merged_from`, and the `obj` of the command instances
+in it, are those of the first character. A cmdset may only set
+`cacheable` if all instances of its class hold the same commands and
+these use `self.caller` rather than `self.obj` to find who is running
+them (Evennia copies the command before each run, so shared instances are
+otherwise safe). The default cmdsets of the game do.
+
+Adding the same cmdset key twice to a cmdset, or two added cmdsets that
+define the same command, is logged as a conflict when the cmdset is built.
+"""
+from weakref import WeakKeyDictionary
+from evennia import CmdSet as BaseCmdSet
+from evennia.utils import logger
+
+# Merged cmdsets by the signatures of the two sets merged.
+_MERGED = {}
+# Signatures of merged cmdsets.
+_SIGNATURES = WeakKeyDictionary()
+
+
+def signature(cmdset):
+    "What a cmdset is merged by, or None if its merges can't be cached."
+    if isinstance(cmdset, CmdSet):
+        if not cmdset.cacheable:
+            return None
+        return (type(cmdset), cmdset.key, cmdset.priority, cmdset.mergetype,
+                frozenset(cmdset.key_mergetypes.items()), cmdset.duplicates, cmdset.no_exits,
+                cmdset.no_objs, cmdset.no_channels)
+    return _SIGNATURES.get(cmdset) if isinstance(cmdset, BaseCmdSet) else None
+
+
+def merge(cmdset_b, cmdset_a):
+    """
+    Merge cmdset A onto cmdset B, reusing an earlier merge of the same kinds
+    of cmdsets.
+
+    Returns:
+        cmdset_c (CmdSet): The merged cmdset.
+    """
+    if not cmdset_a:
+        return cmdset_b
+    key = (signature(cmdset_b), signature(cmdset_a))
+    if None in key:
+        return BaseCmdSet.__add__(cmdset_b, cmdset_a)
+    cmdset_c = _MERGED.get(key)
+    if cmdset_c is None:
+        if cmdset_b.key == cmdset_a.key and key[0] != key[1]:
+            logger.log_warn(f"Cmdsets {type(cmdset_b).__name__} and {type(cmdset_a).__name__} "
+                            f"are merged but share the key '{cmdset_a.key}'.")
+        cmdset_c = BaseCmdSet.__add__(cmdset_b, cmdset_a)
+        _MERGED[key] = cmdset_c
+        _SIGNATURES[cmdset_c] = key
+    return cmdset_c
+
+
+class CmdSet(BaseCmdSet):
+    """
+    Base of the game's cmdsets, whose merges can be shared by everyone
+    with the same cmdsets.
+    """
+    # Set to True to share merges, see the module docstring.
+    cacheable = False
+
+    def __add__(self, cmdset_a):
+        return merge(self, cmdset_a)
+
+    def __radd__(self, cmdset_b):
+        # Called for merged (plain) cmdsets on the left, so they are cached too.
+        if not cmdset_b:
+            return self
+        return merge(cmdset_b, self)
+
+    def add(self, cmd, *args, **kwargs):
+        """
+        Add a command or the commands of a cmdset, logging a conflict if
+        an added cmdset reuses the key or commands of another one.
+        """
+        if isinstance(cmd, BaseCmdSet):
+            added = self.__dict__.setdefault("_added_cmdsets", {})
+            names = {name for command in cmd.commands for name in command._matchset}
+            if cmd.key in added or cmd.key == self.key:
+                logger.log_warn(f"Cmdset {type(cmd).__name__} added to {type(self).__name__} "
+                                f"reuses the cmdset key '{cmd.key}'.")
+            for key, other in added.items():
+                if names & other:
+                    logger.log_warn(f"Cmdsets '{key}' and '{cmd.key}' added to {type(self).__name__} "
+                                    f"both define {', '.join(sorted(names & other))}.")
+            added[cmd.key] = names
+        return super().add(cmd, *args, **kwargs)
@@ -6,6 +6,8 @@ Commands describe the input the account can do to the game.
 """
 
 from evennia import Command as BaseCommand
+from evennia.commands.default.muxcommand import MuxCommand as BaseMuxCommand
+from world import profiling
 # from evennia import default_cmds
 
 
@@ -28,6 +30,24 @@ class Command(BaseCommand):
         - at_post_cmd(): Extra actions, often things done after
             every command, like prompts.
 
+    Every run is profiled by `world.profiling`, so subclasses overriding
+    `at_pre_cmd` or `at_post_cmd` should call `super()`.
+
+    """
+    def at_pre_cmd(self):
+        profiling.start(self)
+
+    def at_post_cmd(self):
+        profiling.finish(self)
+
+
+class MuxCommand(Command, BaseMuxCommand):
+    """
+    Evennia's MuxCommand with the profiling of the game's `Command`.
+    The game's commands should inherit from this rather than from
+    Evennia's MuxCommand, and it is the `COMMAND_DEFAULT_CLASS` the
+    default commands are built on.
+
     """
     pass
 
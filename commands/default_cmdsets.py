@@ -8,6 +8,10 @@ and merged onto entities at runtime.
 To create new commands to populate the cmdset, see
 `commands/command.py`.
 
+The cmdsets here also inherit from the game's `CmdSet` in
+`commands/cmdset.py` and set `cacheable`, so everyone with the same
+cmdsets shares their merges.
+
 This module wraps the default command sets of Evennia; overloads them
 to add/remove commands from the default lineup. You can create your
 own cmdsets by inheriting from them or directly from `evennia.CmdSet`.
@@ -15,16 +19,18 @@ own cmdsets by inheriting from them or directly from `evennia.CmdSet`.
 """
 
 from evennia import default_cmds
-from commands import harvest, item
+from commands import admin, harvest, item
+from commands.cmdset import CmdSet
 
 
-class CharacterCmdSet(default_cmds.CharacterCmdSet):
+class CharacterCmdSet(CmdSet, default_cmds.CharacterCmdSet):
     """
     The `CharacterCmdSet` contains general in-game commands like `look`,
     `get`, etc available on in-game Character objects. It is merged with
     the `AccountCmdSet` when an Account puppets a Character.
     """
     key = "DefaultCharacter"
+    cacheable = True
 
     def at_cmdset_creation(self):
         """
@@ -38,7 +44,7 @@ class CharacterCmdSet(default_cmds.CharacterCmdSet):
         self.add(item.ItemCmdSet())
 
 
-class AccountCmdSet(default_cmds.AccountCmdSet):
+class AccountCmdSet(CmdSet, default_cmds.AccountCmdSet):
     """
     This is the cmdset available to the Account at all times. It is
     combined with the `CharacterCmdSet` when the Account puppets a
@@ -46,6 +52,7 @@ class AccountCmdSet(default_cmds.AccountCmdSet):
     commands, etc.
     """
     key = "DefaultAccount"
+    cacheable = True
 
     def at_cmdset_creation(self):
         """
@@ -55,14 +62,19 @@ class AccountCmdSet(default_cmds.AccountCmdSet):
         #
         # any commands you add below will overload the default ones.
         #
+        self.add(admin.CmdCmdStats())
+        self.add(admin.CmdLoadGen())
+        self.add(admin.CmdStats())
+        self.add(admin.CmdProfile())
 
 
-class UnloggedinCmdSet(default_cmds.UnloggedinCmdSet):
+class UnloggedinCmdSet(CmdSet, default_cmds.UnloggedinCmdSet):
     """
     Command set available to the Session before being logged in.  This
     holds commands like creating a new account, logging in, etc.
     """
     key = "DefaultUnloggedin"
+    cacheable = True
 
     def at_cmdset_creation(self):
         """
@@ -74,12 +86,13 @@ class UnloggedinCmdSet(default_cmds.UnloggedinCmdSet):
         #
 
 
-class SessionCmdSet(default_cmds.SessionCmdSet):
+class SessionCmdSet(CmdSet, default_cmds.SessionCmdSet):
     """
     This cmdset is made available on Session level once logged in. It
     is empty by default.
     """
     key = "DefaultSession"
+    cacheable = True
 
     def at_cmdset_creation(self):
         """
@@ -5,14 +5,60 @@ Commands describe the input the account can do to the game.
 
 """
 
-from evennia import CmdSet
+from commands.cmdset import CmdSet
 from commands.command import Command
-from typeclasses.harvestables import Tree
+from typeclasses.harvestables import HerbPatch, OreVein, Tree
+from typeclasses.scripts import get_harvest_scheduler
+from world import monitor
+from world.stacks import StackConflict
+
+# Seconds between harvesting swings.
+SWING_PERIOD = 2
+# Hit points taken off a harvestable by each swing.
+SWING_DAMAGE = 5
 
 
 def stop_harvesting(character):
+    target = character.ndb.harvest_target
+    if target:
+        monitor.notify(character, "harvest", {target.id: None})
     character.ndb.harvesting = False
+    character.ndb.harvest_target = None
     character.ndb.harvesting_interrupt = None
+    get_harvest_scheduler().cancel(character)
+
+
+def harvest_swing(caller, target):
+    """
+    Swing at a harvestable once, such as an axe into a tree. This is called
+    by the HarvestScheduler for every swing after the first.
+
+    Returns True if the harvesting should go on.
+    """
+    # The harvestable was depleted already, exit gracefully.
+    if not target.pk or target.location != caller.location:
+        stop_harvesting(caller)
+        return False
+
+    caller.msg(target.swing_msg.format(target=target.name))
+    string = target.swing_room_msg.format(harvester=caller.name, target=target.name)
+    caller.location.broadcast.msg_contents(string, exclude=[caller], actor=caller,
+                                           collapse=target.swing_collapse_msg)
+    try:
+        depleted = target.harvest(SWING_DAMAGE)
+    except StackConflict:
+        caller.msg("Your harvest is disturbed. Try again.")
+        stop_harvesting(caller)
+        return False
+    if depleted:
+        stop_harvesting(caller)
+        return False
+    monitor.notify(caller, "harvest", {target.id: monitor.harvest_entry(target)})
+    if target.hp <= target.max_hp / 4:
+        caller.msg(target.damaged_msgs[1].format(target=target.name))
+    elif target.hp <= target.max_hp / 2:
+        caller.msg(target.damaged_msgs[0].format(target=target.name))
+    return True
 
 
 class HarvestCmdSet(CmdSet):
@@ -23,6 +69,8 @@ class HarvestCmdSet(CmdSet):
     def at_cmdset_creation(self):
         self.add(CmdStop())
         self.add(CmdChop())
+        self.add(CmdMine())
+        self.add(CmdGather())
 
 
 class CmdStop(Command):
@@ -46,25 +94,27 @@ class CmdStop(Command):
             stop_harvesting(self.caller)
 
 
-class CmdChop(Command):
+class HarvestCommand(Command):
     """
-    Chop trees.
-
-    Usage:
-      chop <target>
-
-    This will use an axe in your inventory to chop a tree.
+    Parent of the timed harvesting commands. Subclasses set the
+    harvestable typeclass they work on and their messages.
     """
-    key = "chop"
-    aliases = ["chop down"]
     help_category = "harvesting"
+    # Typeclass of the harvestables this command works on.
+    harvestable = None
+    # What to harvest, used in error messages.
+    noun = "something"
+    # Sent when the harvest is interrupted.
+    interrupt_msg = "You are interrupted and fail to finish harvesting {0}"
+    # Sent when the target can't be harvested with this command.
+    unable_msg = "You are unable to harvest {0}!"
 
     def parse(self):
         "Simple parser to get a target."
         self.target = self.args.strip()
 
     def func(self):
-        "This does the chopping!"
+        "This does the harvesting!"
 
         caller = self.caller
 
@@ -73,45 +123,82 @@ class CmdChop(Command):
             return
 
         if not self.target:
-            caller.msg("You need to specify a tree to chop!")
+            caller.msg("You need to specify {0} to {1}!".format(self.noun, self.key))
             return
 
         target = caller.search(self.target)
         if not target:
             return
 
-        if not (isinstance(target, Tree) and target.access(caller, "chop")):
-            caller.msg("You are unable to chop down {0}!".format(target.name))
+        if not (isinstance(target, self.harvestable) and target.access(caller, target.harvest_verb)):
+            caller.msg(self.unable_msg.format(target.name))
             return
 
-        # Code elsewhere may need to interrupt our tree chopping madness, such as when
+        # Code elsewhere may need to interrupt our harvesting madness, such as when
         # moving to another room. This provides a callback that gives a sensible message
         # indicating that we were interrupted unexpectedly.
         def interrupt_callback():
-            caller.msg("You are interrupted and fail to finish chopping down {0}".format(target.name))
+            caller.msg(self.interrupt_msg.format(target.name))
         caller.ndb.harvesting_interrupt = interrupt_callback
 
         caller.ndb.harvesting = True
+        caller.ndb.harvest_target = target
 
+        # The first swing happens right away, the scheduler takes care of the rest.
         try:
-            while caller.ndb.harvesting:
-                # The tree was destroyed already, exit gracefully.
-                if not target.pk:
-                    stop_harvesting(caller)
-                    return
-
-                caller.msg("Chips of wood fly everywhere as you swing your axe into {0}.".format(target.name))
-                string = "Chips of wood fly everywhere as {0} swings their axe into {1}.".format(caller.name,
-                                                                                                 target.name)
-                caller.location.msg_contents(string, exclude=[caller])
-                if target.chop(5):
-                    stop_harvesting(caller)
-                    return
-                elif target.hp <= target.max_hp / 4:
-                    caller.msg("{0} is beginning to lean heavily.".format(target.name))
-                elif target.hp <= target.max_hp / 2:
-                    caller.msg("There is a sizeable wedge in {0}".format(target.name))
-
-                yield 2
-        finally:
+            going_on = harvest_swing(caller, target)
+        except Exception:
+            # Don't leave the caller stuck harvesting.
             stop_harvesting(caller)
+            raise
+        if going_on:
+            get_harvest_scheduler().schedule(caller, target, harvest_swing, SWING_PERIOD)
+
+
+class CmdChop(HarvestCommand):
+    """
+    Chop trees.
+
+    Usage:
+      chop <target>
+
+    This will use an axe in your inventory to chop a tree.
+    """
+    key = "chop"
+    aliases = ["chop down"]
+    harvestable = Tree
+    noun = "a tree"
+    interrupt_msg = "You are interrupted and fail to finish chopping down {0}"
+    unable_msg = "You are unable to chop down {0}!"
+
+
+class CmdMine(HarvestCommand):
+    """
+    Mine ore veins.
+
+    Usage:
+      mine <target>
+
+    This will use a pick in your inventory to mine a vein of ore.
+    """
+    key = "mine"
+    harvestable = OreVein
+    noun = "an ore vein"
+    interrupt_msg = "You are interrupted and fail to finish mining {0}"
+    unable_msg = "You are unable to mine {0}!"
+
+
+class CmdGather(HarvestCommand):
+    """
+    Gather herbs.
+
+    Usage:
+      gather <target>
+
+    This will gather herbs from a herb patch.
+    """
+    key = "gather"
+    harvestable = HerbPatch
+    noun = "a herb patch"
+    interrupt_msg = "You are interrupted and fail to finish gathering from {0}"
+    unable_msg = "You are unable to gather from {0}!"
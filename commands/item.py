@@ -2,14 +2,18 @@
 Item related commands module.
 
 """
-from evennia import CmdSet
-from evennia.commands.default.muxcommand import MuxCommand
-from evennia.utils import evtable
+from commands.cmdset import CmdSet
+from commands.command import MuxCommand
+from world.bulk import bulk_move, bulk_summary, bulk_targets, parse_bulk
+from world.stacks import StackConflict
+
+# Sent when a stack kept changing while the command was moving it.
+CONFLICT_MSG = "The items shift as you reach for them. Try again."
 
 
 class ItemCmdSet(CmdSet):
     """ Command set for item related commands. """
-    key = 'harvest_cmdset'
+    key = 'item_cmdset'
     priority = 1
 
     def at_cmdset_creation(self):
@@ -24,30 +28,32 @@ class CmdInventory(MuxCommand):
     view inventory
 
     Usage:
-      inventory
+      inventory [<filter>] [page <number>]
       inv
 
-    Shows your inventory.
+    Shows your inventory, a page at a time. Give a filter
+    to only list items with names matching it, such as
+    'inv logs'.
     """
     key = "inventory"
     aliases = ["inv", "i"]
     locks = "cmd:all()"
-    arg_regex = r"$"
+    arg_regex = r"\s|$"
+
+    def parse(self):
+        super().parse()
+
+        self.page = 1
+        words = self.args.split()
+        if len(words) > 1 and words[-2].lower() == "page" and words[-1].isdigit():
+            self.page = int(words[-1])
+            words = words[:-2]
+        self.filter = " ".join(words) or None
 
     def func(self):
         """check inventory"""
-        items = self.caller.contents
-        if not items:
-            string = "You are not carrying anything."
-        else:
-            table = evtable.EvTable(border="header")
-            for item in items:
-                if item.stack.stackable:
-                    table.add_row(f"|C{item.name}|n|w(|g{item.stack.count}|w)|n", item.db.desc or "")
-                else:
-                    table.add_row(f"|C{item.name}|n", item.db.desc or "")
-            string = "|wYou are carrying:\n%s" % table
-        self.caller.msg(string)
+        self.caller.msg(self.caller.inventory.render(self.filter, self.page))
+        self.caller.inventory.send_oob()
 
 
 class CmdGet(MuxCommand):
@@ -56,9 +62,13 @@ class CmdGet(MuxCommand):
 
     Usage:
       get [amount] <obj>
+      get all
+      get all.<obj> or get all <objs>
+      get <amount>.<obj>
 
     Picks up an object from your location and puts it in
-    your inventory.
+    your inventory. The bulk forms pick up everything, or
+    everything (or a number) of a kind, at once.
     """
     key = "get"
     aliases = "grab"
@@ -88,6 +98,22 @@ class CmdGet(MuxCommand):
             caller.msg("Get what?")
             return
 
+        bulk = parse_bulk(self.args)
+        if bulk:
+            self.get_bulk(*bulk)
+            return
+
+        # Virtual stacks are picked up by moving their count, no object involved.
+        virtual = caller.location.virtual_stacks
+        prototype_key = virtual.match(self.target)
+        if prototype_key:
+            name = virtual.key(prototype_key)
+            amount = virtual.transfer(prototype_key, self.amount, caller)
+            caller.msg(f"You pick up {amount} {name}{'s' if amount > 1 else ''}.")
+            caller.location.broadcast.msg_contents(f"{caller.name} picks up {amount} {name}"
+                                                   f"{'s' if amount > 1 else ''}.", exclude=caller)
+            return
+
         obj = caller.search(self.target, location=caller.location)
 
         if not obj:
@@ -109,20 +135,48 @@ class CmdGet(MuxCommand):
             return
 
         if obj.stack.stackable:
-            obj = obj.stack.split(self.amount)
+            try:
+                obj = obj.stack.split(self.amount)
+            except StackConflict:
+                caller.msg(CONFLICT_MSG)
+                return
 
             caller.msg(f"You pick up {obj.stack.count} {obj.name}{'s' if self.amount > 1 else ''}.")
-            caller.location.msg_contents(f"{caller.name} picks up {obj.stack.count} {obj.name}"
-                                         f"{'s' if self.amount > 1 else ''}.", exclude=caller)
+            caller.location.broadcast.msg_contents(f"{caller.name} picks up {obj.stack.count} {obj.name}"
+                                                   f"{'s' if self.amount > 1 else ''}.", exclude=caller)
         else:
             caller.msg(f"You pick up {obj.name}.")
-            caller.location.msg_contents(f"{caller.name} picks up {obj.name}.", exclude=caller)
+            caller.location.broadcast.msg_contents(f"{caller.name} picks up {obj.name}.", exclude=caller)
 
         obj.move_to(caller, quiet=True)
 
         # calling at_get hook method
         obj.at_get(caller)
 
+    def get_bulk(self, amount, name):
+        """Pick up many things at once."""
+        caller = self.caller
+        objs, virtual = bulk_targets(caller.location, name, caller)
+        objs = [obj for obj in objs if obj.access(caller, 'get') and obj.at_before_get(caller)]
+        if not objs and not virtual:
+            caller.msg("There is nothing here you can get." if not name else
+                       f"There is no {name} here you can get.")
+            return
+
+        try:
+            moved_objs, moved = bulk_move(objs, virtual, caller.location, caller, amount)
+        except StackConflict:
+            caller.msg(CONFLICT_MSG)
+            return
+        if not moved:
+            caller.msg("You couldn't pick anything up.")
+            return
+        for obj in moved_objs:
+            obj.at_get(caller)
+        summary = bulk_summary(moved)
+        caller.msg(f"You pick up {summary}.")
+        caller.location.broadcast.msg_contents(f"{caller.name} picks up {summary}.", exclude=caller)
+
 
 class CmdDrop(MuxCommand):
     """
@@ -130,9 +184,13 @@ class CmdDrop(MuxCommand):
 
     Usage:
       drop [amount] <obj>
+      drop all
+      drop all.<obj> or drop all <objs>
+      drop <amount>.<obj>
 
     Lets you drop an object from your inventory into the
-    location you are currently in.
+    location you are currently in. The bulk forms drop
+    everything, or everything (or a number) of a kind, at once.
     """
 
     key = "drop"
@@ -162,6 +220,21 @@ class CmdDrop(MuxCommand):
             caller.msg("Drop what?")
             return
 
+        bulk = parse_bulk(self.args)
+        if bulk:
+            self.drop_bulk(*bulk)
+            return
+
+        virtual = caller.virtual_stacks
+        prototype_key = virtual.match(self.target)
+        if prototype_key:
+            name = virtual.key(prototype_key)
+            amount = virtual.transfer(prototype_key, self.amount, caller.location)
+            caller.msg(f"You drop {amount} {name}{'s' if amount > 1 else ''}.")
+            caller.location.broadcast.msg_contents(f"{caller.name} drops {amount} {name}"
+                                                   f"{'s' if amount > 1 else ''}.", exclude=caller)
+            return
+
         # Because the DROP command by definition looks for items
         # in inventory, call the search function using location = caller
         obj = caller.search(self.target, location=caller,
@@ -175,20 +248,48 @@ class CmdDrop(MuxCommand):
             return
 
         if obj.stack.stackable:
-            obj = obj.stack.split(self.amount)
+            try:
+                obj = obj.stack.split(self.amount)
+            except StackConflict:
+                caller.msg(CONFLICT_MSG)
+                return
             caller.msg(f"You drop {obj.stack.count} {obj.name}"
                        f"{'s' if self.amount > 1 else ''}.")
-            caller.location.msg_contents(f"{caller.name} drops {obj.stack.count} {obj.name}"
-                                         f"{'s' if self.amount > 1 else ''}.", exclude=caller)
+            caller.location.broadcast.msg_contents(f"{caller.name} drops {obj.stack.count} {obj.name}"
+                                                   f"{'s' if self.amount > 1 else ''}.", exclude=caller)
         else:
             caller.msg(f"You drop {obj.name}.")
-            caller.location.msg_contents(f"{caller.name} drops {obj.name}.", exclude=caller)
+            caller.location.broadcast.msg_contents(f"{caller.name} drops {obj.name}.", exclude=caller)
 
         obj.move_to(caller.location, quiet=True)
 
         # Call the object script's at_drop() method.
         obj.at_drop(caller)
 
+    def drop_bulk(self, amount, name):
+        """Drop many things at once."""
+        caller = self.caller
+        objs, virtual = bulk_targets(caller, name)
+        objs = [obj for obj in objs if obj.at_before_drop(caller)]
+        if not objs and not virtual:
+            caller.msg("You aren't carrying anything." if not name else
+                       f"You aren't carrying {name}.")
+            return
+
+        try:
+            moved_objs, moved = bulk_move(objs, virtual, caller, caller.location, amount)
+        except StackConflict:
+            caller.msg(CONFLICT_MSG)
+            return
+        if not moved:
+            caller.msg("You couldn't drop anything.")
+            return
+        for obj in moved_objs:
+            obj.at_drop(caller)
+        summary = bulk_summary(moved)
+        caller.msg(f"You drop {summary}.")
+        caller.location.broadcast.msg_contents(f"{caller.name} drops {summary}.", exclude=caller)
+
 
 class CmdGive(MuxCommand):
     """
@@ -196,9 +297,13 @@ class CmdGive(MuxCommand):
 
     Usage:
       give [amount] <inventory obj> <to||=> <target>
+      give all <to||=> <target>
+      give all.<obj> or all <objs> <to||=> <target>
+      give <amount>.<obj> <to||=> <target>
 
     Gives an items from your inventory to another character,
-    placing it in their inventory.
+    placing it in their inventory. The bulk forms give
+    everything, or everything (or a number) of a kind, at once.
     """
     key = "give"
     rhs_split = ("=", " to ")  # Prefer = delimiter, but allow " to " usage.
@@ -230,14 +335,30 @@ class CmdGive(MuxCommand):
             caller.msg("Usage: give [amount] <inventory object> to <target>")
             return
 
-        to_give = caller.search(self.target, location=caller,
-                                nofound_string="You aren't carrying %s." % self.lhs,
-                                multimatch_string="You carry more than one %s:" % self.lhs)
+        bulk = parse_bulk(self.lhs)
+        if bulk:
+            self.give_bulk(*bulk)
+            return
+
+        virtual = caller.virtual_stacks
+        prototype_key = virtual.match(self.target)
+        to_give = None
+        if not prototype_key:
+            to_give = caller.search(self.target, location=caller,
+                                    nofound_string="You aren't carrying %s." % self.lhs,
+                                    multimatch_string="You carry more than one %s:" % self.lhs)
         target = caller.search(self.rhs)
-        if not (to_give and target):
+        if not ((to_give or prototype_key) and target):
             return
         if target == caller:
-            caller.msg("You keep %s to yourself." % to_give.key)
+            caller.msg("You keep %s to yourself." % (to_give.key if to_give else virtual.key(prototype_key)))
+            return
+
+        if prototype_key:
+            name = virtual.key(prototype_key)
+            amount = virtual.transfer(prototype_key, self.amount, target)
+            caller.msg(f"You give {amount} {name}{'s' if amount > 1 else ''} to {target.key}.")
+            target.msg(f"{caller.key} gives you {amount} {name}{'s' if amount > 1 else ''}.")
             return
         if not to_give.location == caller:
             caller.msg("You are not holding %s." % to_give.key)
@@ -248,7 +369,11 @@ class CmdGive(MuxCommand):
             return
 
         if to_give.stack.stackable:
-            to_give = to_give.stack.split(self.amount)
+            try:
+                to_give = to_give.stack.split(self.amount)
+            except StackConflict:
+                caller.msg(CONFLICT_MSG)
+                return
             caller.msg(f"You give {to_give.stack.count} {to_give.key}{'s' if self.amount > 1 else ''}"
                        f" to {target.key}.")
             target.msg(f"{caller.key} gives you {to_give.stack.count} {to_give.name}"
@@ -262,3 +387,34 @@ class CmdGive(MuxCommand):
 
         # Call the object script's at_give() method.
         to_give.at_give(caller, target)
+
+    def give_bulk(self, amount, name):
+        """Give many things at once."""
+        caller = self.caller
+        target = caller.search(self.rhs)
+        if not target:
+            return
+        if target == caller:
+            caller.msg("You keep your things to yourself.")
+            return
+
+        objs, virtual = bulk_targets(caller, name)
+        objs = [obj for obj in objs if obj.at_before_give(caller, target)]
+        if not objs and not virtual:
+            caller.msg("You aren't carrying anything." if not name else
+                       f"You aren't carrying {name}.")
+            return
+
+        try:
+            moved_objs, moved = bulk_move(objs, virtual, caller, target, amount)
+        except StackConflict:
+            caller.msg(CONFLICT_MSG)
+            return
+        if not moved:
+            caller.msg("You couldn't give anything away.")
+            return
+        for obj in moved_objs:
+            obj.at_give(caller, target)
+        summary = bulk_summary(moved)
+        caller.msg(f"You give {summary} to {target.key}.")
+        target.msg(f"{caller.key} gives you {summary}.")
@@ -0,0 +1,279 @@
+"""
+Tests for the commands.
+
+Run them from the game directory with
+
+    evennia test --settings settings.py .
+
+"""
+import random
+import time
+from unittest import skipUnless
+from unittest.mock import patch
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from evennia import CmdSet as BaseCmdSet
+from evennia.commands.default.tests import CommandTest
+from evennia.utils import create
+from commands import cmdset
+from commands.default_cmdsets import AccountCmdSet, CharacterCmdSet, SessionCmdSet
+from commands.admin import CmdCmdStats
+from commands.harvest import CmdChop
+from commands.item import CONFLICT_MSG, CmdDrop, CmdGet, CmdGive, CmdInventory, ItemCmdSet
+from typeclasses.harvestables import Tree
+from typeclasses.objects import Object
+from typeclasses.scripts import get_harvest_scheduler
+from world import profiling
+from world.stacks import StackHandler
+from world.tests import BENCHMARK, GameTest
+
+
+class GameCommandTest(GameTest, CommandTest):
+    """
+    CommandTest with the typeclasses of this game.
+    """
+    def logs(self, *containers):
+        "Number of logs held by the containers."
+        return sum(con.stack.count for container in containers
+                   for con in self.stacks_in(container, "log"))
+
+
+class TestItemCommands(GameCommandTest):
+    "Getting, dropping and giving stacks."
+
+    def test_get_drop_give(self):
+        self.make_stack("log", 10, location=self.room1)
+        self.call(CmdGet(), "3 log", "You pick up 3 logs.")
+        self.call(CmdDrop(), "1 log", "You drop 1 log.")
+        self.call(CmdGive(), "2 log = Char2", "You give 2 logs to Char2.")
+        self.assertEqual(self.logs(self.room1), 8)
+        self.assertEqual(self.logs(self.char1), 0)
+        self.assertEqual(self.logs(self.char2), 2)
+
+    def test_conflict_is_reported(self):
+        self.make_stack("log", 10, location=self.room1)
+        with patch.object(StackHandler, "_stored_version", return_value=-1):
+            self.call(CmdGet(), "3 log", CONFLICT_MSG)
+            self.call(CmdGet(), "3.log", CONFLICT_MSG)
+        self.assertEqual(self.logs(self.room1), 10)
+        self.assertEqual(self.logs(self.char1), 0)
+
+    def test_stress_item_count_conserved(self):
+        # Characters passing logs around in random order, while other writers
+        # keep changing the stacks under them.
+        rng = random.Random(42)
+        self.make_stack("log", 500, location=self.room1)
+        containers = (self.room1, self.char1, self.char2)
+        for _ in range(3000 if BENCHMARK else 300):
+            caller, other = rng.sample((self.char1, self.char2), 2)
+            amount = rng.randint(1, 20)
+            command, args = rng.choice(((CmdGet(), f"{amount} log"), (CmdGet(), f"{amount}.log"),
+                                        (CmdDrop(), f"{amount} log"), (CmdDrop(), "all.log"),
+                                        (CmdGive(), f"{amount} log = {other.key}")))
+            self.call(command, args, caller=caller)
+            if rng.random() < 0.2:
+                stack = rng.choice([con for container in containers
+                                    for con in self.stacks_in(container, "log")])
+                # Another writer stores the stack as it is, bumping its version.
+                stack.stack.flush()
+                stored = stack.attributes.get("stack")
+                stack.attributes.add("stack", dict(stored, version=stored["version"] + 1))
+            self.assertEqual(self.logs(*containers), 500)
+
+
+class TestInventoryCommand(GameCommandTest):
+    "Paged and filtered inventory listings."
+
+    def setUp(self):
+        super().setUp()
+        for key in ("log", "plank", "nail", "rope", "stone"):
+            self.make_stack(key, 3, location=self.char1)
+
+    @patch("world.inventory.PAGE_SIZE", 2)
+    def test_pages(self):
+        listed = []
+        for page, last in ((1, 3), (2, 3), (3, 3)):
+            text = self.call(CmdInventory(), f"page {page}", "You are carrying:")
+            self.assertIn(f"Page {page} of {last}.", text)
+            listed.extend(key for key in ("log", "plank", "nail", "rope", "stone") if f"{key}(3)" in text)
+        self.assertEqual(sorted(listed), ["log", "nail", "plank", "rope", "stone"])
+        # Pages past the end show the last one.
+        self.assertIn("Page 3 of 3.", self.call(CmdInventory(), "page 9"))
+
+    def test_filter(self):
+        for term in ("log", "logs", "LOG"):
+            text = self.call(CmdInventory(), term, "You are carrying:")
+            self.assertIn("log(3)", text)
+            self.assertNotIn("plank", text)
+        self.call(CmdInventory(), "axe", "You are not carrying anything matching 'axe'.")
+        self.call(CmdInventory(), "", "You are not carrying anything.", caller=self.char2)
+
+    def test_rows_follow_changes(self):
+        self.call(CmdInventory(), "", "You are carrying:")
+        rope, stone = self.stacks_in(self.char1, "rope")[0], self.stacks_in(self.char1, "stone")[0]
+        rope.key = "hemp rope"
+        stone.db.desc = "A smooth river stone."
+        self.stacks_in(self.char1, "log")[0].move_to(self.room1, quiet=True)
+        self.make_stack("axe", location=self.room1).move_to(self.char1, quiet=True)
+        text = self.call(CmdInventory(), "", "You are carrying:")
+        self.assertIn("hemp rope(3)", text)
+        self.assertIn("A smooth river stone.", text)
+        self.assertIn("axe(1)", text)
+        self.assertNotIn("log", text)
+
+
+class TestBulkCommands(GameCommandTest):
+    "The bulk forms of get, drop and give."
+
+    def test_get_drop_give_all(self):
+        self.make_stack("log", 5, location=self.room1)
+        self.make_stack("ore", 2, location=self.room1)
+        self.call(CmdGet(), "all", "You pick up ")
+        self.assertEqual(self.logs(self.char1), 5)
+        self.call(CmdDrop(), "2.log", "You drop two logs.")
+        self.call(CmdGive(), "all logs = Char2", "You give three logs to Char2.")
+        self.assertEqual(self.logs(self.char2), 3)
+        self.assertEqual(self.logs(self.room1), 2)
+
+    @patch.object(Object, "at_get", autospec=True)
+    def test_hooks_skip_merged_stacks(self, at_get):
+        self.make_stack("log", 4, location=self.room1)
+        self.make_stack("log", 6, location=self.room1)
+        self.call(CmdGet(), "all.log", "You pick up ten logs.")
+        self.assertEqual(self.logs(self.char1), 10)
+        self.assertEqual([call[0][0].pk is not None for call in at_get.call_args_list], [True])
+
+    def test_nothing_moved(self):
+        self.make_stack("log", 5, location=self.room1)
+        with patch.object(Object, "at_before_move", return_value=False):
+            self.call(CmdGet(), "all.log", "You couldn't pick anything up.")
+
+    @skipUnless(BENCHMARK, "set BENCHMARK to run benchmarks")
+    def test_benchmark_bulk_against_single(self):
+        items = 20
+        measured = {}
+        for name in ("single", "bulk"):
+            for num in range(items):
+                create.create_object(Object, key="thing%i" % num, location=self.room1)
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                if name == "bulk":
+                    self.call(CmdGet(), "all.thing")
+                else:
+                    for num in range(items):
+                        self.call(CmdGet(), "thing%i" % num)
+                elapsed = time.perf_counter() - started
+            self.assertEqual(len([con for con in self.char1.contents
+                                  if con.key.startswith("thing")]), items)
+            measured["%s_ms" % name] = round(elapsed * 1000, 1)
+            measured["%s_queries" % name] = len(queries)
+            for con in self.char1.contents:
+                con.delete()
+        self.report("get %i things" % items, **measured)
+
+
+class TestHarvestCommands(GameCommandTest):
+    "Starting a harvest."
+
+    def setUp(self):
+        super().setUp()
+        self.tree = create.create_object(Tree, key="tree", location=self.room1)
+
+    def test_chop_swings_and_schedules(self):
+        self.call(CmdChop(), "tree", "Chips of wood fly everywhere")
+        self.assertTrue(self.char1.ndb.harvesting)
+        self.assertIn(self.char1.id, get_harvest_scheduler().ndb.slots)
+        self.call(CmdChop(), "tree", "You are already in the middle of harvesting!")
+
+    def test_failing_first_swing_stops_harvesting(self):
+        with patch("commands.harvest.harvest_swing", side_effect=ValueError("broken axe")):
+            with self.assertRaises(ValueError):
+                self.call(CmdChop(), "tree")
+        self.assertFalse(self.char1.ndb.harvesting)
+        self.assertNotIn(self.char1.id, get_harvest_scheduler().ndb.slots)
+
+
+class TestCmdStats(GameCommandTest):
+    "Profiling of command runs and showing the profiles."
+
+    def test_runs_are_profiled(self):
+        self.call(CmdInventory(), "")
+        self.call(CmdInventory(), "")
+        self.assertEqual(profiling.get_profile("inventory").calls, 2)
+        self.assertFalse(profiling._ACTIVE)
+
+    def test_cmdstats(self):
+        self.call(CmdCmdStats(), "", "No command runs recorded yet.")
+        self.call(CmdInventory(), "")
+        text = self.call(CmdCmdStats(), "", "Command profiles (queries, Attribute misses")
+        self.assertIn("inventory", text)
+        text = self.call(CmdCmdStats(), "inventory", "inventory: 1 runs")
+        self.assertIn("<= 1", text)
+        self.call(CmdCmdStats(), "drop", "No runs of 'drop' recorded.")
+        self.call(CmdCmdStats(), "/reset", "Command profiles reset.")
+        self.assertIsNone(profiling.get_profile("inventory"))
+        with patch("world.profiling.ENABLED", False):
+            self.call(CmdCmdStats(), "", "Command profiling is disabled (COMMAND_PROFILING).")
+
+    def test_web_endpoint(self):
+        self.call(CmdInventory(), "")
+        self.assertEqual(self.client.get("/cmdstats/").status_code, 302)
+        self.account.is_staff = True
+        self.account.save()
+        self.client.force_login(self.account)
+        data = self.client.get("/cmdstats/").json()
+        self.assertTrue(data["enabled"])
+        self.assertEqual([profile["key"] for profile in data["commands"]], ["inventory"])
+        self.assertEqual(data["commands"][0]["calls"], 1)
+
+
+class TestCmdSetMerge(GameTest):
+    "Sharing of cmdset merges."
+
+    def setUp(self):
+        super().setUp()
+        cmdset._MERGED.clear()
+
+    @staticmethod
+    def stack():
+        "The cmdsets of a puppeted character, merged."
+        return SessionCmdSet() + AccountCmdSet() + CharacterCmdSet()
+
+    def test_merges_are_shared(self):
+        merged = self.stack()
+        self.assertIs(self.stack(), merged)
+        stock = BaseCmdSet.__add__(BaseCmdSet.__add__(SessionCmdSet(), AccountCmdSet()),
+                                   CharacterCmdSet())
+        self.assertEqual(sorted(cmd.key for cmd in merged), sorted(cmd.key for cmd in stock))
+
+    def test_merge_options_are_part_of_the_key(self):
+        merged = CharacterCmdSet() + AccountCmdSet()
+        for option, value in (("no_exits", True), ("no_objs", True), ("duplicates", True),
+                              ("key_mergetypes", {"DefaultAccount": "Replace"})):
+            with self.subTest(option=option):
+                character = CharacterCmdSet()
+                setattr(character, option, value)
+                self.assertIsNot(character + AccountCmdSet(), merged)
+        character = CharacterCmdSet()
+        character.no_exits = True
+        self.assertTrue((AccountCmdSet() + character).no_exits)
+
+    def test_merges_are_opt_in(self):
+        self.assertFalse(ItemCmdSet.cacheable)
+        self.assertIsNot(CharacterCmdSet() + ItemCmdSet(), CharacterCmdSet() + ItemCmdSet())
+        self.assertFalse(cmdset._MERGED)
+
+    @skipUnless(BENCHMARK, "set BENCHMARK to run benchmarks")
+    def test_benchmark_1k_characters(self):
+        characters = 1000
+        measured = {}
+        for name, merge in (("evennia", BaseCmdSet.__add__), ("shared", cmdset.merge)):
+            cmdset._MERGED.clear()
+            stacks = [(SessionCmdSet(), AccountCmdSet(), CharacterCmdSet()) for _ in range(characters)]
+            started = time.perf_counter()
+            merged = [merge(merge(session, account), character) for session, account, character in stacks]
+            measured[f"{name}_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            measured[f"{name}_cmdsets"] = len({id(cmdset_c) for cmdset_c in merged})
+            measured[f"{name}_commands"] = len({id(cmd) for cmdset_c in merged for cmd in cmdset_c})
+        self.report(f"cmdset merges of {characters} characters", **measured)
+        self.assertEqual(measured["shared_cmdsets"], 1)
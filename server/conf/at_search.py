@@ -23,7 +23,17 @@ line to your settings file:
 
     SEARCH_AT_RESULT = "server.conf.at_search.at_search_result"
 
+Searches of what a character carries and what is around it are resolved
+in memory by the name indexes of `world.names` before they get here, so
+the matches listed on a multimatch come without database queries. The
+messages are the same as Evennia's. Either of "2-log" and "2.log" then
+picks the second match (see `SEARCH_MULTIMATCH_REGEX`).
+
 """
+from django.conf import settings
+from django.utils.translation import gettext as _
+
+_MULTIMATCH_TEMPLATE = settings.SEARCH_MULTIMATCH_TEMPLATE
 
 
 def at_search_result(matches, caller, query="", quiet=False, **kwargs):
@@ -52,3 +62,27 @@ def at_search_result(matches, caller, query="", quiet=False, **kwargs):
             already have happened.
 
     """
+    error = ""
+    if not matches:
+        # no results.
+        error = kwargs.get("nofound_string") or _("Could not find '%s'." % query)
+        matches = None
+    elif len(matches) > 1:
+        error = kwargs.get("multimatch_string") or \
+            _("More than one match for '%s' (please narrow target):\n" % query)
+        for num, result in enumerate(matches):
+            # Commands have a list of aliases rather than an AliasHandler.
+            aliases = result.aliases.all() if hasattr(result.aliases, "all") else result.aliases
+            error += _MULTIMATCH_TEMPLATE.format(
+                number=num + 1,
+                name=result.get_display_name(caller) if hasattr(result, "get_display_name") else query,
+                aliases=" [%s]" % ";".join(aliases) if aliases else "",
+                info=result.get_extra_info(caller))
+        matches = None
+    else:
+        # exactly one match
+        matches = matches[0]
+
+    if error and not quiet:
+        caller.msg(error.strip())
+    return matches
@@ -15,6 +15,10 @@ at_server_cold_start()
 at_server_cold_stop()
 
 """
+from django.conf import settings
+from typeclasses import harvestables
+from typeclasses.scripts import get_harvest_scheduler, get_respawn_script
+from world import inline, stacks, stats, templates
 
 
 def at_server_start():
@@ -22,7 +26,30 @@ def at_server_start():
     This is called every time the server starts up, regardless of
     how it was shut down.
     """
-    pass
+    from evennia import TICKER_HANDLER
+
+    # Compile the prototypes spawned at runtime, such as harvest drops.
+    templates.compile_templates()
+
+    # Parse inlinefuncs in outgoing text through a cache.
+    if settings.INLINEFUNC_ENABLED:
+        inline.install()
+
+    # Make sure felled harvestables keep coming back.
+    get_respawn_script()
+
+    # Periodically write back item stack counts changed in memory.
+    TICKER_HANDLER.add(stacks.FLUSH_INTERVAL, stacks.flush_stacks,
+                       idstring="stack_flush", persistent=False)
+    # Periodically checkpoint the hit points of harvestables.
+    TICKER_HANDLER.add(harvestables.CHECKPOINT_INTERVAL, harvestables.flush_harvestables,
+                       idstring="harvest_checkpoint", persistent=False)
+    # Count the world once, keep the counts for MSSP current and recount
+    # them now and then in case something was missed.
+    stats.reconcile()
+    TICKER_HANDLER.add(stats.WRITE_INTERVAL, stats.save, idstring="stats_write", persistent=False)
+    TICKER_HANDLER.add(stats.RECONCILE_INTERVAL, stats.reconcile,
+                       idstring="stats_reconcile", persistent=False)
 
 
 def at_server_stop():
@@ -44,7 +71,11 @@ def at_server_reload_stop():
     """
     This is called only time the server stops before a reload.
     """
-    pass
+    # Harvests in progress carry on after the reload.
+    get_harvest_scheduler().save_pending()
+    stacks.flush_stacks()
+    harvestables.flush_harvestables()
+    stats.save()
 
 
 def at_server_cold_start():
@@ -60,4 +91,6 @@ def at_server_cold_stop():
     This is called only when the server goes down due to a shutdown or
     reset.
     """
-    pass
+    stacks.flush_stacks()
+    harvestables.flush_harvestables()
+    stats.save()
@@ -23,6 +23,15 @@ three elements being the parsed cmdname (lower case), the remaining
 arguments, and the matched cmdobject from the cmdset.
 
 
+This parser returns the same matches as Evennia's default one, but
+instead of comparing the input against every key and alias in the merged
+cmdset, it looks up the start of the input in an index of the command
+names. Only as many lookups are needed as there are distinct command name
+lengths. The index of a merged cmdset is built the first time it is parsed
+against and kept with it for as long as the cmdset lives, as Evennia reuses
+merged cmdsets until the cmdsets going into them change. A cmdset that
+gains or loses commands gets its index rebuilt.
+
 This module is not accessed by default. To tell Evennia to use it
 instead of the default command parser, add the following line to
 your settings file:
@@ -30,6 +39,102 @@ your settings file:
     COMMAND_PARSER = "server.conf.cmdparser.cmdparser"
 
 """
+from weakref import WeakKeyDictionary
+from django.conf import settings
+from evennia.commands.cmdparser import create_match, try_num_differentiators
+from evennia.utils.logger import log_trace
+
+_CMD_IGNORE_PREFIXES = settings.CMD_IGNORE_PREFIXES
+# (number of commands, indexes) of merged cmdsets.
+_INDEXES = WeakKeyDictionary()
+
+
+class CmdIndex:
+    """
+    Index of the command names of a cmdset.
+
+    Args:
+        entries (list): (cmdname, raw_cmdname, cmd) tuples in cmdset order.
+    """
+    __slots__ = ('names', 'lengths')
+
+    def __init__(self, entries):
+        self.names = {}
+        for order, (cmdname, raw_cmdname, cmd) in enumerate(entries):
+            self.names.setdefault(cmdname.lower(), []).append((order, cmdname, raw_cmdname, cmd))
+        self.lengths = sorted({len(name) for name in self.names})
+
+    def matches(self, raw_string):
+        """
+        Match the start of the input against the command names.
+
+        Args:
+            raw_string (str): The input.
+
+        Returns:
+            matches (list): Match tuples created by `create_match`, in
+                cmdset order.
+        """
+        l_raw_string = raw_string.lower()
+        found = []
+        for length in self.lengths:
+            if length > len(l_raw_string):
+                break
+            for entry in self.names.get(l_raw_string[:length], ()):
+                cmd = entry[3]
+                if not cmd.arg_regex or cmd.arg_regex.match(l_raw_string[length:]):
+                    found.append(entry)
+        found.sort(key=lambda entry: entry[0])
+        return [create_match(cmdname, raw_string, cmd, raw_cmdname)
+                for _, cmdname, raw_cmdname, cmd in found]
+
+
+def _strip(cmdname):
+    return cmdname.lstrip(_CMD_IGNORE_PREFIXES) if len(cmdname) > 1 else cmdname
+
+
+def get_indexes(cmdset):
+    """
+    Get the indexes of a merged cmdset, building them if needed.
+
+    Returns:
+        indexes (tuple): Index of the names as they are, and index of the
+            names with the ignored prefixes stripped.
+    """
+    size, indexes = _INDEXES.get(cmdset, (None, None))
+    if size == len(cmdset.commands):
+        return indexes
+    names = [(raw_cmdname, cmd) for cmd in cmdset for raw_cmdname in [cmd.key] + list(cmd.aliases)]
+    indexes = (CmdIndex([(raw_cmdname, raw_cmdname, cmd) for raw_cmdname, cmd in names if raw_cmdname]),
+               CmdIndex([(_strip(raw_cmdname), raw_cmdname, cmd) for raw_cmdname, cmd in names
+                         if _strip(raw_cmdname)]))
+    _INDEXES[cmdset] = (len(cmdset.commands), indexes)
+    return indexes
+
+
+def build_matches(raw_string, cmdset, include_prefixes=False):
+    """
+    Build match tuples by matching raw_string against available commands.
+
+    Args:
+        raw_string (str): Input string that can look in any way; the only assumption is
+            that the sought command's name/alias must be *first* in the string.
+        cmdset (CmdSet): The current cmdset to pick Commands from.
+        include_prefixes (bool): If set, include prefixes like @, ! etc (specified in settings)
+            in the match, otherwise strip them before matching.
+
+    Returns:
+        matches (list) A list of match tuples created by `cmdparser.create_match`.
+
+    """
+    try:
+        full, stripped = get_indexes(cmdset)
+        if include_prefixes:
+            return full.matches(raw_string)
+        return stripped.matches(_strip(raw_string))
+    except Exception:
+        log_trace("cmdhandler error. raw_input:%s" % raw_string)
+    return []
 
 
 def cmdparser(raw_string, cmdset, caller, match_index=None):
@@ -52,4 +157,58 @@ def cmdparser(raw_string, cmdset, caller, match_index=None):
             (possibly) separate multiple matches.
 
     """
-    # Your implementation here
+    if not raw_string:
+        return []
+
+    # find matches, first using the full name
+    matches = build_matches(raw_string, cmdset, include_prefixes=True)
+
+    if not matches or len(matches) > 1:
+        # no single match, try parsing for optional numerical tags like 1-cmd
+        # or cmd-2, cmd.2 etc
+        match_index, new_raw_string = try_num_differentiators(raw_string)
+        if match_index is not None:
+            matches.extend(build_matches(new_raw_string, cmdset, include_prefixes=True))
+
+    if not matches and _CMD_IGNORE_PREFIXES:
+        # still no match. Try to strip prefixes
+        raw_string = _strip(raw_string)
+        matches = build_matches(raw_string, cmdset, include_prefixes=False)
+
+    # only select command matches we are actually allowed to call.
+    matches = [match for match in matches if match[2].access(caller, "cmd")]
+
+    # try to bring the number of matches down to 1
+    if len(matches) > 1:
+        # See if it helps to analyze the match with preserved case but only if
+        # it leaves at least one match.
+        trimmed = [match for match in matches if raw_string.startswith(match[0])]
+        if trimmed:
+            matches = trimmed
+
+    if len(matches) > 1:
+        # we still have multiple matches. Sort them by count quality.
+        matches = sorted(matches, key=lambda m: m[3])
+        # only pick the matches with highest count quality
+        quality = [mat[3] for mat in matches]
+        matches = matches[-quality.count(quality[-1]):]
+
+    if len(matches) > 1:
+        # still multiple matches. Fall back to ratio-based quality.
+        matches = sorted(matches, key=lambda m: m[4])
+        # only pick the highest rated ratio match
+        quality = [mat[4] for mat in matches]
+        matches = matches[-quality.count(quality[-1]):]
+
+    if len(matches) > 1 and match_index is not None:
+        # We couldn't separate match by quality, but we have an
+        # index argument to tell us which match to use.
+        if 0 < match_index <= len(matches):
+            matches = [matches[match_index - 1]]
+        else:
+            # we tried to give an index outside of the range - this means
+            # a no-match
+            matches = []
+
+    # no matter what we have at this point, we have to return it.
+    return matches
@@ -43,8 +43,17 @@ internally by Evennia, notably to send the `session` keyword to
 the function; this is the session of the object viewing the string
 and can be used to customize it to each session.
 
+Outgoing text is parsed through the cache in `world.inline`. Strings
+calling only pure inlinefuncs, whose result depends on nothing but their
+arguments and the session's display flags, are parsed once and then
+reused. Mark such inlinefuncs with `world.inline.pure`.
+
 """
 
+# from world.inline import pure
+#
+#
+# @pure
 # def capitalize(text, *args, **kwargs):
 #    "Silly capitalize example. Used as {capitalize() ... {/capitalize"
 #    session = kwargs.get("session")
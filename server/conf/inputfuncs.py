@@ -25,6 +25,29 @@ as argument.
     default(session, cmdname, *args, **kwargs)
 
 """
+from world import monitor
+
+
+def monitor_state(session, *args, **kwargs):
+    """
+    Subscribe to state changes of the puppeted character, pushed as OOB
+    commands holding deltas, see `world.monitor`.
+
+    Args:
+        session (Session): The subscribing Session.
+        args (list of str): Topics to subscribe to, out of "inventory",
+            "harvest" and "room". All of them if none are given.
+
+    Keyword Args:
+        stop (bool): Unsubscribe from the topics instead.
+
+    """
+    topics = [topic for topic in args if topic in monitor.TOPICS] if args else monitor.TOPICS
+    if kwargs.get("stop"):
+        monitor.unsubscribe(session, topics)
+    else:
+        monitor.subscribe(session, topics)
+
 
 # def oob_echo(session, *args, **kwargs):
 #     """
@@ -18,6 +18,12 @@ returning False.
 Lock functions in this module extend (and will overload same-named)
 lock functions from evennia.locks.lockfuncs.
 
+Lock strings are compiled and their results cached by
+`world.locks.LockHandler`, which lives outside this module since every
+callable here becomes a lock function. Lock functions should therefore
+give the same result for the same objects within a server tick, or call
+`world.locks.clear_lock_cache()` when what they depend on changes.
+
 """
 
 # def myfalse(accessing_obj, accessed_obj, *args, **kwargs):
@@ -11,7 +11,13 @@ if so needed. You need to @reload the game before updated
 information is made available to crawlers (reloading does not
 affect uptime).
 
+The world size fields (OBJECTS, ROOMS, EXITS and DBSIZE) are live: they
+are read from the counts the server keeps in `world.stats`, so crawlers
+never cause database queries.
+
 """
+from functools import partial
+from world import stats
 
 MSSPTable = {
 
@@ -52,8 +58,8 @@ MSSPTable = {
     "AREAS": "0",
     "HELPFILES": "0",
     "MOBILES": "0",
-    "OBJECTS": "0",
-    "ROOMS": "0",      # use 0 if room-less
+    "OBJECTS": partial(stats.read, "OBJECTS"),
+    "ROOMS": partial(stats.read, "ROOMS"),      # use 0 if room-less
     "CLASSES": "0",      # use 0 if class-less
     "LEVELS": "0",      # use 0 if level-less
     "RACES": "0",      # use 0 if race-less
@@ -64,7 +70,7 @@ MSSPTable = {
     "ANSI": "1",
     "GMCP": "1",
     "ATCP": "0",
-    "MCCP": "0",
+    "MCCP": "1",
     "MCP": "0",
     "MSDP": "0",
     "MSP": "0",
@@ -90,8 +96,8 @@ MSSPTable = {
 
     # World
 
-    "DBSIZE": "0",
-    "EXITS": "0",
+    "DBSIZE": partial(stats.read, "DBSIZE"),
+    "EXITS": partial(stats.read, "EXITS"),
     "EXTRA DESCRIPTIONS": "0",
     "MUDPROGS": "0",
     "MUDTRIGS": "0",
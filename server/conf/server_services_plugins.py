@@ -12,7 +12,11 @@ call this function with the main Server application (so your services
 can be added to it). The function should not return anything. Plugin
 services are started last in the Server startup process.
 
+The game adds the metrics services of `world.metrics` here, which
+sample the server and serve the samples to local connections.
+
 """
+from world import metrics
 
 
 def start_plugin_services(server):
@@ -21,4 +25,6 @@ def start_plugin_services(server):
 
     server - a reference to the main server application.
     """
-    pass
+    if metrics.ENABLED:
+        for metrics_service in metrics.make_services():
+            metrics_service.setServiceParent(server.services)
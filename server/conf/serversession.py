@@ -19,9 +19,23 @@ settings file:
 
     SERVER_SESSION_CLASS = "server.conf.serversession.ServerSession"
 
-"""
+Plain text sent to a session is buffered for `SESSION_FLUSH_WINDOW`
+seconds and then sent to the portal as a single frame, so the many small
+messages of a busy moment (harvesting swings, room broadcasts, command
+replies) cost one send and one socket write instead of one each. Anything
+else, such as OOB data or text with options, flushes the buffer and goes
+out right away so the order of output is kept. The buffer is flushed when
+the session disconnects, and text sent after that goes out unbuffered.
+Compression is negotiated per telnet connection by the portal (MCCP),
+which compresses the larger coalesced frames better too.
 
+"""
+from django.conf import settings
 from evennia.server.serversession import ServerSession as BaseServerSession
+from evennia.utils import delay
+from world import monitor
+
+_FLUSH_WINDOW = getattr(settings, "SESSION_FLUSH_WINDOW", 0.05)
 
 
 class ServerSession(BaseServerSession):
@@ -33,4 +47,65 @@ class ServerSession(BaseServerSession):
     to the game server. All communication between game and account goes
     through their session(s).
     """
-    pass
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._output = []
+        self._flush_pending = False
+        self._disconnected = False
+
+    @staticmethod
+    def _plain_text(kwargs):
+        "The text of an output that is only plain text, else None."
+        if set(kwargs) - {"text", "options"} or kwargs.get("options"):
+            return None
+        text = kwargs.get("text")
+        if isinstance(text, (tuple, list)):
+            if len(text) == 2 and isinstance(text[1], dict):
+                if text[1]:
+                    return None
+                text = text[0]
+            elif len(text) == 1:
+                text = text[0]
+            else:
+                return None
+            if isinstance(text, (tuple, list)):
+                text = text[0] if len(text) == 1 else None
+        return text if isinstance(text, str) else None
+
+    def data_out(self, **kwargs):
+        """
+        Sending data from Evennia->Client, buffering plain text for the
+        flush window.
+
+        Keyword Args:
+            text (str or tuple)
+            any (str or tuple): Send-commands identified
+                by their keys. Or "options", carrying options
+                for the protocol(s).
+
+        """
+        buffered = _FLUSH_WINDOW > 0 and not self._disconnected
+        text = self._plain_text(kwargs) if buffered else None
+        if text is None:
+            self.flush_output()
+            super().data_out(**kwargs)
+            return
+        self._output.append(text)
+        if not self._flush_pending:
+            self._flush_pending = True
+            delay(_FLUSH_WINDOW, self.flush_output)
+
+    def flush_output(self):
+        "Send all buffered text as one frame."
+        self._flush_pending = False
+        if self._output and not self._disconnected:
+            text = "\n".join(self._output)
+            self._output = []
+            super().data_out(text=text)
+
+    def at_disconnect(self, reason=None):
+        "Send the buffered text and drop the state monitor subscriptions."
+        self.flush_output()
+        self._disconnected = True
+        monitor.unsubscribe(self)
+        super().at_disconnect(reason)
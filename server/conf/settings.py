@@ -33,6 +33,144 @@ from evennia.settings_default import *
 
 # This is the name of your game. Make it catchy!
 SERVERNAME = "mud"
+# Use the game's ServerSession, which coalesces output.
+SERVER_SESSION_CLASS = "server.conf.serversession.ServerSession"
+# Seconds plain text output is buffered for before going to the client
+# as one frame. 0 sends every message immediately.
+SESSION_FLUSH_WINDOW = 0.05
+# Parse commands with an index of the command names.
+COMMAND_PARSER = "server.conf.cmdparser.cmdparser"
+# Build the default commands on the game's MuxCommand, so they are
+# profiled like the game's own commands.
+COMMAND_DEFAULT_CLASS = "commands.command.MuxCommand"
+# Search results are handled by the game, and "2.log" picks the second
+# log as well as "2-log".
+SEARCH_AT_RESULT = "server.conf.at_search.at_search_result"
+SEARCH_MULTIMATCH_REGEX = r"(?P<number>[0-9]+)[-.](?P<name>.*)"
+
+######################################################################
+# Item stacks
+######################################################################
+
+# Keep stack counts in memory and write them back in batches instead of
+# saving the `stack` Attribute on every change.
+STACK_WRITE_BACK = True
+# Seconds between batched write-backs of changed stacks.
+STACK_FLUSH_INTERVAL = 10
+# A stack that has been unsaved for this many seconds is written out on its
+# next change. This bounds what a crash can lose; 0 writes every change.
+STACK_MAX_DIRTY_AGE = 30
+# How often split/merge/consume are retried when a stack was changed
+# concurrently before giving up with a StackConflict.
+STACK_MAX_RETRIES = 3
+# Split prototype-based stacks with a single create call instead of a full
+# copy of the object.
+STACK_FAST_SPLIT = True
+# Hold crafting components as per-container counts instead of one object
+# per stack. They turn into real objects when something searches for them.
+VIRTUAL_STACKS = False
+
+######################################################################
+# Room broadcasts
+######################################################################
+
+# Seconds room messages are gathered for before each receiver gets them
+# as one merged message. 0 sends every message immediately.
+BROADCAST_WINDOW = 0.5
+# Collapse messages sharing a template into one line ("5 people are
+# chopping trees.") once this many actors sent one in the same window.
+BROADCAST_COLLAPSE_THRESHOLD = 3
+
+######################################################################
+# Harvesting
+######################################################################
+
+# Resolution in seconds of the HarvestScheduler driving timed harvests.
+HARVEST_TICK = 1
+# Seconds between checkpoints of the in-memory hit points of harvestables.
+# A crash loses the damage done since the last checkpoint.
+HARVEST_CHECKPOINT_INTERVAL = 60
+# Seconds between checks for depleted harvestables due to respawn.
+HARVEST_RESPAWN_TICK = 10
+# Respawn delay in seconds per harvestable prototype key. Harvestables
+# not listed use the respawn_delay of their typeclass.
+HARVEST_RESPAWN_DELAYS = {}
+# Maximum number of live harvestables of each typeclass per zone, where a
+# zone is a room tag of category "zone", e.g. {"forest": 30}. A key of
+# (typeclass path, zone) caps only that typeclass there, e.g.
+# {("typeclasses.harvestables.Tree", "forest"): 20}.
+HARVEST_ZONE_CAPS = {}
+
+######################################################################
+# Inventory
+######################################################################
+
+# Rows shown per page of the inventory command.
+INVENTORY_PAGE_SIZE = 20
+
+######################################################################
+# Profiling
+######################################################################
+
+# Record the wall time, queries, Attribute cache misses and bytes sent
+# of every command run, shown by the cmdstats command and served as JSON
+# at /cmdstats/ to staff.
+COMMAND_PROFILING = True
+# Seed of the command mix run by the loadgen command and load test, and
+# the file their baseline results are stored in.
+LOADGEN_SEED = 1
+LOADGEN_BASELINE = os.path.join(GAME_DIR, "server", "loadgen_baseline.json")
+
+######################################################################
+# State monitor
+######################################################################
+
+# Seconds changes pushed to monitor_state subscribers are collected for;
+# 0 sends them on the server's next tick.
+MONITOR_WINDOW = 0
+
+######################################################################
+# Inlinefuncs
+######################################################################
+
+# Strings whose inlinefunc calls and results are cached, and the
+# inlinefuncs that are pure enough to have their results cached (see
+# world/inline.py). Only used with INLINEFUNC_ENABLED.
+INLINEFUNC_CACHE_SIZE = 1024
+INLINEFUNC_PURE = ("pad", "crop", "space", "clr")
+
+######################################################################
+# Game statistics
+######################################################################
+
+# The world size counted in memory for MSSP and the stats command is
+# written for the portal to this file at most every STATS_WRITE_INTERVAL
+# seconds, and recounted from the database every STATS_RECONCILE_INTERVAL.
+STATS_FILE = os.path.join(GAME_DIR, "server", "stats.json")
+STATS_WRITE_INTERVAL = 60
+STATS_RECONCILE_INTERVAL = 3600
+
+######################################################################
+# Locks
+######################################################################
+
+# Seconds lock check results are cached for; 0 keeps them until the
+# server's next tick.
+LOCK_CACHE_WINDOW = 0
+
+######################################################################
+# Server metrics
+######################################################################
+
+# Sample reactor lag, cached objects, the Attribute cache hit rate and the
+# command rate every METRICS_INTERVAL seconds, keeping METRICS_BUFFER_SIZE
+# samples, served as text to local connections on METRICS_PORT. Captures
+# of the profile command are saved in METRICS_PROFILE_DIR.
+METRICS_ENABLED = True
+METRICS_INTERVAL = 5
+METRICS_BUFFER_SIZE = 720
+METRICS_PORT = 4010
+METRICS_PROFILE_DIR = LOG_DIR
 
 
 ######################################################################
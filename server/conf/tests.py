@@ -0,0 +1,162 @@
+"""
+Tests for the server configuration.
+
+Run them from the game directory with
+
+    evennia test --settings settings.py .
+
+"""
+import json
+import os
+import pickle
+import tempfile
+import time
+from unittest import skipUnless
+from unittest.mock import patch
+from evennia.commands import cmdparser as base_cmdparser
+from evennia.commands.default.general import CmdLook
+from evennia.server.serversession import ServerSession as BaseServerSession
+from commands.default_cmdsets import CharacterCmdSet
+from server.conf import cmdparser, inputfuncs, mssp
+from server.conf.serversession import ServerSession
+from world import monitor
+from world.tests import BENCHMARK, GameTest
+
+# Input lines covering exact names, aliases, prefixes, numbered matches and misses.
+_LINES = ("look", "l", "LOOK here", "look-2", "2-look", "lo", "@look", "inventory", "i", "inv",
+          "get 3 log", "Get log", "drop all logs", "give log to Char2", "chop tree", "stop",
+          "@tel here", "tel here", "py 1+1", "@py", "say hi", "'hi", ":waves", "who", "nick x=y",
+          "help look", "&", "@", "nosuchcommand", "l2", "looking", "   ", "1-nosuch")
+
+
+@patch("server.conf.serversession.delay")
+@patch.object(BaseServerSession, "data_out", autospec=True)
+class TestOutputBuffer(GameTest):
+    "Coalescing of the plain text sent to a session."
+
+    def setUp(self):
+        super().setUp()
+        self.buffered = ServerSession()
+
+    @staticmethod
+    def frames(mock_data_out):
+        "The outputs sent on to the portal."
+        return [kwargs for _, kwargs in mock_data_out.call_args_list]
+
+    def test_text_is_sent_as_one_frame(self, mock_data_out, mock_delay):
+        self.buffered.data_out(text="You swing.")
+        self.buffered.data_out(text=("The tree shakes.", {}))
+        mock_data_out.assert_not_called()
+        mock_delay.assert_called_once()
+        mock_delay.call_args[0][1]()
+        self.assertEqual(self.frames(mock_data_out), [{"text": "You swing.\nThe tree shakes."}])
+
+    def test_other_output_flushes_first(self, mock_data_out, mock_delay):
+        self.buffered.data_out(text="You swing.")
+        self.buffered.data_out(text=("The tree falls.", {"type": "say"}))
+        self.assertEqual(self.frames(mock_data_out),
+                         [{"text": "You swing."}, {"text": ("The tree falls.", {"type": "say"})}])
+
+    @patch.object(BaseServerSession, "at_disconnect")
+    def test_disconnect_flushes(self, mock_at_disconnect, mock_data_out, mock_delay):
+        self.buffered.data_out(text="Goodbye!")
+        mock_at_disconnect.side_effect = lambda reason=None: self.assertEqual(
+            self.frames(mock_data_out), [{"text": "Goodbye!"}])
+        self.buffered.at_disconnect("quit")
+        mock_at_disconnect.assert_called_once_with("quit")
+        # The flush still pending sends nothing, later text goes out unbuffered.
+        mock_delay.call_args[0][1]()
+        self.buffered.data_out(text="Late.")
+        self.assertEqual(self.frames(mock_data_out), [{"text": "Goodbye!"}, {"text": "Late."}])
+
+    def test_buffering_saves_sends_and_bytes(self, mock_data_out, mock_delay):
+        lines = [f"You swing at the tree ({num})." for num in range(100)]
+        results = {}
+        for name, window in (("unbuffered", 0), ("buffered", 0.05)):
+            mock_data_out.reset_mock()
+            with patch("server.conf.serversession._FLUSH_WINDOW", window):
+                session = ServerSession()
+                for line in lines:
+                    session.data_out(text=line)
+                session.flush_output()
+            # Each output is one message to the portal and one socket write.
+            frames = self.frames(mock_data_out)
+            results[name] = (len(frames), sum(len(pickle.dumps(frame)) for frame in frames))
+        if BENCHMARK:
+            self.report("session output", **{f"{name}_{field}": value for name, sent in results.items()
+                                             for field, value in zip(("sends", "bytes"), sent)})
+        self.assertEqual(results["unbuffered"][0], 100)
+        self.assertEqual(results["buffered"][0], 1)
+        self.assertLess(results["buffered"][1], results["unbuffered"][1])
+
+
+class TestCmdParser(GameTest):
+    "The indexed command parser."
+
+    def setUp(self):
+        super().setUp()
+        self.cmdset = CharacterCmdSet()
+
+    def test_matches_evennia_parser(self):
+        for line in _LINES:
+            with self.subTest(line=line):
+                self.assertEqual(cmdparser.cmdparser(line, self.cmdset, self.char1),
+                                 base_cmdparser.cmdparser(line, self.cmdset, self.char1))
+
+    def test_index_is_kept_with_the_cmdset(self):
+        indexes = cmdparser.get_indexes(self.cmdset)
+        self.assertIs(cmdparser.get_indexes(self.cmdset), indexes)
+        self.assertIsNot(cmdparser.get_indexes(CharacterCmdSet()), indexes)
+
+    def test_changed_cmdset_is_reindexed(self):
+        cmdparser.cmdparser("look", self.cmdset, self.char1)
+        glance = CmdLook()
+        glance.key, glance.aliases = "glance", []
+        self.cmdset.add(glance)
+        matches = cmdparser.cmdparser("glance", self.cmdset, self.char1)
+        self.assertEqual([match[2] for match in matches], [glance])
+
+    @skipUnless(BENCHMARK, "set BENCHMARK to run benchmarks")
+    def test_benchmark_parse(self):
+        repeat = 2000
+        measured = {}
+        for name, parse in (("evennia", base_cmdparser.cmdparser), ("indexed", cmdparser.cmdparser)):
+            started = time.perf_counter()
+            for _ in range(repeat):
+                for line in _LINES:
+                    parse(line, self.cmdset, self.char1)
+            measured[f"{name}_per_sec"] = round(repeat * len(_LINES) / (time.perf_counter() - started))
+        self.report("command parsing", **measured)
+
+
+class TestMonitorState(GameTest):
+    "The monitor_state inputfunc."
+
+    def tearDown(self):
+        monitor.unsubscribe(self.session)
+        super().tearDown()
+
+    def test_subscribe_and_stop(self):
+        inputfuncs.monitor_state(self.session, "inventory", "nosuchtopic")
+        self.assertEqual(self.session.ndb.monitored, {"inventory"})
+        inputfuncs.monitor_state(self.session)
+        self.assertEqual(self.session.ndb.monitored, set(monitor.TOPICS))
+        inputfuncs.monitor_state(self.session, "room", "harvest", stop=True)
+        self.assertEqual(self.session.ndb.monitored, {"inventory"})
+        inputfuncs.monitor_state(self.session, stop=True)
+        self.assertEqual(self.session.ndb.monitored, set())
+
+
+class TestMSSP(GameTest):
+    "The live world size fields of the MSSP table."
+
+    def test_fields_read_the_stats_file(self):
+        counts = {"ROOMS": 3, "EXITS": 4, "OBJECTS": 12, "DBSIZE": 4096}
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, "stats.json")
+            with open(path, "w") as fil:
+                json.dump(counts, fil)
+            with patch("world.stats.STATS_FILE", path), patch("world.stats._read_at", 0), \
+                    patch("world.stats._READ", {}):
+                for field, count in counts.items():
+                    self.assertEqual(mssp.MSSPTable[field](), str(count))
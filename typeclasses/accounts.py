@@ -23,6 +23,8 @@ several more options for customizing the Guest account system.
 """
 
 from evennia import DefaultAccount, DefaultGuest
+from evennia.utils import lazy_property
+from world.locks import AttributeHandler, LockHandler, PermissionHandler, TagHandler
 
 
 class Account(DefaultAccount):
@@ -91,7 +93,25 @@ class Account(DefaultAccount):
      at_server_shutdown()
 
     """
-    pass
+    @lazy_property
+    def locks(self):
+        """ LockHandler that compiles and caches lock checks. """
+        return LockHandler(self)
+
+    @lazy_property
+    def permissions(self):
+        """ PermissionHandler that clears cached lock checks on change. """
+        return PermissionHandler(self)
+
+    @lazy_property
+    def tags(self):
+        """ TagHandler that clears cached lock checks on change. """
+        return TagHandler(self)
+
+    @lazy_property
+    def attributes(self):
+        """ AttributeHandler that clears cached lock checks on change. """
+        return AttributeHandler(self)
 
 
 class Guest(DefaultGuest):
@@ -10,6 +10,7 @@ creation commands.
 from evennia import DefaultCharacter
 from typeclasses.objects import Object
 from commands.harvest import stop_harvesting
+from world import monitor
 
 
 class Character(Object, DefaultCharacter):
@@ -35,6 +36,7 @@ class Character(Object, DefaultCharacter):
     def at_init(self):
         # Is the player currently harvesting a resource?
         self.ndb.harvesting = False
+        self.ndb.harvest_target = None
         # If harvesting is interrupted, such as by moving to a different room,
         # a callback may be supplied that can be called upon interruption.
         self.ndb.harvesting_interrupt = None
@@ -47,3 +49,8 @@ class Character(Object, DefaultCharacter):
                 self.ndb.harvesting_interrupt()
             stop_harvesting(self)
         return True
+
+    def at_post_puppet(self, **kwargs):
+        super().at_post_puppet(**kwargs)
+        # Sessions subscribed with monitor_state before puppeting get our state.
+        monitor.resend(self)
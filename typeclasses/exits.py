@@ -7,6 +7,9 @@ for allowing Characters to traverse the exit to its destination.
 
 """
 from evennia import DefaultExit
+from evennia.utils import lazy_property
+from world import stats
+from world.locks import AttributeHandler, LockHandler, PermissionHandler, TagHandler
 
 
 class Exit(DefaultExit):
@@ -34,4 +37,30 @@ class Exit(DefaultExit):
                                         not be called if the attribute `err_traverse` is
                                         defined, in which case that will simply be echoed.
     """
-    pass
+    @lazy_property
+    def locks(self):
+        """ LockHandler that compiles and caches lock checks. """
+        return LockHandler(self)
+
+    @lazy_property
+    def permissions(self):
+        """ PermissionHandler that clears cached lock checks on change. """
+        return PermissionHandler(self)
+
+    @lazy_property
+    def tags(self):
+        """ TagHandler that clears cached lock checks on change. """
+        return TagHandler(self)
+
+    @lazy_property
+    def attributes(self):
+        """ AttributeHandler that clears cached lock checks on change. """
+        return AttributeHandler(self)
+
+    def at_first_save(self):
+        super().at_first_save()
+        stats.created(self)
+
+    def at_object_delete(self):
+        stats.deleted(self)
+        return super().at_object_delete()
@@ -4,20 +4,71 @@ Harvestables
 Harvestables are Objects that may be harvested by players utilizing
 various commands, such as chop, gather, and mine. These objects then
 provide various crafting components, which are implemented through
-Evennia's prototype spawning system.
+Evennia's prototype spawning system. Both harvestables and their
+components are defined as prototypes in `world/prototypes.py`; the
+components are dropped from the precompiled templates in
+`world/templates.py`.
+
+Hit points of harvestables live in memory while they are being harvested,
+so a swing costs no database queries. They are written back to the
+database every `HARVEST_CHECKPOINT_INTERVAL` seconds and before the
+server reloads or shuts down; after a crash a harvestable is restored to
+its hit points at the last checkpoint.
+
+Depleted harvestables are not deleted. They go dormant outside of the game
+world until the `RespawnScript` brings them back with full hit points,
+after `HARVEST_RESPAWN_DELAYS[prototype_key]` seconds or the typeclass'
+`respawn_delay`.
 
 """
-from evennia.prototypes.spawner import spawn
+import time
+from django.conf import settings
+from django.db import transaction
+from evennia.utils import lazy_property, logger
 from typeclasses.objects import Object
+from typeclasses.scripts import get_respawn_script
+from world import monitor
+from world.stacks import VIRTUAL_STACKS
+from world.templates import spawn_many
+
+CHECKPOINT_INTERVAL = getattr(settings, "HARVEST_CHECKPOINT_INTERVAL", 60)
+_RESPAWN_DELAYS = getattr(settings, "HARVEST_RESPAWN_DELAYS", {})
+
+# Harvestables with hit points not yet written to the database, keyed by object id.
+_DIRTY_HARVESTABLES = {}
+
 
+def flush_harvestables():
+    """
+    Checkpoint the hit points of all harvestables changed since the last
+    checkpoint. This is called on a server tick and before the server
+    reloads or stops.
+    """
+    if not _DIRTY_HARVESTABLES:
+        return
+    try:
+        with transaction.atomic():
+            for harvestable in list(_DIRTY_HARVESTABLES.values()):
+                harvestable.save_harvest_state()
+    except Exception:
+        logger.log_trace("Failed to checkpoint harvestables.")
 
-COMPONENT_PROTOTYPES = {
-    "log": {
-        "typeclass": "typeclasses.harvestables.CraftingComponent",
-        "key": "log",
-        "desc": "A generic log."
-    }
-}
+
+class HarvestState:
+    """
+    In-memory hit points of a harvestable.
+
+    Args:
+        hp (int): current hit points
+        max_hp (int): maximum hit points
+    """
+    __slots__ = ('hp', 'max_hp', 'dirty')
+
+    def __init__(self, hp, max_hp):
+        self.hp = hp
+        self.max_hp = max_hp
+        # Have the hit points changed since they were last saved?
+        self.dirty = False
 
 
 class CraftingComponent(Object):
@@ -25,49 +76,182 @@ class CraftingComponent(Object):
     This typeclass describes a crafting component.
     """
     def basetype_posthook_setup(self):
-        self.stack.stackable = True
+        # Stacks created with a count already (such as by a split) keep it, even
+        # if a hook loaded the stack before that count was set.
+        stack = self.attributes.get('stack')
+        if not (stack and stack['stackable']):
+            self.stack.stackable = True
+        elif not self.stack.stackable:
+            self.stack.reload()
 
 
-class Tree(Object):
+class Harvestable(Object):
     """
-    This typeclass describes a harvestable tree.
+    This typeclass describes a resource node that is harvested with a
+    timed harvesting command and drops crafting components when depleted.
     """
+    # Lock access type and command used to harvest this node.
+    harvest_verb = "harvest"
+    # Default seconds before a depleted node respawns.
+    respawn_delay = 300
+    # Sent to the harvester and the room on every harvesting swing.
+    swing_msg = "You work away at {target}."
+    swing_room_msg = "{harvester} works away at {target}."
+    # Sent to the room instead of swing_room_msg when many people are harvesting.
+    swing_collapse_msg = "{count} people are harvesting."
+    # Sent to the harvester when the node is half and a quarter depleted.
+    damaged_msgs = ("{target} is beginning to give.", "{target} is almost exhausted.")
+    # Sent to the room when the node is depleted, and when it respawns.
+    deplete_msg = "{target} is exhausted."
+    respawn_msg = "{target} has replenished."
+    get_err_msg = "You can't pick {0} up."
+    # The crafting component prototype that should be spawned on a successful harvest.
+    component_drop = None
+
     def at_object_creation(self):
-        self.locks.add("get:false();chop:all()")
-        self.db.get_err_msg = "You can't pick {0} up. Try chopping it with an axe instead!".format(self.name)
+        self.locks.add("get:false();{0}:all()".format(self.harvest_verb))
+        self.db.get_err_msg = self.get_err_msg.format(self.name)
         self.db.max_hp = 20
         self.db.hp = 20
         # The crafting component prototype that should be spawned on a successful harvest.
-        self.db.component_drop = "log"
+        self.db.component_drop = self.component_drop
         # How many components should be dropped on a successful harvest.
         self.db.component_dropamt = 3
 
+    @lazy_property
+    def harvest_state(self):
+        """ HarvestState holding hit points, loaded from the database once. """
+        return HarvestState(self.db.hp, self.db.max_hp)
+
     @property
     def hp(self):
-        return self.db.hp
+        return self.harvest_state.hp
 
     @property
     def max_hp(self):
-        return self.db.max_hp
+        return self.harvest_state.max_hp
 
-    def chop(self, amount):
+    def save_harvest_state(self):
+        "Write the in-memory hit points to the database, if they changed."
+        _DIRTY_HARVESTABLES.pop(self.id, None)
+        state = self.harvest_state
+        if state.dirty and self.pk:
+            self.db.hp = state.hp
+        state.dirty = False
+
+    def at_object_delete(self):
+        _DIRTY_HARVESTABLES.pop(self.id, None)
+        return super().at_object_delete()
+
+    def get_respawn_delay(self):
+        "Seconds before this harvestable respawns once depleted."
+        return _RESPAWN_DELAYS.get(self.tags.get(category="from_prototype"), self.respawn_delay)
+
+    def deplete(self):
         """
-        Chop a tree by a specified amount of 'hp'. If hp drops at
-        or below 0, spawn appropriate stack of logs and delete the tree.
+        Take the depleted harvestable out of the game world and queue it
+        for respawning.
+        """
+        _DIRTY_HARVESTABLES.pop(self.id, None)
+        self.harvest_state.dirty = False
+        respawn_at = time.time() + self.get_respawn_delay()
+        self.db.respawn_location = self.location
+        self.db.respawn_at = respawn_at
+        # Moving to None calls no hooks, so the room's listing is refreshed here.
+        self.location.appearance.invalidate()
+        self.location.names.invalidate()
+        monitor.notify_contents(self.location, {self.id: None})
+        self.move_to(None, to_none=True, quiet=True)
+        get_respawn_script().add(self, respawn_at)
+
+    def respawn(self):
+        "Bring a dormant harvestable back with full hit points."
+        state = self.harvest_state
+        state.hp = state.max_hp
+        state.dirty = False
+        self.db.hp = state.max_hp
+        # The room it fell in may be gone by now, fall back to home.
+        location = self.db.respawn_location or self.home
+        self.attributes.remove("respawn_location")
+        self.attributes.remove("respawn_at")
+        if location and self.move_to(location, quiet=True):
+            location.broadcast.msg_contents(self.respawn_msg.format(target=self.name))
 
-        Return True if tree is completed destroyed, False if otherwise.
+    def harvest(self, amount):
         """
-        self.db.hp -= amount
+        Harvest the node by a specified amount of 'hp'. If hp drops at
+        or below 0, drop the appropriate stack of components and deplete
+        the node until it respawns.
 
-        if self.db.hp <= 0:
-            # spawn logs
-            self.location.msg_contents("{0} makes a loud cracking sound and falls to the ground.".format(self.name))
+        Return True if the node is depleted, False if otherwise.
+        """
+        state = self.harvest_state
+        state.hp -= amount
+        if not state.dirty:
+            state.dirty = True
+            _DIRTY_HARVESTABLES[self.id] = self
 
-            drop = spawn(COMPONENT_PROTOTYPES[self.db.component_drop], prototype_parents=COMPONENT_PROTOTYPES)[0]
-            drop.stack.count = self.db.component_dropamt
-            drop.move_to(self.location, quiet=True)
+        if state.hp <= 0:
+            # spawn components
+            self.location.broadcast.msg_contents(self.deplete_msg.format(target=self.name))
 
-            self.delete()
+            if VIRTUAL_STACKS:
+                self.location.virtual_stacks.add(self.db.component_drop, self.db.component_dropamt)
+            else:
+                spawn_many(self.db.component_drop, self.db.component_dropamt, self.location)
+
+            self.deplete()
             return True
         else:
             return False
+
+
+class Tree(Harvestable):
+    """
+    This typeclass describes a harvestable tree.
+    """
+    harvest_verb = "chop"
+    swing_msg = "Chips of wood fly everywhere as you swing your axe into {target}."
+    swing_room_msg = "Chips of wood fly everywhere as {harvester} swings their axe into {target}."
+    swing_collapse_msg = "Chips of wood fly everywhere as {count} people chop at the trees."
+    damaged_msgs = ("There is a sizeable wedge in {target}", "{target} is beginning to lean heavily.")
+    deplete_msg = "{target} makes a loud cracking sound and falls to the ground."
+    respawn_msg = "{target} has grown back."
+    get_err_msg = "You can't pick {0} up. Try chopping it with an axe instead!"
+    component_drop = "log"
+
+    def chop(self, amount):
+        "Chop the tree, see `Harvestable.harvest`."
+        return self.harvest(amount)
+
+
+class OreVein(Harvestable):
+    """
+    This typeclass describes a vein of ore to be mined.
+    """
+    harvest_verb = "mine"
+    swing_msg = "Sparks fly as you strike {target} with your pick."
+    swing_room_msg = "Sparks fly as {harvester} strikes {target} with their pick."
+    swing_collapse_msg = "Sparks fly as {count} people mine the rock."
+    damaged_msgs = ("Cracks are spreading through {target}.", "{target} is close to crumbling.")
+    deplete_msg = "{target} crumbles into a pile of rubble."
+    respawn_msg = "{target} glints in the rock once more."
+    get_err_msg = "You can't pick {0} up. Try mining it with a pick instead!"
+    component_drop = "ore"
+    respawn_delay = 600
+
+
+class HerbPatch(Harvestable):
+    """
+    This typeclass describes a patch of herbs to be gathered.
+    """
+    harvest_verb = "gather"
+    swing_msg = "You carefully pick herbs from {target}."
+    swing_room_msg = "{harvester} carefully picks herbs from {target}."
+    swing_collapse_msg = "{count} people are gathering herbs."
+    damaged_msgs = ("{target} is looking thinner.", "Only a few herbs are left in {target}.")
+    deplete_msg = "{target} has been picked clean."
+    respawn_msg = "{target} has grown back."
+    get_err_msg = "You can't pick {0} up. Try gathering from it instead!"
+    component_drop = "herb"
+    respawn_delay = 180
@@ -10,10 +10,24 @@ the other types, you can do so by adding this as a multiple
 inheritance.
 
 """
-from collections import defaultdict
+from django.conf import settings
 from evennia import DefaultObject
-from evennia.utils import lazy_property, list_to_string
-from world.stacks import StackHandler
+from evennia.utils import lazy_property, make_iter, variable_from_module
+from world.appearance import AppearanceCache
+from world.broadcast import BroadcastHandler
+from world.inventory import InventoryView
+from world import monitor
+from world.locks import LockHandler, PermissionHandler, TagHandler
+from world.names import NameIndex, search as search_names
+from world import stats
+from world.profiling import AttributeHandler, record_bytes
+from world.stacks import (StackHandler, StackIndex, VirtualStackHandler, VIRTUAL_STACKS,
+                          discard_stack, flush_stack)
+
+_AT_SEARCH_RESULT = variable_from_module(*settings.SEARCH_AT_RESULT.rsplit('.', 1))
+# Search keywords the name index can handle, anything else goes to Evennia.
+_NAME_SEARCH_KWARGS = {"location", "quiet", "exact", "use_nicks", "use_locks", "nofound_string",
+                       "multimatch_string"}
 
 
 class Object(DefaultObject):
@@ -168,16 +182,146 @@ class Object(DefaultObject):
         """ StackHandler that manages stacks. """
         return StackHandler(self)
 
-    def at_object_receive(self, obj, source_location):
+    @lazy_property
+    def stack_index(self):
+        """ StackIndex of the stacks held by this object. """
+        return StackIndex(self)
+
+    @lazy_property
+    def virtual_stacks(self):
+        """ VirtualStackHandler for item stacks held without objects of their own. """
+        return VirtualStackHandler(self)
+
+    @lazy_property
+    def broadcast(self):
+        """ BroadcastHandler that batches messages to everyone inside this object. """
+        return BroadcastHandler(self)
+
+    @lazy_property
+    def appearance(self):
+        """ AppearanceCache of what is seen when looking at this object. """
+        return AppearanceCache(self)
+
+    @lazy_property
+    def inventory(self):
+        """ InventoryView of the items this object carries. """
+        return InventoryView(self)
+
+    @lazy_property
+    def attributes(self):
+        """ AttributeHandler that counts lookups for the server metrics. """
+        return AttributeHandler(self)
+
+    @lazy_property
+    def names(self):
+        """ NameIndex of the keys and aliases of the objects held, for searching. """
+        return NameIndex(self)
+
+    @lazy_property
+    def locks(self):
+        """ LockHandler that compiles and caches lock checks. """
+        return LockHandler(self)
+
+    @lazy_property
+    def permissions(self):
+        """ PermissionHandler that clears cached lock checks on change. """
+        return PermissionHandler(self)
+
+    @lazy_property
+    def tags(self):
+        """ TagHandler that clears cached lock checks on change. """
+        return TagHandler(self)
+
+    def at_object_delete(self):
+        # Pending stack changes are moot once the object is gone.
+        discard_stack(self)
+        if self.location:
+            self.location.appearance.invalidate()
+            self.location.names.invalidate()
+            self.location.inventory.remove(self)
+            monitor.notify_contents(self.location, {self.id: None})
+        stats.deleted(self)
+        return True
+
+    def at_first_save(self):
+        super().at_first_save()
+        stats.created(self)
+
+    def msg(self, text=None, *args, **kwargs):
+        # Count what commands send, for their profiles.
+        record_bytes(text)
+        return super().msg(text, *args, **kwargs)
+
+    def move_to(self, destination, *args, **kwargs):
+        # Make sure the stack is persisted before it changes hands.
+        flush_stack(self)
+        return super().move_to(destination, *args, **kwargs)
+
+    def search(self, searchdata, *args, stack_amount=1, **kwargs):
+        """
+        Search like Evennia does, also finding the virtual stacks held by the
+        containers searched. A virtual stack only becomes a real object when
+        the search finds nothing else and reports to the caller, and then
+        only `stack_amount` items of it (all of them if None).
+        """
+        if VIRTUAL_STACKS and isinstance(searchdata, str) and not args and not kwargs.get("quiet") \
+                and not kwargs.get("global_search") and kwargs.get("candidates") is None:
+            matches = self._search(searchdata, **dict(kwargs, quiet=True))
+            if not matches:
+                matches = self._materialize(searchdata, kwargs.get("location"), stack_amount)
+            return _AT_SEARCH_RESULT(matches, self, query=searchdata,
+                                     nofound_string=kwargs.get("nofound_string"),
+                                     multimatch_string=kwargs.get("multimatch_string"))
+        return self._search(searchdata, *args, **kwargs)
+
+    def _materialize(self, searchdata, location, amount):
+        "Turn the virtual stack a search term matches into a real one, if any."
+        for container in (make_iter(location) if location else (self, self.location)):
+            if container and container.virtual_stacks:
+                prototype_key = container.virtual_stacks.match(searchdata)
+                if prototype_key:
+                    return [container.virtual_stacks.materialize(prototype_key, amount)]
+        return []
+
+    def _search(self, searchdata, *args, **kwargs):
+        # Plain searches of what is around are resolved in memory by the name indexes.
+        if isinstance(searchdata, str) and not args and set(kwargs) <= _NAME_SEARCH_KWARGS:
+            query, matches = search_names(self, searchdata, location=kwargs.get("location"),
+                                          exact=kwargs.get("exact", False),
+                                          use_nicks=kwargs.get("use_nicks", True))
+            if query is not None:
+                if kwargs.get("use_locks", True):
+                    matches = [obj for obj in matches if obj.access(self, "search", default=True)]
+                if kwargs.get("quiet"):
+                    return matches
+                return _AT_SEARCH_RESULT(matches, self, query=query,
+                                         nofound_string=kwargs.get("nofound_string"),
+                                         multimatch_string=kwargs.get("multimatch_string"))
+        return super().search(searchdata, *args, **kwargs)
+
+    def at_object_receive(self, obj, source_location, **kwargs):
         # Consolidate stackable items together.
         if obj.stack.stackable:
-            for found in self.search(obj.key, location=self, quiet=True):
-                # Skip over received object, we want to move existing stackables into this one.
-                if found is obj:
-                    continue
-                # If we found another object with the same key and stackable property is True, then perform merge.
-                if found.stack.stackable:
-                    obj.stack.merge(found)
+            # Move the existing stacks with the same signature into the received one,
+            # which then becomes the canonical stack.
+            found = self.stack_index.find(obj)
+            if found:
+                obj.stack.merge(*found)
+            self.stack_index.add(obj)
+        self.appearance.invalidate()
+        self.names.invalidate()
+        self.inventory.update(obj)
+        monitor.notify_contents(self, {obj.id: monitor.room_entry(obj)})
+        if obj.sessions.count():
+            monitor.resend(obj, ("room",))
+
+    def at_object_leave(self, obj, target_location, **kwargs):
+        if obj.stack.stackable:
+            self.stack_index.remove(obj)
+        self.appearance.invalidate()
+        self.names.invalidate()
+        self.inventory.remove(obj)
+        monitor.notify_contents(self, {obj.id: None})
 
     def return_appearance(self, looker, **kwargs):
         """
@@ -191,40 +335,11 @@ class Object(DefaultObject):
         """
         if not looker:
             return ""
-        # get and identify all objects
-        visible = (con for con in self.contents if con != looker and
-                   con.access(looker, "view"))
-        exits, users, things = [], [], defaultdict(list)
-        for con in visible:
-            key = con.get_display_name(looker)
-            if con.destination:
-                exits.append(key)
-            elif con.has_account:
-                users.append("|c%s|n" % key)
-            else:
-                # things can be pluralized
-                things[key].append(con)
         # get description, build string
         string = "|c%s|n\n" % self.get_display_name(looker)
         desc = self.db.desc
         if desc:
             string += "%s" % desc
-        if exits:
-            string += "\n|wExits:|n " + list_to_string(exits)
-        if users or things:
-            # handle pluralization of things (never pluralize users)
-            thing_strings = []
-            for key, itemlist in sorted(things.items()):
-                nitem = len(itemlist)
-                if nitem == 1:
-                    if itemlist[0].stack.stackable and itemlist[0].stack.count > 1:
-                        key = itemlist[0].get_numbered_name(itemlist[0].stack.count, looker, key=key)[1]
-                    else:
-                        key, _ = itemlist[0].get_numbered_name(nitem, looker, key=key)
-                else:
-                    key = [item.get_numbered_name(nitem, looker, key=key)[1] for item in itemlist][0]
-                thing_strings.append(key)
-
-            string += "\n|wYou see:|n " + list_to_string(users + thing_strings)
-
+        # the contents are rendered from a cache kept up to date as they change
+        string += self.appearance.render(looker)
         return string
@@ -12,7 +12,14 @@ just overloads its hooks to have it perform its function.
 
 """
 
+import heapq
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
 from evennia import DefaultScript
+from evennia.objects.models import ObjectDB
+from evennia.utils import create, logger, search, variable_from_module
 
 
 class Script(DefaultScript):
@@ -89,3 +96,224 @@ class Script(DefaultScript):
 
     """
     pass
+
+
+class HarvestScheduler(Script):
+    """
+    Drives all timed harvesting (such as chopping trees) from a single
+    ticker instead of one timer per harvesting character.
+
+    Harvests are kept on a timing wheel with one slot per tick of
+    `HARVEST_TICK` seconds. Each tick the scheduler advances one slot and
+    runs every harvest that is due, grouped by the target being harvested.
+    A harvest's callback is called as `callback(harvester, target)` and is
+    rescheduled for as long as it returns True and the harvester's
+    `ndb.harvesting` flag stays set, so `stop_harvesting` cancels it. A
+    callback that raises is logged and stops the harvester harvesting.
+
+    Harvests survive a reload: `save_pending()` stores them when the server
+    stops for one, and they carry on once the scheduler starts again. After
+    a crash or a shutdown they are gone, and the harvestables are as of
+    their last hit point checkpoint.
+
+    Use `get_harvest_scheduler()` to get the running scheduler.
+    """
+    wheel_size = 64
+
+    def at_script_creation(self):
+        self.key = "harvest_scheduler"
+        self.desc = "Advances all active harvests."
+        self.interval = getattr(settings, "HARVEST_TICK", 1)
+        self.persistent = True
+
+    def at_start(self):
+        self.ndb.wheel = [{} for _ in range(self.wheel_size)]
+        self.ndb.position = 0
+        # Slot each harvester is currently waiting in, by harvester id.
+        self.ndb.slots = {}
+        self.restore_pending()
+
+    def save_pending(self):
+        "Store the pending harvests, to be resumed when the scheduler starts again."
+        self.db.pending = [(harvester, target, f"{callback.__module__}.{callback.__name__}", period)
+                           for slot in self.ndb.wheel
+                           for harvester, target, callback, period in slot.values()
+                           if harvester.pk and target.pk and harvester.ndb.harvesting]
+
+    def restore_pending(self):
+        "Resume the harvests stored by `save_pending`."
+        pending = self.attributes.get("pending")
+        if pending is None:
+            return
+        self.attributes.remove("pending")
+        for harvester, target, path, period in pending:
+            # Objects deleted in the meantime come back as None.
+            if not (harvester and target):
+                continue
+            harvester.ndb.harvesting = True
+            harvester.ndb.harvest_target = target
+            self.schedule(harvester, target, variable_from_module(*path.rsplit(".", 1)), period)
+
+    def schedule(self, harvester, target, callback, period):
+        """
+        Call `callback(harvester, target)` every `period` seconds until it
+        returns False or the harvest is cancelled. Any harvest the harvester
+        already had scheduled is replaced.
+
+        Args:
+            harvester (Object): Who is harvesting.
+            target (Object): What is being harvested.
+            callback (callable): Performs one harvesting step.
+            period (int or float): Seconds between steps.
+        """
+        self.cancel(harvester)
+        ticks = min(max(1, int(round(period / self.interval))), self.wheel_size - 1)
+        slot = (self.ndb.position + ticks) % self.wheel_size
+        self.ndb.wheel[slot][harvester.id] = (harvester, target, callback, period)
+        self.ndb.slots[harvester.id] = slot
+
+    def cancel(self, harvester):
+        "Stop the harvest scheduled for the given harvester, if any."
+        slot = self.ndb.slots.pop(harvester.id, None)
+        if slot is not None:
+            self.ndb.wheel[slot].pop(harvester.id, None)
+
+    def at_repeat(self):
+        "Run all harvests due this tick."
+        wheel = self.ndb.wheel
+        self.ndb.position = position = (self.ndb.position + 1) % self.wheel_size
+        due, wheel[position] = wheel[position], {}
+        if not due:
+            return
+
+        by_target = defaultdict(list)
+        for harvester_id, entry in due.items():
+            del self.ndb.slots[harvester_id]
+            by_target[entry[1].id].append(entry)
+
+        for entries in by_target.values():
+            for harvester, target, callback, period in entries:
+                if not (harvester.pk and harvester.ndb.harvesting):
+                    continue
+                try:
+                    if callback(harvester, target):
+                        self.schedule(harvester, target, callback, period)
+                except Exception:
+                    logger.log_trace(f"Harvest step of {harvester} on {target} failed.")
+                    # Imported here, as the harvest commands import this module.
+                    from commands.harvest import stop_harvesting
+                    stop_harvesting(harvester)
+
+
+_HARVEST_SCHEDULER = None
+
+
+def get_harvest_scheduler():
+    "Return the running HarvestScheduler, creating it if needed."
+    global _HARVEST_SCHEDULER
+    if not (_HARVEST_SCHEDULER and _HARVEST_SCHEDULER.pk and _HARVEST_SCHEDULER.is_active):
+        found = search.search_script("harvest_scheduler")
+        _HARVEST_SCHEDULER = found[0] if found else create.create_script(HarvestScheduler)
+    return _HARVEST_SCHEDULER
+
+
+class RespawnScript(Script):
+    """
+    Brings depleted resource nodes (such as felled trees) back into the game.
+
+    A depleted node isn't deleted but goes dormant: it is moved out of the
+    game world, remembering its location and the time it should respawn in
+    its `respawn_location` and `respawn_at` Attributes. This script keeps a
+    heap of dormant nodes ordered by respawn time and every
+    `HARVEST_RESPAWN_TICK` seconds revives all nodes that are due in one
+    batch by calling their `respawn()` method.
+
+    Zones (rooms tagged with a category "zone" tag) can cap the number of
+    live nodes of each typeclass in `HARVEST_ZONE_CAPS`, keyed by zone or
+    by (typeclass path, zone) for a cap of one typeclass only. A node whose
+    room is in a full zone waits another respawn delay before trying again.
+
+    Use `get_respawn_script()` to get the running script.
+    """
+    def at_script_creation(self):
+        self.key = "respawn_script"
+        self.desc = "Respawns depleted resource nodes."
+        self.interval = getattr(settings, "HARVEST_RESPAWN_TICK", 10)
+        self.persistent = True
+
+    def at_start(self):
+        # The dormant nodes themselves know when they are due, so the heap
+        # never needs saving and is rebuilt on every start.
+        self.ndb.queue = [(obj.db.respawn_at, obj.id)
+                          for obj in ObjectDB.objects.get_by_attribute(key="respawn_at")
+                          if obj.location is None]
+        heapq.heapify(self.ndb.queue)
+
+    def add(self, obj, respawn_at):
+        """
+        Queue a dormant node for respawning.
+
+        Args:
+            obj (Object): The dormant node.
+            respawn_at (float): Time, as a timestamp, when it should respawn.
+        """
+        heapq.heappush(self.ndb.queue, (respawn_at, obj.id))
+
+    def at_repeat(self):
+        "Respawn all nodes that are due."
+        queue, now = self.ndb.queue, time.time()
+        due = []
+        while queue and queue[0][0] <= now:
+            due.append(heapq.heappop(queue)[1])
+        if not due:
+            return
+
+        # Live nodes per (typeclass, zone), counted once per batch.
+        live = {}
+        caps = getattr(settings, "HARVEST_ZONE_CAPS", {})
+        try:
+            with transaction.atomic():
+                for obj in ObjectDB.objects.filter(id__in=due):
+                    location = obj.db.respawn_location or obj.home
+                    if obj.location is not None or not location:
+                        continue
+                    # A room may lie in several zones, each with its own cap.
+                    counters = []
+                    for zone in location.tags.get(category="zone", return_list=True):
+                        cap = caps.get((obj.typeclass_path, zone), caps.get(zone))
+                        if cap is None:
+                            continue
+                        counter = (obj.typeclass_path, zone)
+                        if counter not in live:
+                            live[counter] = type(obj).objects.filter(
+                                db_location__db_tags__db_key=zone,
+                                db_location__db_tags__db_category="zone").count()
+                        counters.append((counter, cap))
+                    if any(live[counter] >= cap for counter, cap in counters):
+                        # A zone is full, try again later.
+                        respawn_at = now + obj.get_respawn_delay()
+                        obj.db.respawn_at = respawn_at
+                        self.add(obj, respawn_at)
+                        continue
+                    for counter, _ in counters:
+                        live[counter] += 1
+                    # One broken node mustn't keep the rest of the batch from respawning.
+                    try:
+                        with transaction.atomic():
+                            obj.respawn()
+                    except Exception:
+                        logger.log_trace(f"Failed to respawn {obj}.")
+        except Exception:
+            logger.log_trace("Failed to respawn resource nodes.")
+
+
+_RESPAWN_SCRIPT = None
+
+
+def get_respawn_script():
+    "Return the running RespawnScript, creating it if needed."
+    global _RESPAWN_SCRIPT
+    if not (_RESPAWN_SCRIPT and _RESPAWN_SCRIPT.pk and _RESPAWN_SCRIPT.is_active):
+        found = search.search_script("respawn_script")
+        _RESPAWN_SCRIPT = found[0] if found else create.create_script(RespawnScript)
+    return _RESPAWN_SCRIPT
@@ -0,0 +1,256 @@
+"""
+Tests for the typeclasses.
+
+Run them from the game directory with
+
+    evennia test --settings settings.py .
+
+"""
+from unittest.mock import patch
+from evennia import DefaultObject
+from evennia.utils import create
+from commands.harvest import SWING_DAMAGE, harvest_swing, stop_harvesting
+from typeclasses import harvestables
+from typeclasses.harvestables import OreVein, Tree
+from typeclasses.objects import Object
+from typeclasses.scripts import get_harvest_scheduler, get_respawn_script
+from world.tests import GameTest
+
+
+class TestNameSearch(GameTest):
+    "Searches resolved by the name indexes, against Evennia's own search."
+
+    # Search terms covering exact, partial, alias and numbered matches and misses.
+    TERMS = ("log", "LOG", "lo", "o lo", "oak log", "firewood", "fire", "1-log", "2-log", "3-log",
+             "4-log", "9-log", "0-log", "2.log", "2-oak log", "2-Obj", "1-Obj", "axe", "Char",
+             "Room", "nothing", "1-nothing")
+
+    def setUp(self):
+        super().setUp()
+        for key, location, aliases in (("oak log", self.room1, ["firewood"]), ("birch log", self.room1, []),
+                                       ("log", self.char1, ["firewood"]), ("axe", self.char1, [])):
+            create.create_object(Object, key=key, location=location, home=self.room1, aliases=aliases)
+
+    def assertParity(self, term, **kwargs):
+        with self.subTest(term=term, **kwargs):
+            self.assertEqual(self.char1.search(term, quiet=True, **kwargs),
+                             DefaultObject.search(self.char1, term, quiet=True, **kwargs))
+
+    def test_matches_evennia_search(self):
+        for term in self.TERMS:
+            self.assertParity(term)
+            self.assertParity(term, exact=True)
+            self.assertParity(term, location=self.room1)
+
+    def test_number_beyond_matches_finds_nothing(self):
+        self.assertEqual(self.char1.search("9-log", quiet=True), [])
+        self.assertEqual(self.char1.search("2-axe", quiet=True), [])
+        self.assertEqual(len(self.char1.search("2-log", quiet=True)), 1)
+
+    def test_search_lock_is_checked(self):
+        self.char1.search("axe").locks.add("search:false()")
+        self.assertEqual(self.char1.search("axe", quiet=True), [])
+        self.assertParity("axe")
+
+    def test_typeclass_search_is_left_to_evennia(self):
+        self.assertParity("log", typeclass=Object)
+        self.assertParity("Char", typeclass="typeclasses.characters.Character")
+
+
+@patch("typeclasses.objects.VIRTUAL_STACKS", True)
+class TestVirtualStackSearch(GameTest):
+    "Searching for virtual stacks."
+
+    def setUp(self):
+        super().setUp()
+        self.room1.virtual_stacks.add("log", 10)
+
+    def test_quiet_search_keeps_stack_virtual(self):
+        self.assertEqual(self.char1.search("log", quiet=True), [])
+        self.assertEqual(self.room1.virtual_stacks.count("log"), 10)
+
+    def test_real_match_keeps_stack_virtual(self):
+        self.obj1.key = "logbook"
+        self.room1.names.invalidate()
+        self.assertEqual(self.char1.search("log"), self.obj1)
+        self.assertEqual(self.room1.virtual_stacks.count("log"), 10)
+
+    def test_search_materializes_what_it_needs(self):
+        logs = self.char1.search("log")
+        self.assertEqual(logs.location, self.room1)
+        self.assertEqual(logs.stack.count, 1)
+        self.assertEqual(self.room1.virtual_stacks.count("log"), 9)
+        more = self.char1.search("logs", stack_amount=3)
+        self.assertEqual(more.stack.count, 4)
+        self.assertEqual(self.room1.virtual_stacks.count("log"), 6)
+
+
+class TestHarvestScheduler(GameTest):
+    "Timing of harvests on the scheduler."
+
+    def setUp(self):
+        super().setUp()
+        self.scheduler = get_harvest_scheduler()
+        self.char1.ndb.harvesting = True
+        self.calls = []
+
+    def step(self, result=True):
+        "A harvest step recording its calls and returning `result`."
+        def callback(harvester, target):
+            self.calls.append((harvester, target))
+            return result
+        return callback
+
+    def tick(self, ticks=1):
+        for _ in range(ticks):
+            self.scheduler.at_repeat()
+
+    def test_step_runs_after_its_period(self):
+        self.scheduler.schedule(self.char1, self.obj1, self.step(), 3)
+        self.tick(2)
+        self.assertEqual(self.calls, [])
+        self.tick()
+        self.assertEqual(self.calls, [(self.char1, self.obj1)])
+
+    def test_step_is_rescheduled_while_it_returns_true(self):
+        self.scheduler.schedule(self.char1, self.obj1, self.step(), 1)
+        self.tick(3)
+        self.assertEqual(len(self.calls), 3)
+
+    def test_step_returning_false_ends_the_harvest(self):
+        self.scheduler.schedule(self.char1, self.obj1, self.step(False), 1)
+        self.tick(3)
+        self.assertEqual(len(self.calls), 1)
+        self.assertNotIn(self.char1.id, self.scheduler.ndb.slots)
+
+    def test_scheduling_again_replaces_the_harvest(self):
+        self.scheduler.schedule(self.char1, self.obj1, self.step(), 1)
+        self.scheduler.schedule(self.char1, self.obj2, self.step(), 1)
+        self.tick()
+        self.assertEqual(self.calls, [(self.char1, self.obj2)])
+
+    def test_stop_harvesting_cancels(self):
+        self.scheduler.schedule(self.char1, self.obj1, self.step(), 1)
+        stop_harvesting(self.char1)
+        self.tick(2)
+        self.assertEqual(self.calls, [])
+
+    @patch("typeclasses.scripts.logger")
+    def test_failing_step_stops_the_harvest(self, mock_logger):
+        def callback(harvester, target):
+            self.calls.append((harvester, target))
+            raise ValueError("broken axe")
+        self.char1.ndb.harvest_target = self.obj1
+        self.scheduler.schedule(self.char1, self.obj1, callback, 1)
+        self.tick(3)
+        mock_logger.log_trace.assert_called_once()
+        self.assertEqual(len(self.calls), 1)
+        self.assertFalse(self.char1.ndb.harvesting)
+        self.assertIsNone(self.char1.ndb.harvest_target)
+
+
+class TestHarvestRestart(GameTest):
+    "Harvests and hit points across reloads and crashes."
+
+    def setUp(self):
+        super().setUp()
+        self.tree = create.create_object(Tree, key="tree", location=self.room1)
+        self.scheduler = get_harvest_scheduler()
+        self.char1.ndb.harvesting = True
+        self.char1.ndb.harvest_target = self.tree
+        self.scheduler.schedule(self.char1, self.tree, harvest_swing, 2)
+
+    def restart(self):
+        "Lose everything kept in memory, as the server process does."
+        self.char1.at_init()
+        del self.tree.__dict__["harvest_state"]
+        self.scheduler.at_start()
+
+    def tick(self, ticks=2):
+        for _ in range(ticks):
+            self.scheduler.at_repeat()
+
+    def test_pending_harvest_survives_reload(self):
+        self.tick()
+        self.assertEqual(self.tree.hp, self.tree.max_hp - SWING_DAMAGE)
+        # What at_server_reload_stop does.
+        self.scheduler.save_pending()
+        harvestables.flush_harvestables()
+        self.restart()
+        self.assertTrue(self.char1.ndb.harvesting)
+        self.assertEqual(self.char1.ndb.harvest_target, self.tree)
+        self.assertEqual(self.tree.hp, self.tree.max_hp - SWING_DAMAGE)
+        self.tick()
+        self.assertEqual(self.tree.hp, self.tree.max_hp - 2 * SWING_DAMAGE)
+
+    def test_crash_drops_harvests_and_keeps_checkpoint(self):
+        self.tick()
+        harvestables.flush_harvestables()
+        self.tick()
+        self.assertEqual(self.tree.hp, self.tree.max_hp - 2 * SWING_DAMAGE)
+        # A crash saves nothing.
+        self.restart()
+        self.assertFalse(self.char1.ndb.harvesting)
+        self.assertEqual(self.tree.hp, self.tree.max_hp - SWING_DAMAGE)
+        self.tick()
+        self.assertEqual(self.tree.hp, self.tree.max_hp - SWING_DAMAGE)
+
+
+class TestRespawn(GameTest):
+    "Respawning depleted harvestables."
+
+    def setUp(self):
+        super().setUp()
+        self.tree = create.create_object(Tree, key="tree", location=self.room1, home=self.room2)
+
+    def test_respawn_in_place(self):
+        self.tree.deplete()
+        self.assertIsNone(self.tree.location)
+        self.tree.respawn()
+        self.assertEqual(self.tree.location, self.room1)
+        self.assertEqual(self.tree.hp, self.tree.max_hp)
+
+    def test_respawn_falls_back_to_home(self):
+        self.tree.deplete()
+        # The room it fell in was deleted while it was dormant.
+        self.tree.db.respawn_location = None
+        self.tree.respawn()
+        self.assertEqual(self.tree.location, self.room2)
+
+    def test_respawn_nowhere_is_quiet(self):
+        self.tree.deplete()
+        self.tree.db.respawn_location = None
+        self.tree.home = None
+        self.tree.respawn()
+        self.assertIsNone(self.tree.location)
+
+    def respawn_due(self, caps):
+        "Deplete the tree and run the respawn script with it due."
+        self.room1.tags.add("forest", category="zone")
+        self.room1.tags.add("north", category="zone")
+        self.tree.deplete()
+        script = get_respawn_script()
+        script.ndb.queue = [(0, self.tree.id)]
+        with self.settings(HARVEST_ZONE_CAPS=caps):
+            script.at_repeat()
+
+    def test_zone_with_room_respawns(self):
+        create.create_object(Tree, key="oak", location=self.room1)
+        self.respawn_due({"forest": 2, "north": 2})
+        self.assertEqual(self.tree.location, self.room1)
+
+    def test_full_zone_waits(self):
+        create.create_object(Tree, key="oak", location=self.room1)
+        self.respawn_due({"forest": 2, "north": 1})
+        self.assertIsNone(self.tree.location)
+        self.assertEqual([obj_id for _, obj_id in get_respawn_script().ndb.queue], [self.tree.id])
+
+    def test_caps_are_per_typeclass(self):
+        create.create_object(OreVein, key="vein", location=self.room1)
+        self.respawn_due({"forest": 1})
+        self.assertEqual(self.tree.location, self.room1)
+
+    def test_typeclass_cap_overrides_zone_cap(self):
+        create.create_object(Tree, key="oak", location=self.room1)
+        self.respawn_due({"forest": 5, ("typeclasses.harvestables.Tree", "forest"): 1})
+        self.assertIsNone(self.tree.location)
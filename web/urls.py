@@ -8,10 +8,13 @@ from django.conf.urls import url, include
 
 # default evennia patterns
 from evennia.web.urls import urlpatterns
+from web import views
 
 # eventual custom patterns
 custom_patterns = [
     # url(r'/desired/url/', view, name='example'),
+    url(r'^cmdstats/$', views.command_stats, name='cmdstats'),
+    url(r'^stats/$', views.game_stats, name='stats'),
 ]
 
 # this is required by Django.
@@ -0,0 +1,24 @@
+"""
+Custom views of the game website.
+
+"""
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from world import profiling, stats
+
+
+@staff_member_required
+def command_stats(request):
+    """
+    The command profiles recorded by `world.profiling`, as JSON.
+    """
+    return JsonResponse({"enabled": profiling.ENABLED,
+                         "commands": [profile.to_dict() for profile in profiling.get_profiles()]})
+
+
+@staff_member_required
+def game_stats(request):
+    """
+    The game statistics kept by `world.stats`, as JSON.
+    """
+    return JsonResponse(stats.get())
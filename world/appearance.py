@@ -0,0 +1,177 @@
+"""
+Appearance Cache
+
+Looking at a room lists everything in it, which means a lock check, a
+display name and pluralization for every object inside. This module caches
+the part of that listing that doesn't depend on who is looking: the exits,
+characters and things in the room, with the things grouped by name and
+counted, and which of them everyone may view (with a `view:all()` lock).
+Each look then only lock-checks the objects with other view locks and
+names the groups as the looker sees them, so a change to the looker's
+permissions shows at once.
+
+The cache is invalidated whenever something enters or leaves the room or
+a stack inside changes its count. Renaming something inside or changing
+its locks is noticed on the next look, which compares the keys and lock
+strings the cache was built from. Builders, who see dbrefs on everything,
+get a full render.
+
+**Setup**
+    The cache is set up as a `lazy_property` named `appearance` on the
+    Object typeclass, which uses `appearance.render(looker)` in its
+    `return_appearance`.
+"""
+from collections import defaultdict
+from evennia.utils import list_to_string
+from world.stacks import numbered_name
+
+
+def group_count(itemlist):
+    "Number of items in a group of objects, counting stacks for their whole amount."
+    return sum(item.stack.count if item.stack.stackable else 1 for item in itemlist)
+
+
+def thing_strings(things, virtual=None):
+    """
+    Names of the groups of things seen in a container, pluralized.
+
+    Args:
+        things (dict): Lists of objects, keyed by the name they are shown with.
+        virtual (VirtualStackHandler, optional): Virtual stacks held by the
+            container, counted along with the things of the same name.
+
+    Returns:
+        strings (list): One name per group, such as 'a tree' or 'three logs'.
+    """
+    counts = {key: group_count(itemlist) for key, itemlist in things.items()}
+    return numbered_names(counts, virtual)
+
+
+def numbered_names(counts, virtual=None):
+    """
+    Names of groups of items by count, with virtual stacks added to the real
+    items of the same name.
+
+    Args:
+        counts (dict): Number of items, keyed by the name they are shown with.
+        virtual (VirtualStackHandler, optional): Virtual stacks to add.
+
+    Returns:
+        strings (list): One name per group, sorted by name.
+    """
+    counts = dict(counts)
+    for prototype_key, count in (virtual.all() if virtual else ()):
+        key = virtual.key(prototype_key)
+        counts[key] = counts.get(key, 0) + count
+    return [numbered_name(key, count) for key, count in sorted(counts.items())]
+
+
+class AppearanceCache:
+    """
+    Cache of what is seen inside an object when looking at it.
+
+    Args:
+        obj (Object): the room (or other container) being looked at
+    """
+    __slots__ = ('obj', '_skeleton', '_built_from')
+
+    def __init__(self, obj):
+        self.obj = obj
+        self._skeleton = None
+        # (id, key, lock string) of the contents the skeleton was built from.
+        self._built_from = None
+
+    def invalidate(self):
+        "Forget everything, the contents of the object changed."
+        self._skeleton = None
+        self._built_from = None
+
+    def _state(self):
+        "What the skeleton depends on besides stack counts."
+        return [(con.id, con.db_key, con.db_lock_storage) for con in self.obj.contents]
+
+    @staticmethod
+    def _public(con):
+        "Can everyone view this object?"
+        return con.locks.get("view") == "view:all()"
+
+    def _build(self):
+        "Build the looker-independent skeleton of the contents."
+        exits, users, things = [], [], defaultdict(list)
+        for con in self.obj.contents:
+            if con.destination:
+                exits.append(con)
+            elif con.has_account:
+                users.append(con)
+            else:
+                things[con.name].append(con)
+        groups = []
+        for key, itemlist in sorted(things.items()):
+            groups.append((key, itemlist, group_count(itemlist),
+                           all(self._public(con) for con in itemlist)))
+        self._skeleton = (exits, users, groups)
+        return self._skeleton
+
+    def _current(self):
+        "The skeleton, rebuilt if something inside was renamed or had its locks changed."
+        state = self._state()
+        if self._skeleton is None or state != self._built_from:
+            self._built_from = state
+            self._build()
+        return self._skeleton
+
+    def _render_full(self, looker):
+        "Render the contents from scratch as seen by the looker."
+        visible = (con for con in self.obj.contents if con != looker and
+                   con.access(looker, "view"))
+        exits, users, things = [], [], defaultdict(list)
+        for con in visible:
+            key = con.get_display_name(looker)
+            if con.destination:
+                exits.append(key)
+            elif con.has_account:
+                users.append("|c%s|n" % key)
+            else:
+                # things can be pluralized
+                things[key].append(con)
+        return exits, users, thing_strings(things, self.obj.virtual_stacks)
+
+    def _render_overlay(self, looker):
+        "Render the contents from the skeleton as seen by the looker."
+        exits, users, groups = self._current()
+
+        def visible(con):
+            return con != looker and (self._public(con) or con.access(looker, "view"))
+
+        exits = [con.get_display_name(looker) for con in exits if visible(con)]
+        users = ["|c%s|n" % con.get_display_name(looker) for con in users if visible(con)]
+        counts = defaultdict(int)
+        for _, itemlist, count, public in groups:
+            if not (public and looker not in itemlist):
+                itemlist = [con for con in itemlist if visible(con)]
+                count = group_count(itemlist)
+            if itemlist:
+                counts[itemlist[0].get_display_name(looker)] += count
+        return exits, users, numbered_names(counts, self.obj.virtual_stacks)
+
+    def render(self, looker):
+        """
+        The part of the object's appearance listing its contents.
+
+        Args:
+            looker (Object): Object doing the looking.
+
+        Returns:
+            string (str): The exits and things seen, each on their own line.
+        """
+        # Builders see dbrefs on everything, their view can't come from the skeleton.
+        if self.obj.locks.check_lockstring(looker, "perm(Builder)"):
+            exits, users, strings = self._render_full(looker)
+        else:
+            exits, users, strings = self._render_overlay(looker)
+        string = ""
+        if exits:
+            string += "\n|wExits:|n " + list_to_string(exits)
+        if users or strings:
+            string += "\n|wYou see:|n " + list_to_string(users + strings)
+        return string
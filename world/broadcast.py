@@ -0,0 +1,97 @@
+"""
+Room Broadcasts
+
+Busy rooms generate a lot of messages meant for everyone present, such as
+harvesting swings or items changing hands. Sending each of these right away
+costs one `msg` call per person in the room per message. The
+`BroadcastHandler` instead queues room messages for a short window
+(`BROADCAST_WINDOW` seconds) and then sends each receiver a single merged
+message holding everything they should see. Who receives a message is
+settled when it is queued, so someone walking in during the window does
+not hear of what happened before they arrived, and someone leaving still
+gets what they were there for.
+
+Messages can also be collapsed: when enough different actors queue messages
+with the same `collapse` template within one window, receivers get one line
+built from the template, such as "5 people are chopping trees.", instead of
+one line per actor.
+
+**Setup**
+    The handler is set up as a `lazy_property` named `broadcast` on the
+    Object typeclass. Use `room.broadcast.msg_contents(...)` in place of
+    `room.msg_contents(...)` for messages that may be delayed by a moment.
+"""
+from django.conf import settings
+from evennia.utils import delay, make_iter
+
+_WINDOW = getattr(settings, "BROADCAST_WINDOW", 0.5)
+_COLLAPSE_THRESHOLD = getattr(settings, "BROADCAST_COLLAPSE_THRESHOLD", 3)
+
+
+class BroadcastHandler:
+    """
+    Queues messages for everyone inside an object and sends them in batches.
+
+    Args:
+        obj (Object): the room (or other container) to broadcast in
+    """
+    __slots__ = ('obj', '_queue', '_pending')
+
+    def __init__(self, obj):
+        self.obj = obj
+        self._queue = []
+        self._pending = False
+
+    def msg_contents(self, text, exclude=None, actor=None, collapse=None):
+        """
+        Queue a message for everyone inside the object.
+
+        Args:
+            text (str): Message to send.
+            exclude (Object or list, optional): Objects not to send the message to.
+            actor (Object, optional): Who the message is about. Needed for collapsing.
+            collapse (str, optional): Template used when many actors queue messages
+                with the same template in one window. It is formatted with the
+                number of actors as `{count}`.
+        """
+        exclude = {obj.id for obj in make_iter(exclude) if obj}
+        receivers = [con for con in self.obj.contents
+                     if not con.destination and con.id not in exclude]
+        if _WINDOW <= 0:
+            self._send([(text, receivers, actor, collapse)])
+            return
+        self._queue.append((text, receivers, actor, collapse))
+        if not self._pending:
+            self._pending = True
+            delay(_WINDOW, self.flush)
+
+    def flush(self):
+        "Send all queued messages now."
+        queue, self._queue = self._queue, []
+        self._pending = False
+        if queue:
+            self._send(queue)
+
+    def _send(self, queue):
+        # Actors per collapse template, so we know which groups are big enough.
+        actors = {}
+        for _, _, actor, collapse in queue:
+            if collapse and actor:
+                actors.setdefault(collapse, set()).add(actor.id)
+
+        # Lines and collapsed templates of each receiver, in order of first message.
+        lines = {}
+        for text, receivers, actor, collapse in queue:
+            for receiver in receivers:
+                received, collapsed = lines.setdefault(receiver, ([], set()))
+                if collapse in actors:
+                    count = len(actors[collapse] - {receiver.id})
+                    if count >= _COLLAPSE_THRESHOLD:
+                        if collapse not in collapsed:
+                            collapsed.add(collapse)
+                            received.append(collapse.format(count=count))
+                        continue
+                received.append(text)
+        for receiver, (received, _) in lines.items():
+            if received and receiver.pk:
+                receiver.msg("\n".join(received))
@@ -0,0 +1,159 @@
+"""
+Bulk Transfers
+
+The item commands move a single object or stack at a time, so emptying a
+room takes a command per item. This module lets them move many items in one
+go, with targets such as:
+
+- `all`: everything that can be moved.
+- `all.log` or `all logs`: everything called log.
+- `3.log`: three logs, taken from as many stacks as needed.
+
+All targets are found in one pass over the container's contents (virtual
+stacks included), and the command reports the result as one summary, such
+as "three logs and an ore". Each split and merge runs in a transaction of
+its own; the moves as a whole don't, since the in-memory stack counts and
+contents they change would not be rolled back with the database.
+
+**Usage**
+    from world.bulk import parse_bulk, bulk_targets, bulk_move, bulk_summary
+
+    bulk = parse_bulk(self.args)
+    if bulk:
+        amount, name = bulk
+        objs, virtual = bulk_targets(caller.location, name, caller)
+        moved_objs, moved = bulk_move(objs, virtual, caller.location, caller, amount)
+        caller.msg(f"You pick up {bulk_summary(moved)}.")
+"""
+import re
+from collections import Counter
+from evennia.utils import list_to_string
+from world.stacks import StackConflict, numbered_name, plural_key
+
+_ALL_REGEX = re.compile(r"^all(?:[.\s]+(?P<name>.+))?$", re.I)
+_COUNT_REGEX = re.compile(r"^(?P<count>\d+)\.(?P<name>.+)$")
+
+
+def parse_bulk(text):
+    """
+    Parse the target of an item command as a bulk target.
+
+    Args:
+        text (str): What the player asked for, such as 'all.log' or '3.log'.
+
+    Returns:
+        bulk (tuple or None): (amount, name), where amount is None for all of
+            them and name is None for anything, or None if this is not a bulk
+            target.
+    """
+    text = text.strip()
+    match = _ALL_REGEX.match(text)
+    if match:
+        name = match.group("name")
+        return None, name.strip() if name else None
+    match = _COUNT_REGEX.match(text)
+    if match:
+        return max(int(match.group("count")), 1), match.group("name").strip()
+    return None
+
+
+def match_rank(key, name):
+    "How well a name matches a key: 2 for the key or its plural, 1 for partial, 0 for none."
+    key = key.lower()
+    if name in (key, plural_key(key)):
+        return 2
+    return 1 if key.startswith(name) else 0
+
+
+def bulk_targets(container, name=None, caller=None):
+    """
+    Find the items in a container a bulk target refers to. Exact and plural
+    matches are preferred over partial ones.
+
+    Args:
+        container (Object): Where to look.
+        name (str, optional): Name of the items, any item if not given.
+        caller (Object, optional): Who is looking, never a target.
+
+    Returns:
+        objs (list): Matching objects.
+        virtual (list): Prototype keys of matching virtual stacks.
+    """
+    objs = [con for con in container.contents
+            if con != caller and not con.destination and not con.has_account]
+    virtual = [prototype_key for prototype_key, _ in container.virtual_stacks.all()]
+    if name is None:
+        return objs, virtual
+    name = name.lower()
+    objs = [(match_rank(obj.key, name), obj) for obj in objs]
+    virtual = [(match_rank(container.virtual_stacks.key(prototype_key), name), prototype_key)
+               for prototype_key in virtual]
+    best = max([rank for rank, _ in objs + virtual] or [0])
+    if not best:
+        return [], []
+    return [obj for rank, obj in objs if rank == best], [key for rank, key in virtual if rank == best]
+
+
+def bulk_move(objs, virtual, source, destination, amount=None):
+    """
+    Move items into a destination, splitting the last stack if only part of
+    it is needed. Items that refuse to move, or whose stack keeps changing
+    under us, are left where they are.
+
+    Args:
+        objs (list): Objects to move.
+        virtual (list): Prototype keys of virtual stacks in `source` to move.
+        source (Object): Container holding the virtual stacks.
+        destination (Object): Where to move the items.
+        amount (int, optional): Stop after this many items, all if not given.
+
+    Returns:
+        moved_objs (list): The objects that were moved and still exist; a
+            stack merged into one moved after it is left out.
+        moved (Counter): Number of items moved, by key.
+
+    Raises:
+        StackConflict: If nothing was moved because of stacks that kept changing.
+    """
+    moved_objs, moved = [], Counter()
+    conflict = None
+    for obj in objs:
+        if amount is not None and amount <= 0:
+            break
+        count = obj.stack.count if obj.stack.stackable else 1
+        part = obj
+        if amount is not None and amount < count:
+            try:
+                part = obj.stack.split(amount)
+            except StackConflict as err:
+                conflict = err
+                continue
+            count = amount
+        if not part.move_to(destination, quiet=True):
+            if part is not obj:
+                # Put the split off items back on their stack.
+                obj.stack.merge(part)
+            continue
+        moved_objs.append(part)
+        moved[part.key] += count
+        if amount is not None:
+            amount -= count
+    for prototype_key in virtual:
+        if amount is not None and amount <= 0:
+            break
+        key = source.virtual_stacks.key(prototype_key)
+        count = source.virtual_stacks.count(prototype_key) if amount is None else amount
+        count = source.virtual_stacks.transfer(prototype_key, count, destination)
+        moved[key] += count
+        if amount is not None:
+            amount -= count
+    if conflict and not moved:
+        raise conflict
+    # Stacks arriving at the destination absorb its stacks of the same kind,
+    # including ones moved there earlier in this loop.
+    return [obj for obj in moved_objs if obj.pk], moved
+
+
+def bulk_summary(moved):
+    "Describe the items moved, such as 'three logs and an ore'."
+    return list_to_string([numbered_name(key, count) for key, count in sorted(moved.items())])
@@ -0,0 +1,144 @@
+"""
+Inlinefunc Cache
+
+With `INLINEFUNC_ENABLED`, every string sent to a session goes through
+Evennia's inlinefunc parser, and any string calling an inlinefunc has its
+calls run again on every send. This module puts a cache in front of it:
+
+- Strings calling no inlinefunc are sent as they are. A string without a
+  `$` costs one substring check; others are scanned for calls once and
+  remembered by the raw string.
+- Results of strings calling only pure inlinefuncs are remembered by the
+  raw string and the session flags a result may depend on (ANSI, XTERM256,
+  UTF-8, SCREENREADER and SCREENWIDTH). An inlinefunc is pure if its result
+  only depends on its arguments and these flags; mark one with the `pure`
+  decorator or list it in `INLINEFUNC_PURE`.
+- Everything else is parsed by Evennia as before.
+
+Both caches drop their least recently used entries beyond
+`INLINEFUNC_CACHE_SIZE` strings.
+
+**Setup**
+    `install()` is called from `at_server_start` when inlinefuncs are
+    enabled. `benchmark()` compares the parse throughput of some strings
+    with and without the cache.
+"""
+import re
+import time
+from collections import OrderedDict
+from django.conf import settings
+from evennia.utils import inlinefunc
+
+CACHE_SIZE = getattr(settings, "INLINEFUNC_CACHE_SIZE", 1024)
+# Names of the inlinefuncs whose results may be cached.
+PURE = set(getattr(settings, "INLINEFUNC_PURE", ("pad", "crop", "space", "clr")))
+# Session protocol flags the result of a pure inlinefunc may depend on.
+_SESSION_FLAGS = ("ANSI", "XTERM256", "UTF-8", "SCREENREADER", "SCREENWIDTH")
+# An unescaped inlinefunc call, as the parser finds them.
+_RE_CALL = re.compile(r"(?<!\\)\$(\w+)\(")
+
+# Inlinefuncs called by each string, most recently used last.
+_CALLS = OrderedDict()
+# Parsed strings by (string, strip, session flags), most recently used last.
+_RESULTS = OrderedDict()
+
+
+def pure(func):
+    """
+    Decorator marking an inlinefunc as pure, so the strings calling it may
+    have their results cached.
+    """
+    PURE.add(func.__name__)
+    return func
+
+
+def _cached(cache, key, build):
+    "Value of a key in an LRU cache, built and stored if missing."
+    try:
+        value = cache[key]
+    except KeyError:
+        value = cache[key] = build()
+        if len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+    else:
+        cache.move_to_end(key)
+    return value
+
+
+def _flags(session):
+    "The session flags a pure inlinefunc may depend on, as a hashable key."
+    if not session:
+        return None
+    flags = session.protocol_flags
+    width = flags.get("SCREENWIDTH")
+    return tuple(flags.get(flag) for flag in _SESSION_FLAGS[:-1]) + \
+        ((width or {}).get(0) if isinstance(width, dict) else width,)
+
+
+def parse_inlinefunc(string, strip=False, available_funcs=None, stacktrace=False, **kwargs):
+    """
+    Parse the inlinefuncs of a string like Evennia's `parse_inlinefunc`,
+    through the cache.
+
+    Args:
+        string (str): The incoming string to parse.
+        strip (bool, optional): Whether to strip function calls rather than
+            execute them.
+        available_funcs (dict, optional): Other inlinefuncs to use, which
+            bypasses the cache.
+        stacktrace (bool, optional): Print the parse stack, bypassing the
+            cache.
+
+    Keyword Args:
+        session (Session): The session the string is sent to.
+
+    Returns:
+        string (str): The parsed string.
+    """
+    if "$" not in string:
+        return string
+    if available_funcs or stacktrace:
+        return inlinefunc.parse_inlinefunc(string, strip=strip, available_funcs=available_funcs,
+                                           stacktrace=stacktrace, **kwargs)
+    calls = _cached(_CALLS, string, lambda: frozenset(_RE_CALL.findall(string)))
+    if not calls:
+        return string
+    if not calls <= PURE or set(kwargs) - {"session"}:
+        return inlinefunc.parse_inlinefunc(string, strip=strip, **kwargs)
+    return _cached(_RESULTS, (string, strip, _flags(kwargs.get("session"))),
+                   lambda: inlinefunc.parse_inlinefunc(string, strip=strip, **kwargs))
+
+
+def install():
+    "Have outgoing text parsed through the cache."
+    from evennia.server import sessionhandler
+    sessionhandler.parse_inlinefunc = parse_inlinefunc
+
+
+def clear():
+    "Forget all cached strings."
+    _CALLS.clear()
+    _RESULTS.clear()
+
+
+def benchmark(strings, repeat=1000):
+    """
+    Measure the parse throughput of strings with and without the cache.
+
+    Args:
+        strings (list): Strings to parse, such as room descriptions.
+        repeat (int, optional): Times each string is parsed.
+
+    Returns:
+        results (dict): Strings parsed per second by "evennia" and "cached".
+    """
+    results = {}
+    for name, func in (("evennia", inlinefunc.parse_inlinefunc), ("cached", parse_inlinefunc)):
+        clear()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for string in strings:
+                func(string)
+        elapsed = time.perf_counter() - started
+        results[name] = len(strings) * repeat / elapsed if elapsed else 0.0
+    return results
@@ -0,0 +1,165 @@
+"""
+Inventory View
+
+Listing an inventory reads the stack state and description of every item
+carried, and crafters carrying hundreds of stacks get one huge table back.
+The `InventoryView` keeps a row model of everything an object carries, built
+once and then patched as items arrive, leave or change count, and renders it
+a page of `INVENTORY_PAGE_SIZE` rows at a time, optionally filtered by name.
+Renaming or redescribing an item doesn't move it, so the rows are checked
+against the names and descs of the items every time they are read, and only
+the rendered pages are thrown away when one of them changed.
+
+Clients that support OOB data (GMCP or the webclient) are also sent the rows
+as an `inventory` OOB command, through the `inventory` topic of
+`world.monitor`. The first time they get every row, marked `full`; after
+that only the rows that were added, changed or removed, once per tick.
+
+**Setup**
+    The view is set up as a `lazy_property` named `inventory` on the
+    Object typeclass, which keeps it up to date from its
+    `at_object_receive`/`at_object_leave` hooks and stack changes.
+"""
+from django.conf import settings
+from evennia.utils import evtable
+from world import monitor
+from world.stacks import numbered_name
+
+PAGE_SIZE = getattr(settings, "INVENTORY_PAGE_SIZE", 20)
+
+
+class InventoryView:
+    """
+    Cached row model of the items an object carries.
+
+    Args:
+        obj (Object): the object carrying the items
+    """
+    __slots__ = ('obj', '_rows', '_pages')
+
+    def __init__(self, obj):
+        self.obj = obj
+        # Rows by row id, None until first needed.
+        self._rows = None
+        # Rendered pages by (filter, page).
+        self._pages = {}
+
+    @staticmethod
+    def _row(item):
+        "Row of a carried object: (name, count or None if unstackable, desc)."
+        return item.name, item.stack.count if item.stack.stackable else None, item.db.desc or ""
+
+    def _virtual_rows(self):
+        "Rows of the virtual stacks carried."
+        virtual = self.obj.virtual_stacks
+        return {f"v{prototype_key}": (virtual.key(prototype_key), count, virtual.desc(prototype_key))
+                for prototype_key, count in virtual.all()}
+
+    @property
+    def rows(self):
+        "All rows, by row id, brought up to date with renamed or redescribed items."
+        if self._rows is None:
+            self._rows = {item.id: self._row(item) for item in self.obj.contents}
+            self._rows.update(self._virtual_rows())
+        else:
+            for item in self.obj.contents:
+                self.update(item)
+        return self._rows
+
+    def _changed(self, changes):
+        self._pages = {}
+        monitor.notify(self.obj, "inventory", {row_id: row and monitor.inventory_entry(row_id, row)
+                                               for row_id, row in changes.items()})
+
+    def update(self, item):
+        "Add or refresh the row of a carried object."
+        if self._rows is None:
+            return
+        row = self._row(item)
+        if self._rows.get(item.id) != row:
+            self._rows[item.id] = row
+            self._changed({item.id: row})
+
+    def remove(self, item):
+        "Remove the row of an object no longer carried."
+        if self._rows is not None and self._rows.pop(item.id, None):
+            self._changed({item.id: None})
+
+    def update_virtual(self):
+        "Refresh the rows of the virtual stacks carried."
+        if self._rows is None:
+            return
+        old = {row_id: row for row_id, row in self._rows.items() if isinstance(row_id, str)}
+        new = self._virtual_rows()
+        for row_id in old:
+            del self._rows[row_id]
+        self._rows.update(new)
+        changes = {row_id: None for row_id in old if row_id not in new}
+        changes.update((row_id, row) for row_id, row in new.items() if old.get(row_id) != row)
+        if changes:
+            self._changed(changes)
+
+    def invalidate(self):
+        "Rebuild every row next time they are needed."
+        self._rows = None
+        self._pages = {}
+
+    def filtered(self, term=None):
+        """
+        Rows matching a name filter.
+
+        Args:
+            term (str, optional): Part of the singular or plural item name,
+                such as 'log' or 'logs'.
+
+        Returns:
+            rows (list): The matching rows.
+        """
+        rows = list(self.rows.values())
+        if term:
+            term = term.lower()
+            rows = [row for row in rows if term in row[0].lower() or
+                    term in numbered_name(row[0], 2).lower()]
+        return rows
+
+    def render(self, term=None, page=1):
+        """
+        Render a page of the inventory.
+
+        Args:
+            term (str, optional): Only list items whose name matches this.
+            page (int, optional): Page to show, starting at 1.
+
+        Returns:
+            string (str): The inventory page.
+        """
+        rows = self.filtered(term)
+        string = self._pages.get((term, page))
+        if string is not None:
+            return string
+        if not rows:
+            string = "You are not carrying anything." if not term else \
+                f"You are not carrying anything matching '{term}'."
+        else:
+            pages = (len(rows) - 1) // PAGE_SIZE + 1
+            page = min(max(page, 1), pages)
+            table = evtable.EvTable(border="header")
+            for name, count, desc in rows[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]:
+                if count is None:
+                    table.add_row(f"|C{name}|n", desc)
+                else:
+                    table.add_row(f"|C{name}|n|w(|g{count}|w)|n", desc)
+            string = "|wYou are carrying:\n%s" % table
+            if pages > 1:
+                string += f"\n|wPage {page} of {pages}.|n"
+        self._pages[(term, page)] = string
+        return string
+
+    def send_oob(self):
+        """
+        Subscribe the sessions of the carrier that support OOB data to
+        inventory updates, sending them every row the first time.
+        """
+        for sess in self.obj.sessions.all():
+            if sess.protocol_flags.get("OOB") and "inventory" not in (sess.ndb.monitored or ()):
+                monitor.subscribe(sess, ["inventory"])
@@ -0,0 +1,221 @@
+"""
+Load Generation
+
+Stack merging, harvesting and room rendering can regress without anyone
+noticing until the game is busy. This module puts the game layer under a
+repeatable load: it builds a sandbox room with a tree and a pile of logs,
+fills it with simulated characters and has them run a seeded mix of `look`,
+`inv`, `get`, `drop`, `give`, `chop` and `stop` through their real cmdsets.
+
+For each command it reports the throughput, the p50 and p99 latency and the
+database queries per run, and compares them with a baseline stored by an
+earlier run, so a change can be judged on numbers. The same seed, number of
+characters and rounds always issue the same commands.
+
+The load is run on an in-memory test database by the `TestLoadGeneration`
+suite in `world/tests.py`:
+
+    BENCHMARK=1 evennia test --settings settings.py world.tests.TestLoadGeneration
+
+which prints the comparison and fails if a command now needs more queries
+than in the baseline. `LOADGEN_CHARACTERS` and `LOADGEN_ROUNDS` in the
+environment size the load and `LOADGEN_SAVE=1` stores the results as the
+new baseline. The `loadgen` command runs the same load on a live
+development server, blocking it while it runs.
+
+**Usage**
+    from world import loadgen
+
+    results = loadgen.run(characters=20, rounds=50)
+    print(loadgen.report(results, loadgen.load_baseline()))
+    loadgen.save_baseline(results)
+"""
+import json
+import os
+import random
+import time
+from django.conf import settings
+from evennia.utils import create, evtable, logger, search
+from commands.harvest import stop_harvesting
+from world import profiling
+from world.templates import get_template, spawn_many
+
+SEED = getattr(settings, "LOADGEN_SEED", 1)
+BASELINE = getattr(settings, "LOADGEN_BASELINE",
+                   os.path.join(settings.GAME_DIR, "server", "loadgen_baseline.json"))
+# Relative weight of each kind of command in the mix.
+MIX = getattr(settings, "LOADGEN_MIX", {"look": 4, "inv": 2, "get": 3, "drop": 3,
+                                        "give": 2, "chop": 1, "stop": 1})
+# Logs lying in the sandbox room at the start.
+LOGS = 50
+
+# Tag marking everything the load generator creates.
+_TAG = ("loadgen", "loadgen")
+
+
+def setup(characters):
+    """
+    Build the sandbox room and its characters.
+
+    Args:
+        characters (int): How many characters to create.
+
+    Returns:
+        room (Room): The sandbox room.
+        bots (list): The characters, in a fixed order.
+    """
+    room = create.create_object(settings.BASE_ROOM_TYPECLASS, key="Load generation", tags=[_TAG])
+    tree = get_template("tree").instantiate(room)
+    tree.tags.add(*_TAG)
+    spawn_many("log", LOGS, room)
+    bots = [create.create_object(settings.BASE_CHARACTER_TYPECLASS, key=f"bot{num}",
+                                 location=room, home=room, tags=[_TAG])
+            for num in range(1, characters + 1)]
+    return room, bots
+
+
+def cleanup():
+    "Delete everything the load generator created, with all it holds."
+    for obj in search.search_tag(*_TAG):
+        if hasattr(obj, "ndb") and obj.ndb.harvesting:
+            stop_harvesting(obj)
+    for obj in search.search_tag(*_TAG):
+        for con in obj.contents:
+            if not con.tags.get(*_TAG):
+                con.delete()
+        obj.delete()
+
+
+def _command(rng, name, bot, bots):
+    "The command line a character runs for a kind of command."
+    if name in ("get", "drop"):
+        return f"{name} {rng.randint(1, 3)} log"
+    if name == "give":
+        other = rng.choice([other for other in bots if other != bot] or [bot])
+        return f"give log to {other.key}"
+    if name == "chop":
+        return "chop tree"
+    return name
+
+
+def percentile(values, fraction):
+    "Value below which `fraction` of the sorted values lie."
+    if not values:
+        return 0.0
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def run(characters=10, rounds=20, seed=SEED):
+    """
+    Put the game under load and measure it.
+
+    Args:
+        characters (int, optional): Simulated characters.
+        rounds (int, optional): Commands each character runs.
+        seed (int, optional): Seed of the command mix.
+
+    Returns:
+        results (dict): Settings of the run and, under "commands", the
+            runs, throughput (per second), p50 and p99 latency (ms) and
+            queries per run of each kind of command.
+    """
+    cleanup()
+    rng = random.Random(seed)
+    names, weights = zip(*sorted(MIX.items()))
+    samples = {name: ([], []) for name in names}
+    room, bots = setup(characters)
+    try:
+        for _ in range(rounds):
+            for bot in bots:
+                name = rng.choices(names, weights)[0]
+                line = _command(rng, name, bot, bots)
+                queries = profiling.query_count()
+                started = time.perf_counter()
+                bot.execute_cmd(line)
+                samples[name][0].append((time.perf_counter() - started) * 1000)
+                samples[name][1].append(profiling.query_count() - queries)
+    finally:
+        try:
+            cleanup()
+        except Exception:
+            logger.log_trace("Could not clean up after load generation.")
+
+    results = {"characters": characters, "rounds": rounds, "seed": seed, "commands": {}}
+    for name, (latencies, queries) in samples.items():
+        if not latencies:
+            continue
+        latencies.sort()
+        results["commands"][name] = {
+            "runs": len(latencies),
+            "throughput": len(latencies) / (sum(latencies) / 1000) if sum(latencies) else 0.0,
+            "p50": percentile(latencies, 0.5),
+            "p99": percentile(latencies, 0.99),
+            "queries": sum(queries) / len(queries),
+        }
+    return results
+
+
+def load_baseline():
+    "The stored baseline results, or None if there are none."
+    if not os.path.exists(BASELINE):
+        return None
+    with open(BASELINE) as fil:
+        return json.load(fil)
+
+
+def save_baseline(results):
+    "Store results as the baseline later runs are compared with."
+    with open(BASELINE, "w") as fil:
+        json.dump(results, fil, indent=2, sort_keys=True)
+
+
+def compare(results, baseline=None):
+    """
+    Compare results with a baseline.
+
+    Args:
+        results (dict): Results of `run`.
+        baseline (dict, optional): Earlier results to compare with.
+
+    Returns:
+        rows (list): For each kind of command, a tuple of its name and, for
+            each of throughput, p50, p99 and queries, the value and its
+            change from the baseline in percent, or None without one.
+    """
+    base = (baseline or {}).get("commands", {})
+    rows = []
+    for name, stats in sorted(results["commands"].items()):
+        row = [name]
+        for field in ("throughput", "p50", "p99", "queries"):
+            old = base.get(name, {}).get(field)
+            change = (stats[field] - old) / old * 100 if old else None
+            row.extend([stats[field], change])
+        rows.append(tuple(row))
+    return rows
+
+
+def report(results, baseline=None):
+    """
+    Table of results next to their change from a baseline.
+
+    Args:
+        results (dict): Results of `run`.
+        baseline (dict, optional): Earlier results to compare with.
+
+    Returns:
+        report (str): The table, with a title line.
+    """
+    def change(value):
+        return "" if value is None else f"{value:+.0f}%"
+
+    table = evtable.EvTable("|wcommand|n", "|wper sec|n", "", "|wp50 ms|n", "", "|wp99 ms|n", "",
+                            "|wqueries|n", "", border="header")
+    for name, throughput, dthroughput, p50, dp50, p99, dp99, queries, dqueries in \
+            compare(results, baseline):
+        table.add_row(name, f"{throughput:.0f}", change(dthroughput), f"{p50:.1f}", change(dp50),
+                      f"{p99:.1f}", change(dp99), f"{queries:.1f}", change(dqueries))
+    string = f"|wLoad of {results['characters']} characters over {results['rounds']} rounds|n"
+    if baseline:
+        string += (f", compared with a baseline of {baseline['characters']} characters over "
+                   f"{baseline['rounds']} rounds")
+    return f"{string}:\n{table}"
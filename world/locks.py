@@ -0,0 +1,232 @@
+"""
+Compiled Locks
+
+Evennia's LockHandler parses the lock string of every object it is set up
+on, and on every check calls each lock function and then `eval`s the
+combined result string. Access checks are everywhere: every `get`, every
+harvesting command and, through `view` locks, every object listed when
+looking at a room.
+
+This module's `LockHandler` makes those checks cheaper in three ways:
+
+- Lock strings are parsed once per distinct string rather than once per
+  object, as most objects share theirs (every tree has
+  "get:false();chop:all()").
+- Each lock is compiled once into a Python closure. Locks made only of the
+  constant `all()`, `true()`, `false()` and `none()` fold into a constant
+  result without calling anything.
+- Results are cached per (accessing object, object, access type) until
+  the reactor's next turn, or for `LOCK_CACHE_WINDOW` seconds if set, so a
+  command or room render checking the same access repeatedly only
+  evaluates it once. Changing the locks, permissions, tags or Attributes
+  of anything clears the cached results, as lock functions may check them.
+  Only checks between database objects are cached, keyed by their classes
+  and ids; checks by sessions and the like are evaluated every time.
+
+**Setup**
+    The handler is set up as the `locks` lazy_property of the Object, Exit
+    and Account typeclasses, and `PermissionHandler`, `TagHandler` and
+    `AttributeHandler` as their `permissions`, `tags` and `attributes`
+    (the Object's through `world.profiling.AttributeHandler`).
+"""
+from django.conf import settings
+from evennia.locks.lockhandler import LockHandler as BaseLockHandler
+from evennia.typeclasses.attributes import AttributeHandler as BaseAttributeHandler
+from evennia.typeclasses.tags import PermissionHandler as BasePermissionHandler
+from evennia.typeclasses.tags import TagHandler as BaseTagHandler
+from evennia.utils import delay
+
+_WINDOW = getattr(settings, "LOCK_CACHE_WINDOW", 0)
+# Lock functions with no arguments whose result never changes.
+_CONSTANTS = {"all": True, "true": True, "false": False, "none": False}
+
+# Parsed locks by lock string.
+_PARSED = {}
+# Compiled locks by lock definition, such as 'get:false()'.
+_COMPILED = {}
+# Access results by (accessing object class, id, object class, id, access type, bypass).
+_RESULTS = {}
+_clear_pending = False
+
+
+def clear_lock_cache():
+    "Forget all cached access results."
+    global _clear_pending
+    _RESULTS.clear()
+    _clear_pending = False
+
+
+def compile_lock(evalstring, func_tup):
+    """
+    Compile a parsed lock into a function.
+
+    Args:
+        evalstring (str): The lock's combining expression, with a `%s` where
+            each lock function's result goes.
+        func_tup (tuple): (func, args, kwargs) of each lock function.
+
+    Returns:
+        check (callable): Function called with the accessing object and the
+            object, returning True if access is granted.
+    """
+    if all(not args and not kwargs and func.__name__ in _CONSTANTS
+           for func, args, kwargs in func_tup):
+        result = bool(eval(evalstring % tuple(_CONSTANTS[func.__name__] for func, _, _ in func_tup)))
+        return lambda accessing_obj, accessed_obj: result
+    namespace = {}
+    calls = []
+    for num, (func, args, kwargs) in enumerate(func_tup):
+        namespace.update({f"_f{num}": func, f"_a{num}": args, f"_k{num}": kwargs})
+        calls.append(f"bool(_f{num}(a, o, *_a{num}, **_k{num}))")
+    # The evalstring only holds placeholders and and/or/not, as checked when parsing.
+    return eval("lambda a, o: " + (evalstring % tuple(calls) or "False"), namespace)
+
+
+class LockHandler(BaseLockHandler):
+    """
+    LockHandler sharing parsed and compiled locks between objects and
+    caching access results.
+    """
+    def _parse_lockstring(self, storage_lockstring):
+        locks = _PARSED.get(storage_lockstring)
+        if locks is None:
+            locks = super()._parse_lockstring(storage_lockstring)
+            _PARSED[storage_lockstring] = locks
+        return dict(locks)
+
+    def _save_locks(self):
+        super()._save_locks()
+        clear_lock_cache()
+
+    def _bypass(self, accessing_obj):
+        "Does the accessing object bypass locks, as a superuser?"
+        try:
+            return accessing_obj.locks.lock_bypass
+        except AttributeError:
+            # happens before session is initiated.
+            return ((hasattr(accessing_obj, "is_superuser") and accessing_obj.is_superuser)
+                    or (hasattr(accessing_obj, "account")
+                        and hasattr(accessing_obj.account, "is_superuser")
+                        and accessing_obj.account.is_superuser)
+                    or (hasattr(accessing_obj, "get_account")
+                        and (not accessing_obj.get_account()
+                             or accessing_obj.get_account().is_superuser)))
+
+    def check(self, accessing_obj, access_type, default=False, no_superuser_bypass=False):
+        """
+        Checks a lock of the correct type through its compiled function,
+        caching the result.
+
+        Args:
+            accessing_obj (object): The object seeking access.
+            access_type (str): The type of access wanted.
+            default (bool, optional): If no suitable lock type is
+                found, default to this result.
+            no_superuser_bypass (bool): Don't use this unless you
+                really, really need to, it makes supersusers susceptible
+                to the lock check.
+
+        """
+        global _clear_pending
+        # Only database objects have a pk; sessions, for one, have an id too.
+        accessing_id, obj_id = getattr(accessing_obj, "pk", None), getattr(self.obj, "pk", None)
+        if accessing_id and obj_id:
+            # Ids are only unique per table, so the classes are part of the key.
+            key = (type(accessing_obj), accessing_id, type(self.obj), obj_id, access_type,
+                   no_superuser_bypass)
+            result = _RESULTS.get(key)
+            if result is not None:
+                return result
+        else:
+            key = None
+
+        if not no_superuser_bypass and self._bypass(accessing_obj):
+            result = True
+        elif access_type in self.locks:
+            evalstring, func_tup, raw_string = self.locks[access_type]
+            compiled = _COMPILED.get(raw_string)
+            if compiled is None:
+                compiled = _COMPILED[raw_string] = compile_lock(evalstring, func_tup)
+            result = compiled(accessing_obj, self.obj)
+        else:
+            return default
+
+        if key is None:
+            return result
+        _RESULTS[key] = result
+        if not _clear_pending:
+            _clear_pending = True
+            delay(_WINDOW, clear_lock_cache)
+        return result
+
+
+class PermissionHandler(BasePermissionHandler):
+    """
+    PermissionHandler clearing cached access results whenever permissions
+    change.
+    """
+    def add(self, *args, **kwargs):
+        result = super().add(*args, **kwargs)
+        clear_lock_cache()
+        return result
+
+    def remove(self, *args, **kwargs):
+        result = super().remove(*args, **kwargs)
+        clear_lock_cache()
+        return result
+
+    def clear(self, *args, **kwargs):
+        result = super().clear(*args, **kwargs)
+        clear_lock_cache()
+        return result
+
+
+class TagHandler(BaseTagHandler):
+    """
+    TagHandler clearing cached access results whenever tags change.
+    """
+    def add(self, *args, **kwargs):
+        result = super().add(*args, **kwargs)
+        clear_lock_cache()
+        return result
+
+    def batch_add(self, *args, **kwargs):
+        result = super().batch_add(*args, **kwargs)
+        clear_lock_cache()
+        return result
+
+    def remove(self, *args, **kwargs):
+        result = super().remove(*args, **kwargs)
+        clear_lock_cache()
+        return result
+
+    def clear(self, *args, **kwargs):
+        result = super().clear(*args, **kwargs)
+        clear_lock_cache()
+        return result
+
+
+class AttributeHandler(BaseAttributeHandler):
+    """
+    AttributeHandler clearing cached access results whenever Attributes
+    change.
+    """
+    def add(self, *args, **kwargs):
+        result = super().add(*args, **kwargs)
+        clear_lock_cache()
+        return result
+
+    def batch_add(self, *args, **kwargs):
+        result = super().batch_add(*args, **kwargs)
+        clear_lock_cache()
+        return result
+
+    def remove(self, *args, **kwargs):
+        result = super().remove(*args, **kwargs)
+        clear_lock_cache()
+        return result
+
+    def clear(self, *args, **kwargs):
+        result = super().clear(*args, **kwargs)
+        clear_lock_cache()
+        return result
@@ -0,0 +1,191 @@
+"""
+Server Metrics
+
+Lag spikes are hard to diagnose after the fact. The `MetricsService` samples
+the server every `METRICS_INTERVAL` seconds and keeps the last
+`METRICS_BUFFER_SIZE` samples in a ring buffer:
+
+    lag_ms            how late the sample ran, which is how long the
+                      reactor was kept busy by something else
+    delayed_calls     calls waiting in the reactor, such as pending
+                      `delay`s and script timers
+    cached_objects    database objects held in the idmapper cache
+    attr_hit_rate     share of Attribute lookups served without a query
+    commands_per_sec  commands run per second since the last sample
+    typeclasses       cached accounts, objects, scripts and channels per
+                      typeclass path
+
+The samples are served as plain text to local connections only, on
+http://127.0.0.1:METRICS_PORT/ (the latest sample with the worst lag in
+the buffer) and /all (every sample, oldest first).
+
+`capture` runs cProfile over the whole server for some seconds, writing
+the stats to `METRICS_PROFILE_DIR` and returning the most expensive calls,
+so a lag spike can be profiled while it happens without a restart. The
+`profile` command starts one.
+
+**Setup**
+    `start_plugin_services` in `server/conf/server_services_plugins.py`
+    adds the services to the server. Set `METRICS_ENABLED = False` to
+    leave them out.
+"""
+import cProfile
+import io
+import os
+import pstats
+import time
+from collections import Counter, deque
+from django.conf import settings
+from twisted.application import internet, service
+from twisted.internet import reactor, task
+from twisted.web import resource, server
+from evennia.utils import delay, logger
+from world import profiling
+
+ENABLED = getattr(settings, "METRICS_ENABLED", True)
+INTERVAL = getattr(settings, "METRICS_INTERVAL", 5)
+BUFFER_SIZE = getattr(settings, "METRICS_BUFFER_SIZE", 720)
+PORT = getattr(settings, "METRICS_PORT", 4010)
+PROFILE_DIR = getattr(settings, "METRICS_PROFILE_DIR", settings.LOG_DIR)
+# Calls listed in the summary of a profile capture.
+PROFILE_LINES = 25
+
+# Samples, oldest first.
+SAMPLES = deque(maxlen=BUFFER_SIZE)
+# The running profile capture, if any.
+_capture = None
+
+
+def cached_typeclasses():
+    "Number of cached accounts, objects, scripts and channels per typeclass path."
+    from evennia.accounts.models import AccountDB
+    from evennia.comms.models import ChannelDB
+    from evennia.objects.models import ObjectDB
+    from evennia.scripts.models import ScriptDB
+    typeclasses = Counter()
+    for model in (AccountDB, ObjectDB, ScriptDB, ChannelDB):
+        typeclasses.update(obj.typeclass_path for obj in model.get_all_cached_instances())
+    return dict(typeclasses)
+
+
+class MetricsService(service.Service):
+    """
+    Service sampling the server into the ring buffer.
+    """
+    name = "MetricsService"
+
+    def __init__(self):
+        self._loop = None
+        # When the next sample is due, and the totals at the last one.
+        self._due = None
+        self._last = None
+
+    def startService(self):
+        super().startService()
+        self._last = self._totals()
+        self._due = self._last[0] + INTERVAL
+        self._loop = task.LoopingCall(self.sample)
+        self._loop.start(INTERVAL, now=False)
+
+    def stopService(self):
+        if self._loop and self._loop.running:
+            self._loop.stop()
+        return super().stopService()
+
+    @staticmethod
+    def _totals():
+        return (time.monotonic(), profiling.commands_run(), profiling.attribute_lookups(),
+                profiling.attribute_misses())
+
+    def sample(self):
+        "Take a sample of the server."
+        from evennia.utils.idmapper.models import cache_size
+        totals = self._totals()
+        now, commands, lookups, misses = totals
+        then, last_commands, last_lookups, last_misses = self._last
+        lag = max(now - self._due, 0)
+        self._last, self._due = totals, now + INTERVAL
+        # The typeclass counts of cache_size are by database model.
+        cached, _ = cache_size()
+        lookups, misses = lookups - last_lookups, misses - last_misses
+        SAMPLES.append({
+            "time": time.time(),
+            "lag_ms": round(lag * 1000, 1),
+            "delayed_calls": len(reactor.getDelayedCalls()),
+            "cached_objects": cached,
+            "attr_hit_rate": round(max(lookups - misses, 0) / lookups, 3) if lookups else 1.0,
+            "commands_per_sec": round((commands - last_commands) / (now - then), 2) if now > then else 0.0,
+            "typeclasses": cached_typeclasses(),
+        })
+
+
+def format_sample(sample):
+    "A sample as lines of `name value`."
+    lines = [f"{name} {value}" for name, value in sample.items() if name != "typeclasses"]
+    lines.extend(f'typeclass_objects{{typeclass="{name}"}} {number}'
+                 for name, number in sorted(sample["typeclasses"].items()))
+    return "\n".join(lines)
+
+
+class MetricsResource(resource.Resource):
+    """
+    Plain text view of the samples.
+    """
+    isLeaf = True
+
+    def render_GET(self, request):
+        request.setHeader(b"content-type", b"text/plain; charset=utf-8")
+        if not SAMPLES:
+            return b"no samples yet\n"
+        if request.path.rstrip(b"/") == b"/all":
+            text = "\n\n".join(format_sample(sample) for sample in SAMPLES)
+        else:
+            text = format_sample(SAMPLES[-1])
+            text += f"\nmax_lag_ms {max(sample['lag_ms'] for sample in SAMPLES)}"
+        return (text + "\n").encode("utf-8")
+
+
+def make_services():
+    """
+    The metrics services to add to the server: the sampler and the local
+    text endpoint.
+    """
+    endpoint = internet.TCPServer(PORT, server.Site(MetricsResource()), interface="127.0.0.1")
+    endpoint.setName("MetricsEndpoint")
+    return [MetricsService(), endpoint]
+
+
+def capture(seconds, callback):
+    """
+    Profile the server for some seconds.
+
+    Args:
+        seconds (float): How long to profile.
+        callback (callable): Called with the summary of the most expensive
+            calls and the path of the stats file when done.
+
+    Returns:
+        started (bool): False if a capture is already running.
+    """
+    global _capture
+    if _capture:
+        return False
+    _capture = cProfile.Profile()
+    _capture.enable()
+
+    def _finish():
+        global _capture
+        profile, _capture = _capture, None
+        profile.disable()
+        path = os.path.join(PROFILE_DIR, time.strftime("profile-%Y%m%d-%H%M%S.prof"))
+        try:
+            profile.dump_stats(path)
+        except OSError:
+            logger.log_trace("Could not write the profile.")
+            path = None
+        output = io.StringIO()
+        pstats.Stats(profile, stream=output).sort_stats("cumulative").print_stats(PROFILE_LINES)
+        callback(output.getvalue(), path)
+
+    delay(seconds, _finish)
+    return True
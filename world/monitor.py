@@ -0,0 +1,168 @@
+"""
+State Monitor
+
+Graphical clients want to show a character's inventory, what it is
+harvesting and who and what is in the room, and would otherwise have to
+poll with `inv` and `look` and scrape the text. Instead a session can
+subscribe to these through the `monitor_state` inputfunc and is then
+pushed a snapshot followed by deltas as OOB commands (GMCP `Core.<Topic>`
+for telnet clients):
+
+    inventory   {"full": bool, "update": [{"id", "name", "count", "desc"}], "remove": [id]}
+    harvest     {"full": bool, "update": [{"id", "name", "hp", "max_hp"}], "remove": [id]}
+    room        {"full": bool, "update": [{"id", "name", "exit"}], "remove": [id]}
+
+Changes are collected per character and topic and sent once per server
+tick, or every `MONITOR_WINDOW` seconds if set, so a burst of changes (a
+stack counted down one log at a time, a crowd walking in) collapses into
+a single message holding only the latest state of each entry.
+
+**Usage**
+    monitor.notify(character, "harvest", {tree.id: {...}})  # entry changed
+    monitor.notify(character, "harvest", {tree.id: None})   # entry gone
+"""
+from django.conf import settings
+from evennia.utils import delay
+
+_WINDOW = getattr(settings, "MONITOR_WINDOW", 0)
+TOPICS = ("inventory", "harvest", "room")
+
+# Number of subscribed sessions per topic, to skip work nobody asked for.
+_SUBSCRIBED = dict.fromkeys(TOPICS, 0)
+# Changes not sent yet: {(object id, topic): (object, topic, {entry id: entry or None})}
+_PENDING = {}
+_flush_pending = False
+
+
+def _sessions(obj, topic):
+    "The sessions of an object subscribed to a topic."
+    return [sess for sess in obj.sessions.all() if topic in (sess.ndb.monitored or ())]
+
+
+def _send(obj, topic, changes, sessions, full=False):
+    update = [entry for entry in changes.values() if entry is not None]
+    remove = [entry_id for entry_id, entry in changes.items() if entry is None]
+    obj.msg(**{topic: ((), {"full": full, "update": update, "remove": remove})}, session=sessions)
+
+
+def snapshot(obj, topic):
+    """
+    The current state of a topic for a character.
+
+    Returns:
+        entries (dict): Entries by entry id.
+    """
+    if topic == "inventory":
+        return {row_id: inventory_entry(row_id, row) for row_id, row in obj.inventory.rows.items()}
+    if topic == "harvest":
+        target = obj.ndb.harvest_target if obj.ndb.harvesting else None
+        return {target.id: harvest_entry(target)} if target and target.pk else {}
+    if topic == "room" and obj.location:
+        return {con.id: room_entry(con) for con in obj.location.contents if con != obj}
+    return {}
+
+
+def inventory_entry(row_id, row):
+    "Entry of an inventory row, see `InventoryView`."
+    name, count, desc = row
+    return {"id": row_id, "name": name, "count": count, "desc": desc}
+
+
+def harvest_entry(target):
+    "Entry of a harvestable being harvested."
+    return {"id": target.id, "name": target.name, "hp": max(target.hp, 0), "max_hp": target.max_hp}
+
+
+def room_entry(obj):
+    "Entry of an object in a room."
+    return {"id": obj.id, "name": obj.name, "exit": bool(obj.destination)}
+
+
+def subscribe(session, topics):
+    """
+    Subscribe a session to topics and send it their current state.
+
+    Args:
+        session (Session): The subscribing session.
+        topics (list): Topics to subscribe to.
+    """
+    monitored = session.ndb.monitored or set()
+    session.ndb.monitored = monitored
+    puppet = session.puppet
+    for topic in topics:
+        if topic not in monitored:
+            monitored.add(topic)
+            _SUBSCRIBED[topic] += 1
+        if puppet:
+            _send(puppet, topic, snapshot(puppet, topic), [session], full=True)
+
+
+def unsubscribe(session, topics=None):
+    """
+    Unsubscribe a session from topics.
+
+    Args:
+        session (Session): The subscribed session.
+        topics (list, optional): Topics to unsubscribe from, all if not given.
+    """
+    monitored = session.ndb.monitored or set()
+    for topic in list(monitored if topics is None else topics):
+        if topic in monitored:
+            monitored.discard(topic)
+            _SUBSCRIBED[topic] -= 1
+
+
+def resend(obj, topics=TOPICS):
+    """
+    Send full snapshots to the subscribed sessions of an object, such as
+    when it is puppeted or enters another room.
+    """
+    for topic in topics:
+        if _SUBSCRIBED[topic]:
+            sessions = _sessions(obj, topic)
+            if sessions:
+                _send(obj, topic, snapshot(obj, topic), sessions, full=True)
+
+
+def notify(obj, topic, changes):
+    """
+    Queue changed entries of a topic for the sessions of an object.
+
+    Args:
+        obj (Object): The character whose state changed.
+        topic (str): One of `TOPICS`.
+        changes (dict): Changed entries by entry id, None for entries
+            that are gone.
+    """
+    global _flush_pending
+    if not _SUBSCRIBED[topic] or not obj.sessions.count():
+        return
+    pending = _PENDING.get((obj.id, topic))
+    if pending is None:
+        _PENDING[(obj.id, topic)] = (obj, topic, dict(changes))
+    else:
+        pending[2].update(changes)
+    if not _flush_pending:
+        _flush_pending = True
+        delay(_WINDOW, flush)
+
+
+def notify_contents(room, changes):
+    "Queue changed room entries for everyone in a room."
+    if not _SUBSCRIBED["room"]:
+        return
+    for con in room.contents:
+        if con.sessions.count():
+            notify(con, "room", {key: value for key, value in changes.items() if key != con.id})
+
+
+def flush():
+    "Send all queued changes now."
+    global _flush_pending
+    pending = list(_PENDING.values())
+    _PENDING.clear()
+    _flush_pending = False
+    for obj, topic, changes in pending:
+        sessions = _sessions(obj, topic) if obj.pk else None
+        if sessions and changes:
+            _send(obj, topic, changes, sessions)
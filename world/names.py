@@ -0,0 +1,244 @@
+"""
+Name Resolution
+
+Every `get`, `drop`, `give` and harvesting command looks its targets up
+with `caller.search`, which queries the database for key and alias matches
+among the contents of the caller and its location, and `give` does so
+twice. The `NameIndex` keeps the keys and aliases of everything an object
+holds in memory instead, built once and then reused until its contents
+change, and resolves search terms the same way Evennia's object search
+does:
+
+- an exact key or alias match, case-insensitively, wins;
+- otherwise, unless the search is exact, the keys and then the aliases
+  are matched by word beginnings, so "lo" finds "log" and "o lo" finds
+  "oak log";
+- a term such as "2-log" or "2.log" picks the second of these matches
+  for "log", and finds nothing if there are fewer.
+
+Matches come in the order of their object ids, as from the database.
+Renaming an object or changing its aliases does not update the index of
+its location; call `location.names.invalidate()` after doing so.
+
+**Setup**
+    The index is set up as a `lazy_property` named `names` on the Object
+    typeclass, whose `search` uses it for plain searches of its contents
+    and location, dropping the matches whose `search` lock fails like
+    Evennia does. Searches by typeclass, tags, Attribute, candidates or
+    globally are left to Evennia.
+"""
+import re
+from operator import attrgetter
+from django.conf import settings
+from evennia.utils import make_iter
+
+_RE_MULTIMATCH = re.compile(settings.SEARCH_MULTIMATCH_REGEX, re.I + re.U)
+# Search terms whose resolution is remembered per index.
+_MEMO_SIZE = 256
+# Terms left to Evennia's search, which handles them specially.
+_SPECIAL = ("here", "me", "self")
+
+
+def partial_score(words, name):
+    """
+    How well words match the beginnings of the words of a name, in order,
+    like Evennia's `string_partial_matching`.
+
+    Args:
+        words (list): Lowercase words of the search term.
+        name (str): Key or alias to match.
+
+    Returns:
+        score (int): Number of words matched, 0 if any word did not match.
+    """
+    name_words = name.lower().split()
+    last_index = 0
+    for word in words:
+        for index in range(last_index, len(name_words)):
+            if name_words[index].startswith(word):
+                last_index = index + 1
+                break
+        else:
+            return 0
+    return len(words)
+
+
+class NameIndex:
+    """
+    Cached key and alias index of the contents of an object.
+
+    Args:
+        obj (Object): the object whose contents are indexed
+    """
+    __slots__ = ('obj', '_entries', '_names', '_memo')
+
+    def __init__(self, obj):
+        self.obj = obj
+        # (object, key, aliases) of the contents by id, None until first needed.
+        self._entries = None
+        # Contents by lowercase key or alias.
+        self._names = None
+        # Partial matches by (term, by alias): (score, objects).
+        self._memo = {}
+
+    def invalidate(self):
+        "Rebuild the index next time it is needed."
+        self._entries = None
+        self._names = None
+        self._memo = {}
+
+    @property
+    def entries(self):
+        "(object, key, aliases) of every object held, in id order."
+        if self._entries is None:
+            self._entries = [entry(con) for con in sorted(self.obj.contents, key=attrgetter("id"))]
+            self._names = {}
+            for con, key, aliases in self._entries:
+                for name in {key.lower(), *(alias.lower() for alias in aliases)}:
+                    self._names.setdefault(name, []).append(con)
+        return self._entries
+
+    def exact(self, term):
+        "Objects held whose key or an alias is the term."
+        self.entries
+        return self._names.get(term.lower(), [])
+
+    def partial(self, term, by_alias=False):
+        """
+        Objects held best matching the beginnings of the words of a term.
+
+        Args:
+            term (str): The search term.
+            by_alias (bool, optional): Match aliases instead of keys.
+
+        Returns:
+            score (int): How many words matched, 0 for no match.
+            objs (list): The best matching objects, one per matching
+                alias when matching aliases.
+        """
+        memo = self._memo.get((term, by_alias))
+        if memo is None:
+            memo = partial_matches(self.entries, term, by_alias)
+            if len(self._memo) >= _MEMO_SIZE:
+                self._memo.clear()
+            self._memo[(term, by_alias)] = memo
+        return memo
+
+
+def entry(obj):
+    "Index entry of an object: (object, key, aliases)."
+    return obj, obj.key, tuple(obj.aliases.all())
+
+
+def partial_matches(entries, term, by_alias=False):
+    "Best partial matches of a term among index entries, see `NameIndex.partial`."
+    words = term.lower().split()
+    best, objs = 0, []
+    if not words:
+        return best, objs
+    for obj, key, aliases in entries:
+        if by_alias:
+            # Objects with an alias containing the term have all their aliases matched.
+            names = aliases if any(term.lower() in alias.lower() for alias in aliases) else ()
+        else:
+            names = [key]
+        for name in names:
+            score = partial_score(words, name)
+            if score > best:
+                best, objs = score, [obj]
+            elif score and score == best:
+                objs.append(obj)
+    return best, objs
+
+
+def _merged(results):
+    "Objects of several results, in id order."
+    return sorted({obj.id: obj for objs in results for obj in objs}.values(), key=attrgetter("id"))
+
+
+def _best(results):
+    "Objects of the best scoring of several partial results, in id order."
+    best = max((score for score, _ in results), default=0)
+    if not best:
+        return []
+    return sorted((obj for score, objs in results if score == best for obj in objs),
+                  key=attrgetter("id"))
+
+
+def resolve(term, indexes, extras=(), exact=False):
+    """
+    Resolve a search term among the contents of indexed objects, the way
+    Evennia's object search does with candidates.
+
+    Args:
+        term (str): The search term.
+        indexes (list): NameIndexes of the containers searched.
+        extras (list, optional): Other objects to search, such as the
+            location itself.
+        exact (bool, optional): Only match whole keys and aliases.
+
+    Returns:
+        matches (list): The matching objects.
+    """
+    extra_entries = [entry(obj) for obj in extras]
+
+    def exact_matches(term):
+        return _merged([index.exact(term) for index in indexes] +
+                       [[obj for obj, key, aliases in extra_entries
+                         if term.lower() in {name.lower() for name in (key, *aliases)}]])
+
+    def partial(term):
+        for by_alias in (False, True):
+            matches = _best([index.partial(term, by_alias) for index in indexes] +
+                            [partial_matches(extra_entries, term, by_alias)])
+            if matches:
+                return matches
+        return []
+
+    matches = exact_matches(term)
+    match_number = None
+    if not matches:
+        match = _RE_MULTIMATCH.match(term)
+        if match:
+            match_number, term = int(match.group("number")) - 1, match.group("name")
+        if match_number is not None or not exact:
+            matches = exact_matches(term) if exact else partial(term)
+    if match_number is not None and (len(matches) > 1 or match_number != 0):
+        # A number beyond the matches, such as "2-log" with one log, finds nothing.
+        matches = [matches[match_number]] if 0 <= match_number < len(matches) else []
+    return matches
+
+
+def search(searcher, searchdata, location=None, exact=False, use_nicks=True):
+    """
+    Search the contents of the searcher and its location, or of other
+    locations, through their name indexes.
+
+    Args:
+        searcher (Object): Who is searching.
+        searchdata (str): The search term.
+        location (Object or list, optional): Search the contents of these
+            instead.
+        exact (bool, optional): Only match whole keys and aliases.
+        use_nicks (bool, optional): Replace the searcher's nicks first.
+
+    Returns:
+        query (str or None): The search term after replacing nicks, or
+            None if the search should be left to Evennia.
+        matches (list): The matching objects.
+    """
+    if use_nicks:
+        searchdata = searcher.nicks.nickreplace(searchdata, categories=("object", "account"),
+                                                include_account=True)
+    term = searchdata.strip()
+    if not term or term.lower() in _SPECIAL or term.startswith("#"):
+        return None, []
+    if location:
+        containers, extras = make_iter(location), ()
+    elif searcher.location:
+        containers, extras = (searcher, searcher.location), (searcher.location,)
+    else:
+        containers, extras = (searcher,), (searcher,)
+    if not all(hasattr(container, "names") for container in containers):
+        return None, []
+    return searchdata, resolve(term, [container.names for container in containers], extras, exact)
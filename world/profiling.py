@@ -0,0 +1,200 @@
+"""
+Command Profiling
+
+Records what each command costs while the game runs: wall time, database
+queries, Attribute cache misses and bytes sent to the players. The numbers
+are aggregated per command key into totals and histograms, which can be
+viewed in game with the `cmdstats` command or fetched as JSON from the
+`cmdstats/` web endpoint.
+
+Queries are counted by a database execute wrapper. Attribute cache misses
+are the Attribute lookups on objects that needed a query, as cached
+Attributes are read without one; writes and the Attributes of accounts and
+scripts are not counted. Bytes are the text passed to `msg` on objects while the command
+runs.
+
+Commands run and Attribute lookups are also counted in total, whether or not
+profiling is on, for the server metrics in `world.metrics`.
+
+**Setup**
+    The `Command` and `MuxCommand` bases in `commands/command.py` call
+    `start` from `at_pre_cmd` and `finish` from `at_post_cmd`. Profiling
+    is turned off with `COMMAND_PROFILING = False`.
+"""
+import time
+from django.conf import settings
+from django.db import connection
+from world.locks import AttributeHandler as BaseAttributeHandler
+
+ENABLED = getattr(settings, "COMMAND_PROFILING", True)
+
+# Upper bounds of the histogram buckets, the last bucket takes the rest.
+TIME_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Running totals of queries, Attribute cache misses and bytes sent.
+_COUNTERS = [0, 0, 0]
+# Running totals of commands run and Attribute lookups.
+_TOTALS = [0, 0]
+# Commands being profiled, innermost last.
+_ACTIVE = []
+# Seconds after which a run that never finished, because its command failed,
+# is dropped.
+_STALE_AGE = 60
+_PROFILES = {}
+
+
+def _count_queries(execute, sql, params, many, context):
+    "Database execute wrapper counting queries."
+    _COUNTERS[0] += 1
+    return execute(sql, params, many, context)
+
+
+def _bucket(buckets, value):
+    "Index of the histogram bucket a value falls in."
+    for index, bound in enumerate(buckets):
+        if value <= bound:
+            return index
+    return len(buckets)
+
+
+class CommandProfile:
+    """
+    Aggregated cost of all runs of one command.
+
+    Args:
+        key (str): key of the command
+    """
+    __slots__ = ('key', 'calls', 'time', 'max_time', 'queries', 'attr_misses', 'bytes',
+                 'time_hist', 'query_hist')
+
+    def __init__(self, key):
+        self.key = key
+        self.calls = 0
+        self.time = 0.0
+        self.max_time = 0.0
+        self.queries = 0
+        self.attr_misses = 0
+        self.bytes = 0
+        self.time_hist = [0] * (len(TIME_BUCKETS) + 1)
+        self.query_hist = [0] * (len(QUERY_BUCKETS) + 1)
+
+    def add(self, elapsed, queries, attr_misses, sent):
+        "Record one run taking `elapsed` milliseconds."
+        self.calls += 1
+        self.time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        self.queries += queries
+        self.attr_misses += attr_misses
+        self.bytes += sent
+        self.time_hist[_bucket(TIME_BUCKETS, elapsed)] += 1
+        self.query_hist[_bucket(QUERY_BUCKETS, queries)] += 1
+
+    def to_dict(self):
+        "The profile as plain data."
+        return {
+            "key": self.key,
+            "calls": self.calls,
+            "time": self.time,
+            "max_time": self.max_time,
+            "queries": self.queries,
+            "attr_misses": self.attr_misses,
+            "bytes": self.bytes,
+            "time_hist": dict(zip(TIME_BUCKETS + ("inf",), self.time_hist)),
+            "query_hist": dict(zip(QUERY_BUCKETS + ("inf",), self.query_hist)),
+        }
+
+
+def _install():
+    "Start counting queries, if not already."
+    if _count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_queries)
+
+
+def query_count():
+    "Number of database queries counted so far."
+    _install()
+    return _COUNTERS[0]
+
+
+def attribute_misses():
+    "Number of Attribute cache misses counted so far."
+    _install()
+    return _COUNTERS[1]
+
+
+def commands_run():
+    "Number of commands run so far."
+    return _TOTALS[0]
+
+
+def attribute_lookups():
+    "Number of Attribute lookups counted so far."
+    return _TOTALS[1]
+
+
+class AttributeHandler(BaseAttributeHandler):
+    """
+    AttributeHandler counting lookups and the cache misses among them,
+    which give the Attribute cache hit rate. It also clears cached access
+    results on changes, see `world.locks`.
+    """
+    def get(self, *args, **kwargs):
+        _TOTALS[1] += 1
+        queries = _COUNTERS[0]
+        result = super().get(*args, **kwargs)
+        if _COUNTERS[0] != queries:
+            _COUNTERS[1] += 1
+        return result
+
+
+def start(cmd):
+    "Start profiling a command run."
+    _TOTALS[0] += 1
+    if not ENABLED:
+        return
+    _install()
+    now = time.perf_counter()
+    while _ACTIVE and now - _ACTIVE[0][1] > _STALE_AGE:
+        del _ACTIVE[0]
+    _ACTIVE.append((cmd, now, tuple(_COUNTERS)))
+
+
+def finish(cmd):
+    "Finish profiling a command run and record it."
+    for index in range(len(_ACTIVE) - 1, -1, -1):
+        if _ACTIVE[index][0] is cmd:
+            break
+    else:
+        return
+    _, started, (queries, attr_misses, sent) = _ACTIVE[index]
+    # Runs above this one are of nested commands that failed before finishing.
+    del _ACTIVE[index:]
+    profile = _PROFILES.get(cmd.key)
+    if profile is None:
+        profile = _PROFILES[cmd.key] = CommandProfile(cmd.key)
+    profile.add((time.perf_counter() - started) * 1000, _COUNTERS[0] - queries,
+                _COUNTERS[1] - attr_misses, _COUNTERS[2] - sent)
+
+
+def record_bytes(text):
+    "Count text sent to a player while a command runs."
+    if _ACTIVE and text:
+        if isinstance(text, tuple):
+            text = text[0]
+        _COUNTERS[2] += len(str(text).encode("utf-8"))
+
+
+def get_profiles():
+    "All command profiles, the most expensive in total first."
+    return sorted(_PROFILES.values(), key=lambda profile: profile.time, reverse=True)
+
+
+def get_profile(key):
+    "Profile of one command, or None if it hasn't run."
+    return _PROFILES.get(key)
+
+
+def reset():
+    "Forget all recorded runs."
+    _PROFILES.clear()
@@ -71,3 +71,76 @@ See the `@spawn` command and `evennia.utils.spawner` for more info.
 # "key": "goblin archwizard",
 # "prototype" : ("GOBLIN_WIZARD", "ARCHWIZARD_MIXIN")
 #}
+
+# -------------------------------------------------------------
+#
+# Crafting components
+#
+# Dropped by harvestables. These are compiled into spawn templates
+# at server start, see `world/templates.py`.
+#
+# -------------------------------------------------------------
+
+CRAFTING_COMPONENT = {
+    "prototype_key": "crafting_component",
+    "prototype_desc": "Base of all stackable crafting components.",
+    "typeclass": "typeclasses.harvestables.CraftingComponent"
+}
+
+LOG = {
+    "prototype_key": "log",
+    "prototype_parent": "crafting_component",
+    "key": "log",
+    "desc": "A generic log."
+}
+
+ORE = {
+    "prototype_key": "ore",
+    "prototype_parent": "crafting_component",
+    "key": "ore",
+    "desc": "A lump of raw ore."
+}
+
+HERB = {
+    "prototype_key": "herb",
+    "prototype_parent": "crafting_component",
+    "key": "herb",
+    "desc": "A bundle of wild herbs."
+}
+
+# -------------------------------------------------------------
+#
+# Harvestables
+#
+# Resource nodes players harvest for crafting components.
+# `component_drop` is the prototype key of the component dropped
+# once the node is depleted, `component_dropamt` how many.
+#
+# -------------------------------------------------------------
+
+TREE = {
+    "prototype_key": "tree",
+    "typeclass": "typeclasses.harvestables.Tree",
+    "key": "tree",
+    "desc": "A tall tree, ripe for chopping.",
+    "component_drop": "log",
+    "component_dropamt": 3
+}
+
+ORE_VEIN = {
+    "prototype_key": "ore_vein",
+    "typeclass": "typeclasses.harvestables.OreVein",
+    "key": "ore vein",
+    "desc": "A vein of ore running through the rock.",
+    "component_drop": "ore",
+    "component_dropamt": 2
+}
+
+HERB_PATCH = {
+    "prototype_key": "herb_patch",
+    "typeclass": "typeclasses.harvestables.HerbPatch",
+    "key": "herb patch",
+    "desc": "A patch of herbs growing wild.",
+    "component_drop": "herb",
+    "component_dropamt": 4
+}
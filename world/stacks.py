@@ -9,7 +9,133 @@ on the object typeclass.
     To use item stacks on an object, add a function that passes the object
     itself into the constructor and returns a `StackHandler`. This function
     should be decorated with the `lazy_property` decorator.
+
+**Write-back**
+    The handler loads the `stack` Attribute once and keeps the values in
+    memory. When `STACK_WRITE_BACK` is enabled, changes only mark the handler
+    as dirty and are written to the database in batches by `flush_stacks`,
+    which runs every `STACK_FLUSH_INTERVAL` seconds and before the server
+    reloads or shuts down. A handler that has been dirty for longer than
+    `STACK_MAX_DIRTY_AGE` seconds is written out on its next change, which
+    bounds how much a crash can lose. Set `STACK_WRITE_BACK = False` (or the
+    max age to 0) to write every change through immediately.
+
+**Transactions**
+    `split`, `merge` and `consume` each run in a single database transaction
+    and write their results immediately, so a reload or error halfway through
+    can neither duplicate nor lose items. The `stack` Attribute carries a
+    version counter that is bumped on every write; if the stored version no
+    longer matches the one the handler loaded, somebody else changed the
+    stack, so the handler reloads it and retries the operation up to
+    `STACK_MAX_RETRIES` times before raising `StackConflict`. The stored
+    version is read from the database inside the transaction, past the
+    Attribute cache, and its row is locked until the transaction ends on
+    databases supporting `SELECT ... FOR UPDATE`. This catches writes by
+    other processes, such as `evennia shell` or a second server, which the
+    cache of this process never sees.
+
+**Fast split**
+    Splitting normally makes a full `copy()` of the object, duplicating its
+    scripts, cmdsets and every Attribute one by one. Stacks spawned from a
+    prototype (tagged in the `from_prototype` category) and carrying no
+    scripts or cmdsets of their own are instead created with a single
+    `create_object` call that sets their tags, locks and Attributes,
+    including the new count, in one go. Set `STACK_FAST_SPLIT = False` to
+    always use the full copy.
+
+**Virtual stacks**
+    With `VIRTUAL_STACKS` enabled, crafting components spawned from the
+    templates in `world/templates.py` don't need a database object per stack. A
+    container keeps a `{prototype_key: count}` map in its `virtual_stacks`
+    Attribute instead, which the item commands and appearance read and
+    write directly. A virtual stack is only turned into a real object by
+    `VirtualStackHandler.materialize`, which happens when something needs to
+    give it unique state, or when a search (such as `look log`) finds no
+    real object but matches the virtual stack. A search only makes real the
+    items it needs, one unless asked for more.
 """
+import time
+from functools import lru_cache
+import inflect
+from django.conf import settings
+from django.db import transaction
+from evennia.typeclasses.attributes import Attribute
+from evennia.utils import create, logger
+
+_WRITE_BACK = getattr(settings, "STACK_WRITE_BACK", True)
+_MAX_DIRTY_AGE = getattr(settings, "STACK_MAX_DIRTY_AGE", 30)
+FLUSH_INTERVAL = getattr(settings, "STACK_FLUSH_INTERVAL", 10)
+_MAX_RETRIES = getattr(settings, "STACK_MAX_RETRIES", 3)
+_FAST_SPLIT = getattr(settings, "STACK_FAST_SPLIT", True)
+VIRTUAL_STACKS = getattr(settings, "VIRTUAL_STACKS", False)
+
+_INFLECT = inflect.engine()
+
+# Handlers with changes not yet written to the database, keyed by object id.
+_DIRTY_STACKS = {}
+
+
+class StackConflict(Exception):
+    "Raised when a stack was changed by someone else during an operation."
+    pass
+
+
+def flush_stacks():
+    """
+    Write all dirty stacks back to the database in a single transaction.
+    This is called on a server tick and before the server reloads or stops.
+    Stacks are only forgotten once the transaction commits, if it fails
+    they stay queued for the next flush.
+    """
+    if not _DIRTY_STACKS:
+        return
+    handlers = [(handler, handler._version, handler._dirty_since)
+                for handler in list(_DIRTY_STACKS.values())]
+    try:
+        with transaction.atomic():
+            for handler, _, _ in handlers:
+                handler.flush()
+    except Exception:
+        logger.log_trace("Failed to flush dirty item stacks.")
+        # Nothing was written, so the stacks are still as dirty as before.
+        for handler, version, dirty_since in handlers:
+            handler._version = version
+            handler._dirty_since = dirty_since
+            _DIRTY_STACKS[handler.obj.id] = handler
+
+
+@lru_cache(maxsize=4096)
+def numbered_name(key, count):
+    """
+    Name for `count` items called `key`, such as 'a log' or 'three logs'.
+    Inflecting is slow, so the names are remembered.
+    """
+    if count == 1:
+        return _INFLECT.an(key)
+    try:
+        return "%s %s" % (_INFLECT.number_to_words(count, threshold=12), _INFLECT.plural(key, count))
+    except IndexError:
+        return "%s %s" % (count, key)
+
+
+@lru_cache(maxsize=4096)
+def plural_key(key):
+    "Plural of an item key, such as 'logs' for 'log'."
+    return _INFLECT.plural(key)
+
+
+def flush_stack(obj):
+    "Write the pending stack changes of a single object, if any."
+    handler = _DIRTY_STACKS.get(obj.id)
+    if handler:
+        handler.flush()
+
+
+def discard_stack(obj):
+    "Drop the pending stack changes of an object that is going away."
+    handler = _DIRTY_STACKS.pop(obj.id, None)
+    if handler:
+        handler._dirty_since = None
 
 
 class StackHandler:
@@ -19,36 +145,184 @@ class StackHandler:
     Args:
         obj (Object): parent Object typeclass for this StackHandler
     """
+    __slots__ = ('obj', '_stackable', '_count', '_version', '_dirty_since')
+
     def __init__(self, obj):
-        if not obj.attributes.has('stack'):
-            obj.attributes.add('stack',
-                               {
-                                'stackable': False,
-                                'count': 1
-                               })
-        self.attr_dict = obj.attributes.get('stack')
         self.obj = obj
+        self._dirty_since = None
+        self._load()
+
+    def _load(self):
+        "Read the stack state from the `stack` Attribute."
+        stack = self.obj.attributes.get('stack')
+        if stack is None:
+            self._stackable = False
+            self._count = 1
+            self._version = 0
+            self._save()
+        else:
+            self._stackable = stack['stackable']
+            self._count = stack['count']
+            self._version = stack.get('version', 0)
+
+    def _save(self):
+        "Write the current stack state to the `stack` Attribute."
+        self._version += 1
+        self.obj.attributes.add('stack',
+                                {
+                                 'stackable': self._stackable,
+                                 'count': self._count,
+                                 'version': self._version
+                                })
+
+    def _stored_version(self):
+        """
+        Version of the stack in the database, locking its row for the rest
+        of the transaction. None if the stack was never written.
+        """
+        if not self.obj.pk:
+            return None
+        stack = (Attribute.objects.select_for_update()
+                 .filter(objectdb__id=self.obj.pk, db_key='stack', db_category__isnull=True)
+                 .values_list('db_value', flat=True).first())
+        return stack.get('version', 0) if stack else None
+
+    def _mark_dirty(self):
+        "Register a change, writing it out now if write-back is disabled or overdue."
+        if self.obj.location:
+            self.obj.location.appearance.invalidate()
+            self.obj.location.inventory.update(self.obj)
+        if not _WRITE_BACK or _MAX_DIRTY_AGE <= 0:
+            self._save()
+            return
+        now = time.time()
+        if self._dirty_since is None:
+            self._dirty_since = now
+            _DIRTY_STACKS[self.obj.id] = self
+        elif now - self._dirty_since >= _MAX_DIRTY_AGE:
+            self.flush()
+
+    @property
+    def dirty(self):
+        "Does this stack have changes not yet written to the database?"
+        return self._dirty_since is not None
+
+    def flush(self):
+        "Write pending changes to the database, forgetting them once committed."
+        if self.obj.pk:
+            self._save()
+        self._dirty_since = None
+        transaction.on_commit(self._forget)
+
+    def _forget(self):
+        "Stop tracking the flushed changes, unless more were made since."
+        if self._dirty_since is None and _DIRTY_STACKS.get(self.obj.id) is self:
+            del _DIRTY_STACKS[self.obj.id]
+
+    def reload(self):
+        "Drop any in-memory changes and re-read the stack from the database."
+        discard_stack(self.obj)
+        stack = self.obj.attributes.get('stack', return_obj=True)
+        if stack:
+            # The idmapper would hand the cached Attribute back as it is.
+            stack.flush_from_cache(force=True)
+        self.obj.attributes.reset_cache()
+        self._load()
+
+    def _atomic(self, operation, *others):
+        """
+        Run a stack operation in a single transaction, retrying it if this or any
+        of the other involved stacks were changed by someone else.
+
+        Args:
+            operation (callable): Function performing the operation.
+            *others (StackHandler): Other stacks the operation changes.
+
+        Returns:
+            result (any): Return value of `operation`.
+
+        Raises:
+            StackConflict: If the stacks kept changing over all retries.
+        """
+        handlers = (self,) + others
+        for _ in range(_MAX_RETRIES):
+            try:
+                with transaction.atomic():
+                    if any(handler._stored_version() not in (None, handler._version)
+                           for handler in handlers):
+                        raise StackConflict(f"Stack on {self.obj} changed during operation.")
+                    result = operation()
+                    for handler in handlers:
+                        if handler.obj.pk:
+                            handler.flush()
+                return result
+            except StackConflict:
+                for handler in handlers:
+                    handler.reload()
+            except Exception:
+                # The database was rolled back, so must our in-memory state be.
+                for handler in handlers:
+                    if handler.obj.pk:
+                        handler.reload()
+                raise
+        raise StackConflict(f"Stack on {self.obj} kept changing, giving up after {_MAX_RETRIES} tries.")
 
     def get_stackable(self):
         "Is the object this handler is attached to stackable?"
-        return self.attr_dict['stackable']
+        return self._stackable
 
     def set_stackable(self, value):
         if type(value) != bool:
             raise AttributeError("Value set for stackable must be True or False.")
-        self.attr_dict['stackable'] = value
-        self.attr_dict['count'] = 1
+        self._stackable = value
+        self._count = 1
+        self._mark_dirty()
 
     stackable = property(get_stackable, set_stackable)
 
     def get_count(self):
-        return self.attr_dict['count']
+        return self._count
 
     def set_count(self, amount):
-        self.attr_dict['count'] = amount
+        self._count = amount
+        self._mark_dirty()
 
     count = property(get_count, set_count)
 
+    def can_fast_split(self):
+        """
+        Can this stack be split without a full copy? Only objects spawned from a
+        prototype without scripts or cmdsets of their own qualify, anything else
+        may carry per-instance state the fast path doesn't reproduce.
+        """
+        obj = self.obj
+        return bool(_FAST_SPLIT and obj.tags.get(category="from_prototype") and
+                    not obj.db_cmdset_storage and not obj.scripts.all())
+
+    def _clone(self, amount):
+        "Create a new stack of `amount` items like this one in a single create call."
+        obj = self.obj
+        attributes = [(attr.key, attr.value, attr.category, attr.lock_storage)
+                      for attr in obj.attributes.all() if attr.key != 'stack']
+        attributes.append(('stack', {'stackable': True, 'count': amount, 'version': 1}))
+        # Created nowhere, as a location would load the stack in its receive hook
+        # before the Attributes above are set.
+        new_obj = create.create_object(obj.typeclass_path, key=obj.key,
+                                       location=None, home=obj.home,
+                                       locks=obj.db_lock_storage, aliases=obj.aliases.all(),
+                                       tags=obj.tags.all(return_key_and_category=True),
+                                       attributes=attributes)
+        stack = new_obj.stack
+        stack._stackable, stack._count, stack._version = True, amount, 1
+        location = obj.location
+        if location:
+            # Placed without move hooks, which would merge it right back into this stack.
+            new_obj.location = location
+            location.appearance.invalidate()
+            location.names.invalidate()
+            location.inventory.update(new_obj)
+        return new_obj
+
     def split(self, amount):
         """
         Splits this stack into another stack. If the split amount is greater than
@@ -64,17 +338,26 @@ class StackHandler:
         """
         if amount >= self.count:
             return self.obj
-        else:
-            new_obj = self.obj.copy(new_key=self.obj.key)
+
+        def _split():
+            if self.can_fast_split():
+                new_obj = self._clone(amount)
+            else:
+                new_obj = self.obj.copy(new_key=self.obj.key)
+                new_obj.stack.stackable = True
+                new_obj.stack.count = amount
+                new_obj.stack.flush()
             self.count -= amount
-            new_obj.stack.stackable = True
-            new_obj.stack.count = amount
             return new_obj
+        return self._atomic(_split)
 
-    def merge(self, obj):
-        "Merge given object stack into this one."
-        self.count += obj.stack.count
-        obj.delete()
+    def merge(self, *objs):
+        "Merge the given object stacks into this one."
+        def _merge():
+            for obj in objs:
+                self.count += obj.stack.count
+                obj.delete()
+        self._atomic(_merge, *(obj.stack for obj in objs))
 
     def consume(self, amount):
         """
@@ -84,6 +367,211 @@ class StackHandler:
         Args:
             amount: Amount to consume from this stack.
         """
-        self.count -= amount
-        if self.count <= 0:
-            self.obj.delete()
+        def _consume():
+            self.count -= amount
+            if self.count <= 0:
+                self.obj.delete()
+        self._atomic(_consume)
+
+
+class StackIndex:
+    """
+    In-memory index of the stacks held by a container, mapping the
+    (typeclass, key, prototype) signature of a stackable object to the
+    stacks with it. The index is built lazily from the container's
+    contents and kept current by its `at_object_receive` and
+    `at_object_leave` hooks, so finding the stacks to merge with is a single
+    dictionary lookup. Normally there is only one stack per signature, but
+    containers filled before the index existed may hold several, which are
+    all merged into the next stack of their kind that arrives.
+
+    Args:
+        obj (Object): container Object this index belongs to
+    """
+    __slots__ = ('obj', '_index')
+
+    def __init__(self, obj):
+        self.obj = obj
+        self._index = None
+
+    @staticmethod
+    def signature(obj):
+        "Objects with the same signature stack together."
+        return obj.typeclass_path, obj.key.lower(), obj.tags.get(category="from_prototype")
+
+    def _build(self, exclude=None):
+        self._index = {}
+        for con in self.obj.contents:
+            # Exits never stack, don't give them a stack Attribute.
+            if con is exclude or con.destination:
+                continue
+            if con.stack.stackable:
+                self._index.setdefault(self.signature(con), []).append(con)
+
+    def _is_current(self, found, signature):
+        return (found.pk and found.location == self.obj and
+                found.key.lower() == signature[1] and found.stack.stackable)
+
+    def find(self, obj):
+        """
+        Find the stacks in this container that the given object would merge with.
+
+        Args:
+            obj (Object): stackable object to look up.
+
+        Returns:
+            stacks (list): Existing stacks other than `obj` with the same
+                signature, empty if there are none.
+        """
+        if self._index is None:
+            self._build(exclude=obj)
+        signature = self.signature(obj)
+        found = self._index.get(signature, ())
+        if not all(self._is_current(stack, signature) for stack in found):
+            # A stack was deleted or renamed behind our back, start over.
+            self._build(exclude=obj)
+            found = self._index.get(signature, ())
+        return [stack for stack in found if stack is not obj]
+
+    def add(self, obj):
+        "Make the given object the only stack for its signature."
+        if self._index is not None:
+            self._index[self.signature(obj)] = [obj]
+
+    def remove(self, obj):
+        "Forget the given object as a stack for its signature."
+        if self._index is not None:
+            signature = self.signature(obj)
+            found = self._index.get(signature, ())
+            if obj in found:
+                found.remove(obj)
+                if not found:
+                    del self._index[signature]
+
+    def clear(self):
+        "Drop the index, it will be rebuilt on next use."
+        self._index = None
+
+
+class VirtualStackHandler:
+    """
+    Stacks of prototype-based crafting components held by a container without
+    a database object of their own. Counts are kept as a `{prototype_key: count}`
+    map in the container's `virtual_stacks` Attribute.
+
+    Args:
+        obj (Object): container Object these stacks are held by
+    """
+    __slots__ = ('obj', '_counts')
+
+    def __init__(self, obj):
+        self.obj = obj
+        self._counts = dict(obj.attributes.get('virtual_stacks', default={}))
+
+    def _save(self):
+        self.obj.appearance.invalidate()
+        self.obj.inventory.update_virtual()
+        if self._counts:
+            self.obj.attributes.add('virtual_stacks', self._counts)
+        else:
+            self.obj.attributes.remove('virtual_stacks')
+
+    @staticmethod
+    def template(prototype_key):
+        "The component spawn template a virtual stack is made from."
+        from world.templates import get_template
+        return get_template(prototype_key)
+
+    def __bool__(self):
+        return bool(self._counts)
+
+    def all(self):
+        "List of (prototype_key, count) tuples for all virtual stacks, sorted by key."
+        return sorted(self._counts.items())
+
+    def count(self, prototype_key):
+        "Number of items of the given prototype held."
+        return self._counts.get(prototype_key, 0)
+
+    def key(self, prototype_key):
+        "Display key of the items of the given prototype."
+        return self.template(prototype_key).key
+
+    def desc(self, prototype_key):
+        "Description of the items of the given prototype."
+        return self.template(prototype_key).get('desc', "")
+
+    def match(self, name):
+        """
+        Find the virtual stack a player means by name. Exact and plural keys are
+        preferred over partial matches.
+
+        Args:
+            name (str): Name to look for, such as 'log' or 'logs'.
+
+        Returns:
+            prototype_key (str or None): Matching prototype key, if any.
+        """
+        name = name.strip().lower()
+        if not name:
+            return None
+        partial = None
+        for prototype_key in self._counts:
+            key = self.key(prototype_key).lower()
+            if name in (key, plural_key(key)):
+                return prototype_key
+            if partial is None and key.startswith(name):
+                partial = prototype_key
+        return partial
+
+    def add(self, prototype_key, amount):
+        "Add `amount` items of the given prototype."
+        self._counts[prototype_key] = self._counts.get(prototype_key, 0) + amount
+        self._save()
+
+    def remove(self, prototype_key, amount):
+        """
+        Remove up to `amount` items of the given prototype.
+
+        Returns:
+            removed (int): How many items were actually removed.
+        """
+        held = self._counts.get(prototype_key, 0)
+        removed = min(held, amount)
+        if removed >= held:
+            self._counts.pop(prototype_key, None)
+        else:
+            self._counts[prototype_key] = held - removed
+        if removed:
+            self._save()
+        return removed
+
+    def transfer(self, prototype_key, amount, destination):
+        """
+        Move up to `amount` items of the given prototype into another container.
+
+        Returns:
+            moved (int): How many items were moved.
+        """
+        moved = self.remove(prototype_key, amount)
+        if moved:
+            destination.virtual_stacks.add(prototype_key, moved)
+        return moved
+
+    def materialize(self, prototype_key, amount=None):
+        """
+        Turn virtual items into a real stack object inside the container, merging
+        with any real stack of the same kind already there.
+
+        Args:
+            prototype_key (str): Prototype of the items.
+            amount (int, optional): How many to materialize, all if not given.
+
+        Returns:
+            stack (Object or None): The real stack, or None if nothing was held.
+        """
+        from world.templates import spawn_many
+        amount = self.remove(prototype_key, amount or self.count(prototype_key))
+        if not amount:
+            return None
+        return spawn_many(prototype_key, amount, self.obj)[0]
@@ -0,0 +1,166 @@
+"""
+Game Statistics
+
+MSSP crawlers and admins want to know how big the world is. Counting it
+with COUNT(*) queries on every crawler hit would cost us under load, so
+the server keeps the counts in memory instead: they are counted once at
+startup, kept up to date by the creation and deletion hooks of the
+typeclasses, and reconciled against the database every
+`STATS_RECONCILE_INTERVAL` seconds in case something slipped past the
+hooks.
+
+MSSP is answered by the portal, which doesn't share the server's memory.
+The server writes the counts to `STATS_FILE` when they have changed, at
+most every `STATS_WRITE_INTERVAL` seconds, and the portal reads them from
+there at most as often.
+
+Counted are:
+
+    ROOMS        objects that are rooms
+    EXITS        objects that are exits
+    CHARACTERS   objects that are characters
+    OBJECTS      all other objects, such as items and harvestables
+    DBSIZE       size of the database file in bytes (SQLite only, else 0)
+
+**Usage**
+    from world import stats
+
+    stats.get("ROOMS")      # in the server
+    stats.read("ROOMS")     # in the portal, from the stats file
+"""
+import json
+import os
+import time
+from django.conf import settings
+from evennia.utils import logger
+
+STATS_FILE = getattr(settings, "STATS_FILE",
+                     os.path.join(settings.GAME_DIR, "server", "stats.json"))
+WRITE_INTERVAL = getattr(settings, "STATS_WRITE_INTERVAL", 60)
+RECONCILE_INTERVAL = getattr(settings, "STATS_RECONCILE_INTERVAL", 3600)
+FIELDS = ("ROOMS", "EXITS", "CHARACTERS", "OBJECTS", "DBSIZE")
+
+# Counts in the server, None until first counted.
+_COUNTS = None
+_dirty = False
+# Counts read by the portal and when they were read.
+_READ = {}
+_read_at = 0
+
+
+def kind(typeclass):
+    "The field objects of a typeclass are counted in."
+    from evennia.objects.objects import DefaultCharacter, DefaultExit, DefaultRoom
+    for cls, field in ((DefaultRoom, "ROOMS"), (DefaultExit, "EXITS"), (DefaultCharacter, "CHARACTERS")):
+        if issubclass(typeclass, cls):
+            return field
+    return "OBJECTS"
+
+
+def _db_size():
+    "Size of the database file in bytes, 0 if not SQLite."
+    database = settings.DATABASES["default"]
+    if "sqlite" not in database["ENGINE"]:
+        return 0
+    try:
+        return os.path.getsize(database["NAME"])
+    except OSError:
+        return 0
+
+
+def reconcile():
+    """
+    Count everything in the database, correcting the in-memory counts. This
+    runs at startup and then every `RECONCILE_INTERVAL` seconds.
+    """
+    global _COUNTS, _dirty
+    from django.db.models import Count
+    from evennia.objects.models import ObjectDB
+    from evennia.utils.utils import class_from_module
+
+    counts = dict.fromkeys(FIELDS, 0)
+    for path, number in ObjectDB.objects.values_list("db_typeclass_path").annotate(Count("id")):
+        try:
+            field = kind(class_from_module(path))
+        except ImportError:
+            field = "OBJECTS"
+        counts[field] += number
+    counts["DBSIZE"] = _db_size()
+    if _COUNTS is not None and _COUNTS != counts:
+        drift = {field: counts[field] - _COUNTS[field] for field in FIELDS[:-1]
+                 if counts[field] != _COUNTS[field]}
+        if drift:
+            logger.log_info(f"Game statistics corrected by {drift}.")
+    _COUNTS = counts
+    _dirty = True
+    save()
+
+
+def _change(obj, amount):
+    global _dirty
+    if _COUNTS is None:
+        return
+    _COUNTS[kind(type(obj))] += amount
+    _dirty = True
+
+
+def created(obj):
+    "Count a newly created object."
+    _change(obj, 1)
+
+
+def deleted(obj):
+    "Stop counting a deleted object."
+    _change(obj, -1)
+
+
+def get(field=None):
+    """
+    Current counts, from memory.
+
+    Args:
+        field (str, optional): One of `FIELDS`.
+
+    Returns:
+        counts (int or dict): The count of the field, or all counts.
+    """
+    counts = _COUNTS or dict.fromkeys(FIELDS, 0)
+    return counts[field] if field else dict(counts)
+
+
+def save():
+    "Write the counts to the stats file for the portal, if they changed."
+    global _dirty
+    if not _dirty or _COUNTS is None:
+        return
+    _dirty = False
+    try:
+        temp = STATS_FILE + ".tmp"
+        with open(temp, "w") as fil:
+            json.dump(_COUNTS, fil)
+        os.replace(temp, STATS_FILE)
+    except OSError:
+        logger.log_trace("Could not write game statistics.")
+
+
+def read(field):
+    """
+    A count as last written by the server, read from the stats file at most
+    every `WRITE_INTERVAL` seconds. This is used by the portal.
+
+    Args:
+        field (str): One of `FIELDS`.
+
+    Returns:
+        count (str): The count, "0" if unknown.
+    """
+    global _READ, _read_at
+    now = time.time()
+    if now - _read_at > WRITE_INTERVAL:
+        _read_at = now
+        try:
+            with open(STATS_FILE) as fil:
+                _READ = json.load(fil)
+        except (OSError, ValueError):
+            pass
+    return str(_READ.get(field, 0))
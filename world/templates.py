@@ -0,0 +1,165 @@
+"""
+Spawn Templates
+
+Spawning with `evennia.prototypes.spawner.spawn` validates the prototype and
+resolves its parent chain every time it is called. For prototypes the game
+spawns over and over, such as the crafting components dropped by
+harvestables, this module compiles each prototype in `world/prototypes.py`
+once into a `SpawnTemplate` with its inheritance already resolved, which
+can then be instantiated with a single `create_object` call.
+
+Templates are compiled at server start by `compile_templates()`, or on first
+use. Prototype values are used as they are: protfuncs and callables are not
+evaluated, so prototypes that need them should be spawned with `spawn` as
+usual.
+
+**Usage**
+    from world.templates import get_template, spawn_many
+
+    spawn_many("log", 3, room)
+"""
+from django.db import transaction
+from evennia.utils import create, logger, make_iter
+from world import prototypes
+
+# Prototype keys that describe how an object is built rather than being
+# stored as Attributes on it.
+_RESERVED_KEYS = {"prototype_key", "prototype_parent", "prototype_desc", "prototype_tags",
+                  "prototype_locks", "typeclass", "key", "aliases", "locks", "permissions",
+                  "tags", "attrs", "home", "location", "destination"}
+
+_TEMPLATES = {}
+
+
+class SpawnTemplate:
+    """
+    A prototype compiled into everything `create_object` needs.
+
+    Args:
+        prototype_key (str): key of the prototype this template was compiled from
+        prototype (dict): prototype with all inherited fields resolved
+    """
+    __slots__ = ('prototype_key', 'typeclass', 'key', 'aliases', 'locks',
+                 'permissions', 'tags', 'attributes')
+
+    def __init__(self, prototype_key, prototype):
+        self.prototype_key = prototype_key
+        self.typeclass = prototype.get("typeclass")
+        self.key = prototype.get("key", prototype_key)
+        self.aliases = tuple(make_iter(prototype.get("aliases", ())))
+        self.locks = prototype.get("locks", "")
+        self.permissions = tuple(make_iter(prototype.get("permissions", ())))
+        self.tags = tuple(tuple(make_iter(tag)) for tag in make_iter(prototype.get("tags", ()))) + \
+            ((prototype_key, "from_prototype"),)
+        attributes = [tuple(make_iter(attr)) for attr in make_iter(prototype.get("attrs", ()))]
+        attributes.extend((key, value) for key, value in prototype.items()
+                          if key not in _RESERVED_KEYS and not key.startswith("ndb_"))
+        self.attributes = tuple(attributes)
+
+    def get(self, key, default=None):
+        "Value of an Attribute the template sets."
+        for attr in self.attributes:
+            if attr[0] == key:
+                return attr[1]
+        return default
+
+    def instantiate(self, location=None):
+        """
+        Create an object from this template.
+
+        Args:
+            location (Object, optional): Where to create the object. No move
+                hooks are called.
+
+        Returns:
+            obj (Object): The new object.
+        """
+        return create.create_object(self.typeclass, key=self.key, location=location,
+                                    home=location, aliases=list(self.aliases),
+                                    locks=self.locks, permissions=list(self.permissions),
+                                    tags=list(self.tags), attributes=list(self.attributes))
+
+
+def _load_prototypes():
+    "All prototypes defined in `world/prototypes.py`, by prototype key."
+    found = {}
+    for name, prototype in vars(prototypes).items():
+        if name.isupper() and isinstance(prototype, dict):
+            found[prototype.get("prototype_key", name.lower())] = prototype
+    return found
+
+
+def _resolve(prototype_key, available, chain=()):
+    "Merge a prototype with all of its parents, parents first."
+    if prototype_key in chain:
+        raise RuntimeError(f"Prototype {prototype_key} inherits from itself.")
+    prototype = available[prototype_key]
+    resolved = {}
+    for parent in make_iter(prototype.get("prototype_parent", ())):
+        resolved.update(_resolve(parent.lower(), available, chain + (prototype_key,)))
+    resolved.update(prototype)
+    return resolved
+
+
+def compile_templates():
+    """
+    Compile all prototypes in `world/prototypes.py` into spawn templates,
+    replacing any compiled before. This is called at server start.
+    """
+    available = _load_prototypes()
+    compiled = {}
+    for prototype_key in available:
+        try:
+            compiled[prototype_key] = SpawnTemplate(prototype_key, _resolve(prototype_key, available))
+        except Exception:
+            logger.log_trace(f"Could not compile prototype {prototype_key}.")
+    _TEMPLATES.clear()
+    _TEMPLATES.update(compiled)
+
+
+def get_template(prototype_key):
+    """
+    Get the compiled template of a prototype.
+
+    Args:
+        prototype_key (str): Key of a prototype in `world/prototypes.py`.
+
+    Returns:
+        template (SpawnTemplate): The compiled template.
+
+    Raises:
+        KeyError: If there is no such prototype.
+    """
+    if not _TEMPLATES:
+        compile_templates()
+    return _TEMPLATES[prototype_key.lower()]
+
+
+def spawn_many(template, amount, location):
+    """
+    Spawn `amount` items from a template into a location in one go. Stackable
+    items become a single stack of that count, anything else is created
+    `amount` times. The items arrive through `move_to`, so they merge with
+    stacks already in the location.
+
+    Args:
+        template (SpawnTemplate or str): Template, or prototype key of one.
+        amount (int): How many items to spawn.
+        location (Object): Where to put them.
+
+    Returns:
+        objects (list): The spawned objects.
+    """
+    if isinstance(template, str):
+        template = get_template(template)
+    spawned = []
+    with transaction.atomic():
+        while len(spawned) < amount:
+            obj = template.instantiate()
+            spawned.append(obj)
+            if obj.stack.stackable:
+                obj.stack.count = amount
+                break
+        for obj in spawned:
+            obj.move_to(location, quiet=True)
+    return spawned
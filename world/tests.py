@@ -0,0 +1,862 @@
+"""
+Tests for the world modules.
+
+Run them from the game directory with
+
+    evennia test --settings settings.py .
+
+Benchmarks take minutes and only run with the BENCHMARK environment
+variable set; they print what they measured.
+
+"""
+import json
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest import skipUnless
+from unittest.mock import patch
+from django.db import DatabaseError, connection
+from django.test.utils import CaptureQueriesContext
+from evennia.typeclasses.attributes import Attribute
+from evennia.utils import create, inlinefunc, search
+from evennia.utils.ansi import strip_ansi
+from evennia.utils.test_resources import EvenniaTest
+from commands.harvest import SWING_DAMAGE, harvest_swing, stop_harvesting
+from typeclasses.characters import Character
+from typeclasses.exits import Exit
+from typeclasses import harvestables, scripts
+from typeclasses.harvestables import CraftingComponent, Tree
+from typeclasses.objects import Object
+from typeclasses.rooms import Room
+from world import inline, loadgen, locks, metrics, monitor, profiling, stacks, stats
+from world.bulk import bulk_move
+from world.templates import spawn_many
+
+BENCHMARK = bool(os.environ.get("BENCHMARK"))
+
+
+class GameTest(EvenniaTest):
+    """
+    EvenniaTest with the typeclasses of this game.
+    """
+    object_typeclass = Object
+    character_typeclass = Character
+    room_typeclass = Room
+    exit_typeclass = Exit
+
+    def tearDown(self):
+        # Forget what the game keeps in memory between tests, as the
+        # database it refers to is rolled back.
+        stacks._DIRTY_STACKS.clear()
+        harvestables._DIRTY_HARVESTABLES.clear()
+        scripts._HARVEST_SCHEDULER = None
+        scripts._RESPAWN_SCRIPT = None
+        locks.clear_lock_cache()
+        profiling.reset()
+        profiling._ACTIVE.clear()
+        super().tearDown()
+
+    def make_stack(self, key, count=1, location=None):
+        "A stack of `count` items placed without running any move hooks."
+        obj = create.create_object(Object, key=key, home=self.room1)
+        obj.stack.stackable = True
+        obj.stack.count = count
+        obj.stack.flush()
+        obj.location = location
+        return obj
+
+    def stacks_in(self, container, key):
+        "The stacks called `key` in a container."
+        return [con for con in container.contents if con.key == key]
+
+    def report(self, name, **measured):
+        "Print what a benchmark measured."
+        print("\n%s: %s" % (name, ", ".join("%s=%s" % item for item in measured.items())))
+
+
+class TestStackFlush(GameTest):
+    "Write-back of stack counts."
+
+    @patch("world.stacks.logger")
+    def test_failed_flush_keeps_stacks_dirty(self, mock_logger):
+        self.obj1.stack.stackable = True
+        self.obj1.stack.count = 5
+        version = self.obj1.stack._version
+        with patch.object(stacks.StackHandler, "_save", side_effect=DatabaseError):
+            stacks.flush_stacks()
+        mock_logger.log_trace.assert_called_once()
+        self.assertTrue(self.obj1.stack.dirty)
+        self.assertIs(stacks._DIRTY_STACKS[self.obj1.id], self.obj1.stack)
+        self.assertEqual(self.obj1.stack._version, version)
+        # The next flush writes what the failed one could not.
+        stacks.flush_stacks()
+        self.assertFalse(self.obj1.stack.dirty)
+        self.obj1.attributes.reset_cache()
+        self.assertEqual(self.obj1.attributes.get("stack")["count"], 5)
+
+
+class TestStackIndex(GameTest):
+    "Merging of stacks received by a container."
+
+    def test_receive_merges_into_one_stack(self):
+        self.make_stack("log", 2).move_to(self.room1, quiet=True)
+        self.make_stack("log", 3).move_to(self.room1, quiet=True)
+        logs = self.stacks_in(self.room1, "log")
+        self.assertEqual(len(logs), 1)
+        self.assertEqual(logs[0].stack.count, 5)
+
+    def test_receive_merges_all_fragmented_stacks(self):
+        # Rooms filled before the index existed may hold several stacks of a kind.
+        for count in (1, 2, 3):
+            self.make_stack("log", count, location=self.room1)
+        self.room1.stack_index.clear()
+        self.make_stack("log", 4).move_to(self.room1, quiet=True)
+        logs = self.stacks_in(self.room1, "log")
+        self.assertEqual(len(logs), 1)
+        self.assertEqual(logs[0].stack.count, 10)
+
+    def test_different_keys_do_not_merge(self):
+        self.make_stack("log", 2).move_to(self.room1, quiet=True)
+        self.make_stack("stone", 3).move_to(self.room1, quiet=True)
+        self.assertEqual(len(self.stacks_in(self.room1, "log")), 1)
+        self.assertEqual(len(self.stacks_in(self.room1, "stone")), 1)
+
+    @skipUnless(BENCHMARK, "set BENCHMARK to run benchmarks")
+    def test_benchmark_receive_10k(self):
+        # A busy room: many different things lying about.
+        for num in range(200):
+            self.make_stack("junk %i" % num, location=self.room1)
+        items = [self.make_stack("log") for _ in range(10000)]
+        started = time.perf_counter()
+        for item in items:
+            self.room1.stack_index.find(item)
+        indexed = time.perf_counter() - started
+        started = time.perf_counter()
+        for item in items:
+            # The lookup at_object_receive did before the index.
+            self.room1.search(item.key, location=self.room1, quiet=True)
+        searched = time.perf_counter() - started
+        started = time.perf_counter()
+        for item in items:
+            item.move_to(self.room1, quiet=True)
+        moved = time.perf_counter() - started
+        logs = self.stacks_in(self.room1, "log")
+        self.assertEqual(len(logs), 1)
+        self.assertEqual(logs[0].stack.count, 10000)
+        self.report("receive 10k stackables", index_lookup_s=round(indexed, 3),
+                    search_lookup_s=round(searched, 3), move_all_s=round(moved, 2))
+
+
+class TestStackTransactions(GameTest):
+    "Split, merge and consume under concurrent changes."
+
+    def write_elsewhere(self, obj, count):
+        "Write a stack as another process would, past the Attribute cache of this one."
+        Attribute.objects.filter(objectdb__id=obj.pk, db_key="stack").update(
+            db_value={"stackable": True, "count": count, "version": obj.stack._version + 1})
+
+    def test_split_retries_after_outside_change(self):
+        logs = self.make_stack("log", 10, location=self.room1)
+        self.write_elsewhere(logs, 12)
+        split = logs.stack.split(4)
+        self.assertEqual(split.stack.count, 4)
+        self.assertEqual(logs.stack.count, 8)
+
+    def test_outside_change_is_a_conflict(self):
+        logs = self.make_stack("log", 10, location=self.room1)
+        self.write_elsewhere(logs, 12)
+        with patch("world.stacks._MAX_RETRIES", 1):
+            with self.assertRaises(stacks.StackConflict):
+                logs.stack.split(4)
+        # The handler took the stack as it is in the database.
+        self.assertEqual(logs.stack.count, 12)
+        self.assertEqual(len(self.stacks_in(self.room1, "log")), 1)
+
+    def test_split_gives_up_when_stack_keeps_changing(self):
+        logs = self.make_stack("log", 10, location=self.room1)
+        with patch.object(stacks.StackHandler, "_stored_version", return_value=-1):
+            with self.assertRaises(stacks.StackConflict):
+                logs.stack.split(4)
+        self.assertEqual(logs.stack.count, 10)
+        self.assertEqual(len(self.stacks_in(self.room1, "log")), 1)
+
+    def test_version_is_read_from_the_database(self):
+        logs = self.make_stack("log", 10, location=self.room1)
+        self.assertEqual(logs.stack._stored_version(), logs.stack._version)
+        self.write_elsewhere(logs, 12)
+        self.assertEqual(logs.stack._stored_version(), logs.stack._version + 1)
+
+
+class TestFastSplit(GameTest):
+    "Splitting prototype-based stacks without a full copy."
+
+    def stored_count(self, obj):
+        obj.attributes.reset_cache()
+        return obj.attributes.get("stack")["count"]
+
+    def test_split_keeps_count(self):
+        logs = spawn_many("log", 10, self.room1)[0]
+        self.assertTrue(logs.stack.can_fast_split())
+        split = logs.stack.split(4)
+        self.assertEqual(split.location, self.room1)
+        self.assertEqual(split.stack.count, 4)
+        self.assertEqual(self.stored_count(split), 4)
+        self.assertEqual(logs.stack.count, 6)
+        split.move_to(self.char1, quiet=True)
+        self.assertEqual(self.char1.contents[0].stack.count, 4)
+        self.assertEqual(self.stacks_in(self.room1, "log")[0].stack.count, 6)
+
+    def test_created_with_count_keeps_it(self):
+        # The receive hook loads the stack before create_object sets its Attributes.
+        logs = create.create_object(CraftingComponent, key="log", location=self.room2,
+                                    attributes=[("stack", {"stackable": True, "count": 7,
+                                                           "version": 1})])
+        self.assertEqual(logs.stack.count, 7)
+        stacks.flush_stacks()
+        self.assertEqual(self.stored_count(logs), 7)
+
+    @skipUnless(BENCHMARK, "set BENCHMARK to run benchmarks")
+    def test_benchmark_split(self):
+        measured = {}
+        for name, fast in (("fast", True), ("copy", False)):
+            logs = spawn_many("log", 1000, self.room1)[0]
+            with patch("world.stacks._FAST_SPLIT", fast), CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for _ in range(200):
+                    logs.stack.split(1).move_to(self.char1, quiet=True)
+                elapsed = time.perf_counter() - started
+            measured["%s_ms" % name] = round(elapsed / 200 * 1000, 2)
+            measured["%s_queries" % name] = round(len(queries) / 200, 1)
+            self.assertEqual(self.stacks_in(self.char1, "log")[0].stack.count, 200)
+            self.char1.contents[0].delete()
+            logs.delete()
+        self.report("split one item off a stack", **measured)
+
+
+@patch("world.broadcast.delay")
+@patch.object(Object, "msg", autospec=True)
+class TestBroadcast(GameTest):
+    "Batched room messages."
+
+    @staticmethod
+    def received(mock_msg):
+        "What each object was sent, by key."
+        sent = {}
+        for (receiver, text), _ in mock_msg.call_args_list:
+            sent.setdefault(receiver.key, []).append(text)
+        return sent
+
+    def test_messages_are_batched(self, mock_msg, mock_delay):
+        self.room1.broadcast.msg_contents("Char swings.")
+        self.room1.broadcast.msg_contents("Char2 swings.")
+        mock_delay.assert_called_once()
+        mock_msg.assert_not_called()
+        self.room1.broadcast.flush()
+        self.assertEqual(self.received(mock_msg)["Char2"], ["Char swings.\nChar2 swings."])
+
+    def test_excluded_are_not_sent(self, mock_msg, mock_delay):
+        self.room1.broadcast.msg_contents("Char swings.", exclude=self.char1)
+        self.room1.broadcast.flush()
+        sent = self.received(mock_msg)
+        self.assertNotIn("Char", sent)
+        self.assertEqual(sent["Char2"], ["Char swings."])
+
+    def test_receivers_are_those_present_when_sent(self, mock_msg, mock_delay):
+        self.room1.broadcast.msg_contents("The tree falls.")
+        # Moved without hooks, which would have Char2 look around.
+        self.char2.location = self.room2
+        late = create.create_object(Character, key="Late", location=self.room1, home=self.room1)
+        self.room1.broadcast.msg_contents("Late arrives.", exclude=late)
+        self.room1.broadcast.flush()
+        sent = self.received(mock_msg)
+        self.assertEqual(sent["Char2"], ["The tree falls."])
+        self.assertNotIn("Late", sent)
+        self.assertEqual(sent["Char"], ["The tree falls.\nLate arrives."])
+
+    def test_many_actors_collapse(self, mock_msg, mock_delay):
+        actors = [create.create_object(Character, key=f"Bot{num}", location=self.room1, home=self.room1)
+                  for num in range(3)]
+        for actor in actors:
+            self.room1.broadcast.msg_contents(f"{actor.key} chops.", exclude=actor, actor=actor,
+                                              collapse="{count} people are chopping.")
+        self.room1.broadcast.msg_contents("Char2 waves.")
+        self.room1.broadcast.flush()
+        sent = self.received(mock_msg)
+        self.assertEqual(sent["Char"], ["3 people are chopping.\nChar2 waves."])
+        # Too few others for the actors themselves, who hear the rest one by one.
+        self.assertEqual(sent["Bot0"], ["Bot1 chops.\nBot2 chops.\nChar2 waves."])
+
+    @skipUnless(BENCHMARK, "set BENCHMARK to run benchmarks")
+    def test_benchmark_crowded_room(self, mock_msg, mock_delay):
+        crowd = [create.create_object(Character, key=f"Bot{num}", location=self.room1, home=self.room1)
+                 for num in range(200)]
+        measured = {}
+        for name, window in (("immediate", 0), ("batched", 0.5)):
+            mock_msg.reset_mock()
+            with patch("world.broadcast._WINDOW", window):
+                started = time.perf_counter()
+                for actor in crowd[:50]:
+                    self.room1.broadcast.msg_contents(f"{actor.key} chops.", exclude=actor, actor=actor,
+                                                      collapse="{count} people are chopping.")
+                self.room1.broadcast.flush()
+                measured[f"{name}_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            measured[f"{name}_msgs"] = mock_msg.call_count
+        self.report("50 messages in a room of 200", **measured)
+
+
+class TestAppearance(GameTest):
+    "The cached listing of what is in a room."
+
+    def setUp(self):
+        super().setUp()
+        self.obj1.key = "lantern"
+        self.obj2.key = "crate"
+
+    def render(self, looker):
+        return self.room1.appearance.render(looker)
+
+    def test_listing(self):
+        text = self.render(self.char2)
+        self.assertIn("a crate", text)
+        self.assertIn("a lantern", text)
+        self.assertNotIn("#%i" % self.obj1.id, text)
+
+    def test_builders_see_dbrefs(self):
+        self.char2.permissions.add("Builder")
+        self.assertIn("lantern(#%i)" % self.obj1.id, self.render(self.char2))
+
+    def test_permission_change_shows_at_once(self):
+        self.render(self.char2)
+        self.char2.permissions.add("Builder")
+        self.assertIn("lantern(#%i)" % self.obj1.id, self.render(self.char2))
+        self.char2.permissions.remove("Builder")
+        self.assertNotIn("#%i" % self.obj1.id, self.render(self.char2))
+
+    def test_rename_shows_at_once(self):
+        self.render(self.char2)
+        self.obj1.key = "torch"
+        text = self.render(self.char2)
+        self.assertIn("a torch", text)
+        self.assertNotIn("lantern", text)
+
+    def test_view_lock_change_shows_at_once(self):
+        self.render(self.char2)
+        self.obj1.locks.add("view:false()")
+        self.assertNotIn("lantern", self.render(self.char2))
+        self.obj1.locks.add("view:all()")
+        self.assertIn("a lantern", self.render(self.char2))
+
+    def test_stacks_are_counted(self):
+        self.make_stack("log", 3).move_to(self.room1, quiet=True)
+        self.assertIn("three logs", self.render(self.char2))
+        self.stacks_in(self.room1, "log")[0].stack.count = 5
+        self.assertIn("five logs", self.render(self.char2))
+
+    def test_groups_are_counted_and_pluralized(self):
+        for _ in range(2):
+            create.create_object(Object, key="box", location=self.room1, home=self.room1)
+        # Stacks placed without hooks stay apart, and are summed with a lone log.
+        self.make_stack("log", 3, location=self.room1)
+        self.make_stack("log", 4, location=self.room1)
+        create.create_object(Object, key="log", location=self.room1, home=self.room1)
+        self.make_stack("stone", 1, location=self.room1)
+        text = self.render(self.char2)
+        self.assertIn("two boxes", text)
+        self.assertIn("eight logs", text)
+        self.assertIn("a stone", text)
+        self.assertIn("a crate", text)
+        self.assertEqual(text.count("log"), 1)
+
+    @skipUnless(BENCHMARK, "set BENCHMARK to run benchmarks")
+    def test_benchmark_render_500(self):
+        for num in range(500):
+            obj = create.create_object(Object, key="thing %i" % (num % 50), location=self.room2)
+            if num % 10 == 0:
+                obj.locks.add("view:perm(Player)")
+        appearance, looks = self.room2.appearance, 200
+        started = time.perf_counter()
+        for _ in range(looks):
+            appearance._render_full(self.char2)
+        full = time.perf_counter() - started
+        started = time.perf_counter()
+        for _ in range(looks):
+            appearance.render(self.char2)
+        cached = time.perf_counter() - started
+        self.report("look at a room with 500 objects", full_ms=round(full / looks * 1000, 2),
+                    cached_ms=round(cached / looks * 1000, 2))
+
+    @skipUnless(BENCHMARK, "set BENCHMARK to run benchmarks")
+    def test_benchmark_thousands_of_identical_items(self):
+        pebbles, stacked = 3000, 40
+        for _ in range(pebbles):
+            create.create_object(Object, key="pebble", location=self.room2, home=self.room2)
+        for _ in range(stacked):
+            self.make_stack("log", 25, location=self.room2)
+        appearance, looks = self.room2.appearance, 50
+        expected = (stacks.numbered_name("pebble", pebbles), stacks.numbered_name("log", stacked * 25))
+        measured = {}
+        for name, render in (("full", appearance._render_full), ("cached", appearance.render)):
+            started = time.perf_counter()
+            for _ in range(looks):
+                rendered = render(self.char2)
+            measured[f"{name}_ms"] = round((time.perf_counter() - started) / looks * 1000, 2)
+            text = rendered[2] if name == "full" else rendered
+            for string in expected:
+                self.assertIn(string, text)
+        self.report(f"look at a room with {pebbles} pebbles and {stacked} log stacks", **measured)
+
+
+class TestBulkMove(GameTest):
+    "Moving many items at once."
+
+    def test_moves_and_counts(self):
+        logs = self.make_stack("log", 10, location=self.room1)
+        moved_objs, moved = bulk_move([logs, self.obj1], [], self.room1, self.char1)
+        self.assertEqual(moved_objs, [logs, self.obj1])
+        self.assertEqual(moved, {"log": 10, self.obj1.key: 1})
+        self.assertEqual(logs.location, self.char1)
+
+    def test_merged_stacks_are_not_returned(self):
+        first = self.make_stack("log", 4, location=self.room1)
+        second = self.make_stack("log", 6, location=self.room1)
+        moved_objs, moved = bulk_move([first, second], [], self.room1, self.char1)
+        self.assertIsNone(first.pk)
+        self.assertEqual(moved_objs, [second])
+        self.assertEqual(moved, {"log": 10})
+        self.assertEqual([con.stack.count for con in self.stacks_in(self.char1, "log")], [10])
+
+    def test_refused_moves_are_not_counted(self):
+        self.obj1.at_before_move = lambda *args, **kwargs: False
+        moved_objs, moved = bulk_move([self.obj1, self.obj2], [], self.room1, self.char1)
+        self.assertEqual(moved_objs, [self.obj2])
+        self.assertEqual(moved, {self.obj2.key: 1})
+        self.assertEqual(self.obj1.location, self.room1)
+
+    def test_refused_split_goes_back_on_its_stack(self):
+        logs = self.make_stack("log", 10, location=self.room1)
+        with patch.object(Object, "at_before_move", return_value=False):
+            moved_objs, moved = bulk_move([logs], [], self.room1, self.char1, amount=4)
+        self.assertEqual((moved_objs, dict(moved)), ([], {}))
+        self.assertEqual([con.stack.count for con in self.stacks_in(self.room1, "log")], [10])
+
+    def test_conflict_skips_only_that_stack(self):
+        logs = self.make_stack("log", 10, location=self.room1)
+        with patch.object(stacks.StackHandler, "_stored_version", return_value=-1):
+            moved_objs, moved = bulk_move([self.obj1, logs], [], self.room1, self.char1, amount=4)
+            self.assertEqual(moved, {self.obj1.key: 1})
+            with self.assertRaises(stacks.StackConflict):
+                bulk_move([logs], [], self.room1, self.char1, amount=4)
+        self.assertEqual(logs.stack.count, 10)
+
+
+@patch("world.broadcast.delay")
+@patch("world.monitor.delay")
+@patch.object(Object, "msg", autospec=True)
+class TestMonitor(GameTest):
+    "Pushing character state to subscribed sessions."
+
+    def setUp(self):
+        super().setUp()
+        self.session.puppet = self.char1
+        self.char1.sessions.add(self.session)
+
+    def tearDown(self):
+        monitor.unsubscribe(self.session)
+        monitor._PENDING.clear()
+        monitor._flush_pending = False
+        super().tearDown()
+
+    @staticmethod
+    def sent(mock_msg):
+        "The OOB commands sent, as (topic, data) and cleared."
+        sent = [(topic, data) for _, kwargs in mock_msg.call_args_list
+                for topic, (_, data) in kwargs.items() if topic in monitor.TOPICS]
+        mock_msg.reset_mock()
+        return sent
+
+    def test_inventory(self, mock_msg, mock_delay, _):
+        logs = self.make_stack("log", 3, location=self.char1)
+        monitor.subscribe(self.session, ["inventory"])
+        self.assertEqual(self.sent(mock_msg), [("inventory", {
+            "full": True, "update": [monitor.inventory_entry(logs.id, (logs.name, 3, ""))], "remove": []})])
+        # Changes are sent together, with the latest state of each entry.
+        self.obj1.move_to(self.char1, quiet=True)
+        self.obj2.move_to(self.char1, quiet=True)
+        self.obj1.move_to(self.room1, quiet=True)
+        self.assertEqual(self.sent(mock_msg), [])
+        mock_delay.assert_called_once_with(monitor._WINDOW, monitor.flush)
+        monitor.flush()
+        entry = monitor.inventory_entry(self.obj2.id, (self.obj2.name, None, self.obj2.db.desc or ""))
+        self.assertEqual(self.sent(mock_msg), [("inventory", {
+            "full": False, "update": [entry], "remove": [self.obj1.id]})])
+        monitor.flush()
+        self.assertEqual(self.sent(mock_msg), [])
+
+    def test_harvest(self, mock_msg, mock_delay, _):
+        tree = create.create_object(Tree, key="tree", location=self.room1)
+        self.char1.ndb.harvesting = True
+        self.char1.ndb.harvest_target = tree
+        monitor.subscribe(self.session, ["harvest"])
+        self.assertEqual(self.sent(mock_msg), [("harvest", {
+            "full": True, "update": [monitor.harvest_entry(tree)], "remove": []})])
+        self.assertTrue(harvest_swing(self.char1, tree))
+        monitor.flush()
+        entry = {"id": tree.id, "name": tree.name, "hp": tree.max_hp - SWING_DAMAGE, "max_hp": tree.max_hp}
+        self.assertEqual(self.sent(mock_msg), [("harvest", {"full": False, "update": [entry], "remove": []})])
+        stop_harvesting(self.char1)
+        monitor.flush()
+        self.assertEqual(self.sent(mock_msg), [("harvest", {"full": False, "update": [], "remove": [tree.id]})])
+
+    def test_room(self, mock_msg, mock_delay, _):
+        monitor.subscribe(self.session, ["room"])
+        (topic, data), = self.sent(mock_msg)
+        self.assertTrue(data["full"])
+        self.assertEqual({entry["id"]: entry["exit"] for entry in data["update"]},
+                         {self.obj1.id: False, self.obj2.id: False, self.char2.id: False, self.exit.id: True})
+        self.obj1.move_to(self.room2, quiet=True)
+        create.create_object(Object, key="pebble", location=self.room2).move_to(self.room1, quiet=True)
+        monitor.flush()
+        (topic, data), = self.sent(mock_msg)
+        self.assertEqual(topic, "room")
+        self.assertEqual([entry["name"] for entry in data["update"]], ["pebble"])
+        self.assertEqual(data["remove"], [self.obj1.id])
+
+    def test_unsubscribe(self, mock_msg, mock_delay, _):
+        subscribed = dict(monitor._SUBSCRIBED)
+        monitor.subscribe(self.session, monitor.TOPICS)
+        monitor.unsubscribe(self.session, ["room", "harvest"])
+        self.assertEqual(self.session.ndb.monitored, {"inventory"})
+        self.assertEqual(monitor._SUBSCRIBED, dict(subscribed, inventory=subscribed["inventory"] + 1))
+        self.sent(mock_msg)
+        self.obj1.move_to(self.room2, quiet=True)
+        monitor.unsubscribe(self.session)
+        self.assertEqual(monitor._SUBSCRIBED, subscribed)
+        self.obj1.move_to(self.char1, quiet=True)
+        self.assertFalse(monitor._PENDING)
+        mock_delay.assert_not_called()
+        monitor.flush()
+        self.assertEqual(self.sent(mock_msg), [])
+
+
+class TestInlineCache(GameTest):
+    "Caching of parsed inlinefunc strings."
+
+    STRINGS = ("A plain room.", "Costs $5.", "$pad(Welcome, 30, c, -)",
+               "$crop(A very long line of text, 10) and $space(4)|", r"Escaped \$pad(x, 5)")
+
+    def tearDown(self):
+        inline.clear()
+        super().tearDown()
+
+    @staticmethod
+    def session(width=78):
+        "A session stand-in with the given screen width."
+        return SimpleNamespace(protocol_flags={"ANSI": True, "SCREENWIDTH": {0: width}})
+
+    def test_same_output_as_evennia(self):
+        session = self.session()
+        for string in self.STRINGS:
+            with self.subTest(string=string):
+                for strip in (False, True):
+                    expected = inlinefunc.parse_inlinefunc(string, strip=strip, session=session)
+                    self.assertEqual(inline.parse_inlinefunc(string, strip=strip, session=session), expected)
+                    # Again, from the cache.
+                    self.assertEqual(inline.parse_inlinefunc(string, strip=strip, session=session), expected)
+        self.assertIn(("$pad(Welcome, 30, c, -)", False, inline._flags(session)), inline._RESULTS)
+        self.assertNotIn("A plain room.", inline._CALLS)
+
+    def test_results_are_kept_per_session_flags(self):
+        string = "$pad(Welcome, 30, c, -)"
+        inline.parse_inlinefunc(string, session=self.session(78))
+        inline.parse_inlinefunc(string, session=self.session(78))
+        inline.parse_inlinefunc(string, session=self.session(40))
+        self.assertEqual(len(inline._RESULTS), 2)
+
+    def test_impure_calls_are_not_cached(self):
+        calls = []
+
+        def whoami(*args, **kwargs):
+            calls.append(kwargs["session"])
+            return kwargs["session"].name
+
+        first, second = self.session(), self.session()
+        first.name, second.name = "Anna", "Bert"
+        with patch.dict(inlinefunc._INLINE_FUNCS, whoami=whoami):
+            self.assertEqual(inline.parse_inlinefunc("You are $whoami().", session=first), "You are Anna.")
+            self.assertEqual(inline.parse_inlinefunc("You are $whoami().", session=second), "You are Bert.")
+            self.assertEqual(inline.parse_inlinefunc("$pad(x, 5) $whoami()", session=first),
+                             inlinefunc.parse_inlinefunc("$pad(x, 5) $whoami()", session=first))
+        self.assertEqual(calls, [first, second, first, first])
+        self.assertFalse(inline._RESULTS)
+
+    def test_clear(self):
+        for string in self.STRINGS:
+            inline.parse_inlinefunc(string, session=self.session())
+        self.assertTrue(inline._CALLS and inline._RESULTS)
+        inline.clear()
+        self.assertFalse(inline._CALLS or inline._RESULTS)
+
+    @patch("world.inline.CACHE_SIZE", 2)
+    def test_least_recently_used_are_dropped(self):
+        session = self.session()
+        pad, crop, space = "$pad(a, 5)", "$crop(abcdef, 3)", "$space(2)"
+        for string in (pad, crop, pad, space):
+            inline.parse_inlinefunc(string, session=session)
+        self.assertEqual([key[0] for key in inline._RESULTS], [pad, space])
+        self.assertEqual(list(inline._CALLS), [pad, space])
+
+    @skipUnless(BENCHMARK, "set BENCHMARK to run benchmarks")
+    def test_benchmark_throughput(self):
+        results = inline.benchmark(self.STRINGS, repeat=2000)
+        self.assertGreater(results["cached"], results["evennia"])
+        self.report("parse inlinefuncs", **{f"{name}_per_s": round(rate) for name, rate in results.items()})
+
+
+class TestStats(GameTest):
+    "Counting the game world for MSSP."
+
+    def setUp(self):
+        super().setUp()
+        tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempdir.cleanup)
+        self.path = os.path.join(tempdir.name, "stats.json")
+        patcher = patch("world.stats.STATS_FILE", self.path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.forget)
+        stats.reconcile()
+
+    @staticmethod
+    def forget():
+        "Drop the counts, as if the server never started."
+        stats._COUNTS = None
+        stats._dirty = False
+        stats._READ = {}
+        stats._read_at = 0
+
+    def test_hooks_count_creation_and_deletion(self):
+        before = stats.get()
+        objs = [create.create_object(typeclass, key="thing", location=self.room1)
+                for typeclass in (Room, Exit, Character, Object, CraftingComponent)]
+        self.assertEqual(stats.get(), dict(before, ROOMS=before["ROOMS"] + 1, EXITS=before["EXITS"] + 1,
+                                           CHARACTERS=before["CHARACTERS"] + 1,
+                                           OBJECTS=before["OBJECTS"] + 2))
+        for obj in objs:
+            obj.delete()
+        self.assertEqual(stats.get(), before)
+
+    def test_kind(self):
+        self.assertEqual([stats.kind(typeclass) for typeclass in (Room, Exit, Character, Object)],
+                         ["ROOMS", "EXITS", "CHARACTERS", "OBJECTS"])
+
+    @patch("world.stats.logger")
+    def test_reconcile_corrects_drift(self, mock_logger):
+        counts = stats.get()
+        stats._COUNTS["OBJECTS"] += 5
+        stats._COUNTS["ROOMS"] -= 1
+        stats.reconcile()
+        self.assertEqual(stats.get(), counts)
+        mock_logger.log_info.assert_called_once_with("Game statistics corrected by {'ROOMS': 1, 'OBJECTS': -5}.")
+        stats.reconcile()
+        mock_logger.log_info.assert_called_once()
+
+    def test_counts_are_handed_to_the_portal(self):
+        self.assertEqual(stats.read("ROOMS"), str(stats.get("ROOMS")))
+        rooms = stats.get("ROOMS")
+        create.create_object(Room, key="Room3")
+        # The portal reads the file at most every WRITE_INTERVAL seconds.
+        stats.save()
+        self.assertEqual(stats.read("ROOMS"), str(rooms))
+        stats._read_at = 0
+        self.assertEqual(stats.read("ROOMS"), str(rooms + 1))
+        with open(self.path) as fil:
+            self.assertEqual(json.load(fil), stats.get())
+
+    def test_unchanged_counts_are_not_written(self):
+        os.remove(self.path)
+        stats.save()
+        self.assertFalse(os.path.exists(self.path))
+        create.create_object(Object, key="pebble")
+        stats.save()
+        self.assertTrue(os.path.exists(self.path))
+
+    def test_missing_file_reads_zero(self):
+        os.remove(self.path)
+        self.forget()
+        self.assertEqual(stats.read("ROOMS"), "0")
+
+
+class TestMetrics(GameTest):
+    "Sampling the server."
+
+    def tearDown(self):
+        metrics.SAMPLES.clear()
+        super().tearDown()
+
+    def test_sample_counts_cached_typeclasses(self):
+        create.create_object(Tree, key="tree", location=self.room1)
+        sampler = metrics.MetricsService()
+        sampler._last = sampler._totals()
+        sampler._due = sampler._last[0]
+        sampler.sample()
+        sample = metrics.SAMPLES[-1]
+        typeclasses = sample["typeclasses"]
+        # Instances of earlier tests may still be cached.
+        self.assertGreaterEqual(typeclasses["typeclasses.harvestables.Tree"], 1)
+        self.assertGreaterEqual(typeclasses["typeclasses.characters.Character"], 2)
+        self.assertGreaterEqual(typeclasses["typeclasses.rooms.Room"], 2)
+        self.assertGreaterEqual(typeclasses[self.account.typeclass_path], 2)
+        self.assertNotIn("ObjectDB", typeclasses)
+        self.assertGreaterEqual(sample["cached_objects"], sum(typeclasses.values()))
+        self.assertIn(f'typeclass_objects{{typeclass="typeclasses.harvestables.Tree"}} '
+                      f'{typeclasses["typeclasses.harvestables.Tree"]}',
+                      metrics.format_sample(sample).splitlines())
+
+
+class TestCommandProfiling(GameTest):
+    "Recording what command runs cost."
+
+    def run_command(self, key="look"):
+        "Profile a run of a command that queries, misses an Attribute and sends text."
+        cmd = SimpleNamespace(key=key)
+        profiling.start(cmd)
+        self.obj1.db.rank = 5
+        self.obj1.attributes.reset_cache()
+        self.obj1.db.rank
+        self.char1.msg("hello")
+        profiling.finish(cmd)
+
+    def test_bucket(self):
+        buckets = (0, 1, 5)
+        self.assertEqual([profiling._bucket(buckets, value) for value in (0, 0.5, 1, 3, 5, 6)],
+                         [0, 1, 1, 2, 2, 3])
+
+    def test_queries_are_counted(self):
+        queries = profiling.query_count()
+        with CaptureQueriesContext(connection) as captured:
+            Object.objects.count()
+            Object.objects.filter(db_key="nothing").exists()
+        self.assertEqual(profiling.query_count(), queries + len(captured))
+
+    def test_run_is_recorded(self):
+        self.run_command()
+        self.run_command()
+        profile = profiling.get_profile("look")
+        self.assertEqual(profile.calls, 2)
+        self.assertGreaterEqual(profile.queries, 4)
+        self.assertEqual(profile.attr_misses, 2)
+        self.assertEqual(profile.bytes, 10)
+        self.assertEqual(sum(profile.time_hist), 2)
+        self.assertEqual(sum(profile.query_hist), 2)
+        self.assertEqual(profile.to_dict()["calls"], 2)
+        self.assertEqual(profiling.get_profiles(), [profile])
+
+    def test_failed_nested_run_is_dropped(self):
+        outer, inner = SimpleNamespace(key="outer"), SimpleNamespace(key="inner")
+        profiling.start(outer)
+        profiling.start(inner)
+        profiling.finish(outer)
+        self.assertFalse(profiling._ACTIVE)
+        self.assertEqual(profiling.get_profile("outer").calls, 1)
+        self.assertIsNone(profiling.get_profile("inner"))
+        # Finishing a run that isn't active does nothing.
+        profiling.finish(inner)
+        self.assertIsNone(profiling.get_profile("inner"))
+
+    def test_disabled(self):
+        commands = profiling.commands_run()
+        with patch("world.profiling.ENABLED", False):
+            self.run_command()
+        self.assertEqual(profiling.commands_run(), commands + 1)
+        self.assertEqual(profiling.get_profiles(), [])
+
+    def test_reset(self):
+        self.run_command()
+        profiling.reset()
+        self.assertIsNone(profiling.get_profile("look"))
+        self.assertEqual(profiling.get_profiles(), [])
+
+
+class TestLockCache(GameTest):
+    "Caching of lock check results."
+
+    def test_results_are_cached_by_class_and_id(self):
+        self.obj1.locks.add("get:all()")
+        self.assertTrue(self.obj1.access(self.char1, "get"))
+        self.assertIn((type(self.char1), self.char1.id, type(self.obj1), self.obj1.id, "get", False),
+                      locks._RESULTS)
+
+    def test_tag_change_clears_results(self):
+        self.obj1.locks.add("get:tag(vip)")
+        self.assertFalse(self.obj1.access(self.char1, "get"))
+        self.char1.tags.add("vip")
+        self.assertTrue(self.obj1.access(self.char1, "get"))
+        self.char1.tags.remove("vip")
+        self.assertFalse(self.obj1.access(self.char1, "get"))
+
+    def test_attribute_change_clears_results(self):
+        self.obj1.locks.add("get:attr(rank, 5)")
+        self.assertFalse(self.obj1.access(self.char1, "get"))
+        self.char1.db.rank = 5
+        self.assertTrue(self.obj1.access(self.char1, "get"))
+        del self.char1.db.rank
+        self.assertFalse(self.obj1.access(self.char1, "get"))
+
+    def test_objects_without_id_are_not_cached(self):
+        self.obj1.locks.add("get:all()")
+        self.assertTrue(self.obj1.locks.check(self.session, "get"))
+        self.assertFalse(locks._RESULTS)
+
+
+class TestAttributeMisses(GameTest):
+    "Counting of Attribute cache misses for the server metrics."
+
+    def setUp(self):
+        super().setUp()
+        self.misses = profiling.attribute_misses()
+
+    def test_cached_lookups_and_writes_are_not_misses(self):
+        self.obj1.db.rank = 5
+        self.account.db.rank = 5
+        self.assertEqual(self.obj1.db.rank, 5)
+        self.assertEqual(profiling.attribute_misses(), self.misses)
+
+    def test_lookup_needing_a_query_is_a_miss(self):
+        self.obj1.db.rank = 5
+        self.obj1.attributes.reset_cache()
+        lookups = profiling.attribute_lookups()
+        self.assertEqual(self.obj1.db.rank, 5)
+        self.assertEqual(profiling.attribute_lookups(), lookups + 1)
+        self.assertEqual(profiling.attribute_misses(), self.misses + 1)
+
+
+class TestLoadGeneration(GameTest):
+    "The load generator, run on the test database."
+
+    def test_runs_are_repeatable(self):
+        first = loadgen.run(characters=3, rounds=5)
+        second = loadgen.run(characters=3, rounds=5)
+        runs = {name: stats["runs"] for name, stats in first["commands"].items()}
+        self.assertEqual(sum(runs.values()), 15)
+        self.assertEqual(runs, {name: stats["runs"] for name, stats in second["commands"].items()})
+        self.assertFalse(search.search_tag(*loadgen._TAG))
+
+    @skipUnless(BENCHMARK, "set BENCHMARK to run benchmarks")
+    def test_benchmark_against_baseline(self):
+        characters = int(os.environ.get("LOADGEN_CHARACTERS", 20))
+        rounds = int(os.environ.get("LOADGEN_ROUNDS", 50))
+        baseline = loadgen.load_baseline()
+        results = loadgen.run(characters, rounds)
+        print("\n" + strip_ansi(loadgen.report(results, baseline)))
+        if os.environ.get("LOADGEN_SAVE"):
+            loadgen.save_baseline(results)
+            return
+        if not baseline or any(baseline[field] != results[field]
+                               for field in ("characters", "rounds", "seed")):
+            self.skipTest("no baseline of this load to compare with")
+        for name, stats in results["commands"].items():
+            old = baseline["commands"].get(name)
+            if old:
+                with self.subTest(command=name):
+                    self.assertLessEqual(stats["queries"], old["queries"] * 1.1 + 1)